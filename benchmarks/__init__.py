@@ -0,0 +1,4 @@
+"""Benchmarks of pypratt.
+
+Run the benchmark suite from the repository root with: python -m benchmarks
+"""
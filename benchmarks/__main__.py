@@ -0,0 +1,65 @@
+import argparse
+
+from .suite import (
+    CORPORA,
+    DEFAULT_THRESHOLD,
+    compare,
+    format_results,
+    load_baseline,
+    run_suite,
+    save_baseline,
+)
+
+
+def init_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="benchmarks",
+        description="Benchmark every stage of pypratt on generated corpora.",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=[spec.name for spec in CORPORA],
+        help="Only run the given corpus (can be repeated)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timing runs per stage (default = 5)"
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Use a tenth of the expressions of each corpus"
+    )
+    parser.add_argument("--save", metavar="PATH", help="Save the results as a JSON baseline")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="Compare the results with a JSON baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Relative slowdown reported as a regression (default = {DEFAULT_THRESHOLD})",
+    )
+    return parser
+
+
+def main() -> None:
+    args = init_parser().parse_args()
+    corpora = [spec for spec in CORPORA if not args.corpus or spec.name in args.corpus]
+    results = run_suite(corpora, repeat=args.repeat, scale=0.1 if args.quick else 1.0)
+    print(format_results(results))
+
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"Saved the results to {args.save}")
+
+    if args.compare:
+        regressions = compare(load_baseline(args.compare), results, args.threshold)
+        if regressions:
+            print(f"Regressions against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
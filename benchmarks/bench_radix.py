@@ -0,0 +1,75 @@
+"""Numeral conversion with the radix engine against the digit-by-digit conversions.
+
+Run from the repository root with: python -m benchmarks.bench_radix
+"""
+
+import random
+import sys
+import time
+
+from pypratt.num_utils import num_to_str, str_to_int
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+BASES = [7, 10, 16]
+
+# The digit-by-digit conversions are quadratic and are skipped above this size
+DIGITWISE_MAX_DIGITS = 100_000
+
+
+def digitwise_num_to_str(num: int, base: int) -> str:
+    """The previous num_to_str for non-negative integers: one % and // per digit."""
+    if base == 10:
+        return str(num)
+    digits = []
+    while num > 0:
+        digits.append(num % base)
+        num //= base
+    digits.reverse()
+    return "".join(str(d) if d <= 9 else chr(ord("A") + d - 10) for d in digits)
+
+
+def digitwise_str_to_int(expr: str, base: int) -> int:
+    """The previous str_to_int: one multiplication and addition per character."""
+    num = 0
+    for char in expr:
+        digit = int(char) if char.isdigit() else ord(char.upper()) - ord("A") + 10
+        num = num * base + digit
+    return num
+
+
+def best_time(func, *args, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    sys.set_int_max_str_digits(0)
+    print(
+        f"{'base':>4} {'digits':>9} {'to_str old':>11} {'to_str new':>11} "
+        f"{'to_int old':>11} {'to_int new':>11}"
+    )
+    rng = random.Random(0)
+    for base in BASES:
+        for size in SIZES:
+            num = rng.randrange(base ** (size - 1), base**size)
+            digits = num_to_str(num, base)
+            repeat = 3 if size <= 100_000 else 1
+            if size <= DIGITWISE_MAX_DIGITS:
+                old_to_str = f"{best_time(digitwise_num_to_str, num, base, repeat=repeat):>10.4f}s"
+                old_to_int = f"{best_time(digitwise_str_to_int, digits, base, repeat=repeat):>10.4f}s"
+            else:
+                old_to_str = old_to_int = f"{'-':>11}"
+            new_to_str = best_time(num_to_str, num, base, repeat=repeat)
+            new_to_int = best_time(str_to_int, digits, base, repeat=repeat)
+            print(
+                f"{base:>4} {size:>9} {old_to_str} {new_to_str:>10.4f}s "
+                f"{old_to_int} {new_to_int:>10.4f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Throughput of the table-driven scanner against the character-by-character
+and the streaming tokenizers.
+
+Run from the repository root with: python -m benchmarks.bench_tokenizer
+"""
+
+import random
+import timeit
+
+from collections import deque
+
+from benchmarks.charwise import tokenize_charwise
+from pypratt.stream import stream_tokens
+from pypratt.tokenizer import tokenize
+
+SIZES = [100, 1_000, 10_000, 100_000]
+OPERATORS = ["+", "-", "*", "/", "^", "%", "_C"]
+
+
+def generate_expression(length: int, seed: int = 0) -> str:
+    """Generate an expression of roughly the given length in characters."""
+    rng = random.Random(seed)
+    parts = [str(rng.randint(0, 10**6))]
+    size = len(parts[0])
+    while size < length:
+        op = rng.choice(OPERATORS)
+        num = str(rng.randint(0, 10**6))
+        if rng.random() < 0.1:
+            part = f" {op} ({num}!)"
+        else:
+            part = f" {op} {num}"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def main() -> None:
+    print(
+        f"{'chars':>8} {'charwise MB/s':>14} {'stream MB/s':>12} {'scanner MB/s':>13} {'speedup':>8}"
+    )
+    for size in SIZES:
+        expr = generate_expression(size)
+        number = max(1, 200_000 // size)
+        charwise = min(
+            timeit.repeat(lambda: tokenize_charwise(expr, base=10), number=number, repeat=3)
+        )
+        stream = min(
+            timeit.repeat(
+                lambda: deque(stream_tokens([expr], base=10), maxlen=0), number=number, repeat=3
+            )
+        )
+        scanner = min(timeit.repeat(lambda: tokenize(expr, base=10), number=number, repeat=3))
+        charwise_mbps = len(expr) * number / charwise / 1e6
+        stream_mbps = len(expr) * number / stream / 1e6
+        scanner_mbps = len(expr) * number / scanner / 1e6
+        print(
+            f"{len(expr):>8} {charwise_mbps:>14.2f} {stream_mbps:>12.2f} {scanner_mbps:>13.2f}"
+            f" {charwise / scanner:>7.2f}x"
+        )
+
+if __name__ == "__main__":
+    main()
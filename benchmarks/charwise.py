@@ -0,0 +1,161 @@
+"""The original character-by-character tokenizer.
+
+It is kept as the reference implementation for the table-driven scanner of
+pypratt.tokenizer, which must produce the same tokens and SyntaxErrors, and as
+the baseline of the tokenizer benchmark. It only knows the built-in operators.
+"""
+
+from pypratt.num_utils import DECIMAL_POINT, SEPARATOR
+from pypratt.operators import (
+    BINARY_OP_SYMS,
+    CLOSE_BRACKETS,
+    MATCHING_BRACKET,
+    OP_START_SYM,
+    OPEN_BRACKETS,
+    POSTFIX_UNARY_OP_SYMS,
+    PREFIX_UNARY_OP_SYMS,
+)
+from pypratt.tokenizer import (
+    INCOMPLETE_TYPES,
+    OPERAND_TYPES,
+    PREFIX_CONTEXT_TYPES,
+    SyntaxError,
+    Token,
+    TokenTypes,
+    _check_binary_operator,
+    _describe,
+    is_valid_var,
+)
+
+
+def tokenize_charwise(expr: str, *, base: int) -> list[Token]:
+    """Tokenize the input expression into a list of tokens."""
+
+    tokens: list[Token] = []
+    cur_str = ""
+    bracket_stack: list[int] = []
+
+    # Add a space at the end of the expression to process the last number
+    # expr = expr.replace(" ", "")
+    expr += " "
+    for str_index, char in enumerate(expr):
+        if is_valid_str_token(char):
+            cur_str += char
+        else:
+            # If the previous character was part of a number, convert it to a NumberToken first
+            if cur_str:
+                if cur_str[0] == OP_START_SYM:
+                    if cur_str[1:] in BINARY_OP_SYMS:
+                        add_operator_token(tokens, cur_str[1:], str_index)
+                    else:
+                        raise SyntaxError(f"Encountered invalid operator {cur_str}", str_index)
+                elif is_valid_var(cur_str, base):
+                    tokens.append(Token(TokenTypes.VARIABLE, cur_str))
+                elif is_valid_num(cur_str, base):
+                    tokens.append(Token(TokenTypes.NUMBER, cur_str))
+                else:
+                    raise SyntaxError(
+                        f"'{cur_str}' is not a valid number or variable name.",
+                        str_index,
+                    )
+                cur_str = ""
+
+            if char in POSTFIX_UNARY_OP_SYMS:
+                if not tokens:
+                    raise SyntaxError(
+                        f"Expression cannot start with a postfix operator '{char}'!",
+                        str_index,
+                    )
+                elif tokens[-1].type not in OPERAND_TYPES:
+                    raise SyntaxError(
+                        f"The postfix operator '{char}' must follow a number, a variable or a closing bracket!",
+                        str_index,
+                    )
+                tokens.append(Token(TokenTypes.POSTFIX_UNARY_OP, char))
+
+            elif char in PREFIX_UNARY_OP_SYMS and (
+                not tokens or tokens[-1].type in PREFIX_CONTEXT_TYPES
+            ):
+                tokens.append(Token(TokenTypes.PREFIX_UNARY_OP, char))
+
+            elif char in BINARY_OP_SYMS:
+                add_operator_token(tokens, char, str_index)
+
+            elif char in OPEN_BRACKETS:
+                # Assume that an opening bracket preceeded by an operand implies multiplication
+                if tokens and tokens[-1].type in OPERAND_TYPES:
+                    tokens.append(Token(TokenTypes.BINARY_OP, "*"))
+                tokens.append(Token(TokenTypes.OPEN_BRACKET, char))
+                bracket_stack.append(len(tokens) - 1)
+
+            elif char in CLOSE_BRACKETS:
+                if not tokens or tokens[-1].type in INCOMPLETE_TYPES:
+                    raise SyntaxError(
+                        f"Expression cannot end with a closing bracket '{char}'!",
+                        str_index,
+                    )
+                try:
+                    opening_index = bracket_stack.pop()
+                except IndexError:
+                    raise SyntaxError(
+                        f"Closing bracket: {char} without matching opening bracket",
+                        str_index,
+                    )
+                if MATCHING_BRACKET[char] != tokens[opening_index].value:
+                    raise SyntaxError(
+                        f"Mismatched brackets: {tokens[opening_index].value} closed with {char}",
+                        str_index,
+                    )
+
+                tokens.append(Token(TokenTypes.CLOSE_BRACKET, char))
+                compute_bracket_distances(tokens, opening_index)
+
+            elif char != " ":
+                raise SyntaxError(f"Unexpected character: {char}", str_index)
+
+    if not tokens:
+        raise SyntaxError("Expression cannot be empty!", 0)
+
+    if bracket_stack:
+        raise SyntaxError("Encountered unmatched closing brackets:", len(expr) - 1)
+
+    if tokens[-1].type in INCOMPLETE_TYPES:
+        raise SyntaxError(
+            f"Expression cannot end with {_describe(tokens[-1].type, tokens[-1].value)}",
+            len(expr) - 1,
+        )
+
+    tokens.append(Token(TokenTypes.END, ""))
+    return tokens
+
+
+def add_operator_token(tokens:list[Token], op:str, str_index:int):
+    _check_binary_operator(tokens[-1].type if tokens else None, op, str_index)
+    tokens.append(Token(TokenTypes.BINARY_OP, op))
+
+
+def compute_bracket_distances(tokens, opening_index):
+    cur_index = len(tokens) - 1
+    closing_dist = cur_index - opening_index
+    tokens[opening_index].distance = closing_dist
+    tokens[cur_index].distance = -closing_dist
+
+
+def is_valid_num(num_str: str, base: int) -> bool:
+    """Check if the character is part of a number.
+
+    To account for numbers in different bases, we consider alphanumeric characters,
+    decimal points, and separators.
+    """
+    return all(
+        char.isalnum() or char == DECIMAL_POINT or char == SEPARATOR for char in num_str
+    )
+
+
+def is_valid_str_token(char: str) -> bool:
+    """Check if the character is part of a number.
+
+    To account for numbers in different bases, we consider alphanumeric characters,
+    decimal points, and separators.
+    """
+    return char.isalnum() or char == DECIMAL_POINT or char == SEPARATOR or char == OP_START_SYM
@@ -0,0 +1,105 @@
+"""Generators of reproducible corpora of random expressions."""
+
+import random
+
+from pypratt.radix import DIGITS
+
+# Operators that are applied to small literals only, so that the corpora
+# exercise them without producing huge results
+COMBINATORIAL_OPERATORS = {"!", "^", "_C", "_P"}
+
+DEFAULT_OPERATORS = {"+": 3, "-": 3, "*": 2, "/": 1, "%": 1}
+
+
+class CorpusSpec:
+    """The parameters of a corpus of random expressions.
+
+    length is the approximate length of each expression in characters, depth
+    the maximum nesting depth of brackets, operators the relative weights of
+    the operator symbols, and digits the number of digits of each literal. The
+    same spec always generates the same corpus."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        count: int = 200,
+        length: int = 100,
+        depth: int = 0,
+        operators: dict[str, int] | None = None,
+        base: int = 10,
+        digits: int = 4,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.count = count
+        self.length = length
+        self.depth = depth
+        self.operators = DEFAULT_OPERATORS if operators is None else operators
+        self.base = base
+        self.digits = digits
+        self.seed = seed
+
+    def __repr__(self):
+        return f"CorpusSpec({self.name!r}, {self.as_dict()})"
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "length": self.length,
+            "depth": self.depth,
+            "operators": self.operators,
+            "base": self.base,
+            "digits": self.digits,
+            "seed": self.seed,
+        }
+
+
+def generate_corpus(spec: CorpusSpec) -> list[str]:
+    rng = random.Random(spec.seed)
+    return [generate_expression(rng, spec) for _ in range(spec.count)]
+
+
+def generate_expression(rng: random.Random, spec: CorpusSpec, depth: int = 0) -> str:
+    """Generate an expression of roughly spec.length characters."""
+    symbols = list(spec.operators)
+    weights = list(spec.operators.values())
+    parts = [_term(rng, spec, depth)]
+    size = len(parts[0])
+    while size < spec.length:
+        symbol = rng.choices(symbols, weights)[0]
+        if symbol in COMBINATORIAL_OPERATORS:
+            part = f" + {_combinatorial_term(rng, spec, symbol)}"
+        else:
+            part = f" {symbol} {_term(rng, spec, depth)}"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def _term(rng: random.Random, spec: CorpusSpec, depth: int) -> str:
+    if depth < spec.depth and rng.random() < 0.3:
+        inner = CorpusSpec(
+            spec.name,
+            length=spec.length // 4,
+            depth=spec.depth,
+            operators=spec.operators,
+            base=spec.base,
+            digits=spec.digits,
+        )
+        return f"({generate_expression(rng, inner, depth + 1)})"
+    return _literal(rng, spec.base, spec.digits)
+
+
+def _literal(rng: random.Random, base: int, digits: int) -> str:
+    # A non-zero leading digit keeps divisors and moduli non-zero
+    return rng.choice(DIGITS[1:base]) + "".join(rng.choices(DIGITS[:base], k=digits - 1))
+
+
+def _combinatorial_term(rng: random.Random, spec: CorpusSpec, symbol: str) -> str:
+    small = _literal(rng, spec.base, 2)
+    if symbol == "!":
+        return f"({small}!)"
+    if symbol == "^":
+        return f"({small} ^ {_literal(rng, spec.base, 1)})"
+    return f"({small} {symbol} {_literal(rng, spec.base, 1)})"
@@ -0,0 +1,182 @@
+"""Per-stage timings, throughput and peak memory of the evaluator on generated corpora."""
+
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from collections.abc import Callable
+
+from pypratt.batch import EVALUATION_ERRORS
+from pypratt.num_utils import num_to_str
+from pypratt.parser import parse
+from pypratt.pyeval import AlgebraEval, _evaluate_parse_tree
+from pypratt.tokenizer import tokenize
+
+from .corpus import CorpusSpec, generate_corpus
+
+CORPORA = [
+    CorpusSpec("flat", length=200),
+    CorpusSpec("nested", length=200, depth=4),
+    CorpusSpec("long", count=20, length=3000, digits=6),
+    CorpusSpec(
+        "combinatorial",
+        length=200,
+        operators={"+": 2, "*": 1, "!": 1, "^": 1, "_C": 1, "_P": 1},
+    ),
+    CorpusSpec("base16", length=200, base=16, digits=8),
+    CorpusSpec("bignum", count=50, length=2000, operators={"+": 2, "-": 2, "*": 1}, digits=200),
+]
+
+# A larger relative slowdown than this is reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+def run_suite(
+    corpora: list[CorpusSpec] = CORPORA, repeat: int = 5, scale: float = 1.0
+) -> dict:
+    """Benchmark every stage on every corpus and return the results as a dict.
+
+    Each stage is timed on the whole corpus, taking the best of repeat runs, and
+    its peak memory is measured with tracemalloc in a separate run. The scale
+    multiplies the number of expressions of each corpus."""
+    results = {"metadata": _metadata(), "corpora": {}}
+    for spec in corpora:
+        if scale != 1.0:
+            count = max(1, int(spec.count * scale))
+            spec = CorpusSpec(spec.name, **{**spec.as_dict(), "count": count})
+        results["corpora"][spec.name] = _run_corpus(spec, repeat)
+    return results
+
+
+def _run_corpus(spec: CorpusSpec, repeat: int) -> dict:
+    base = spec.base
+    evaluator = AlgebraEval(base=base)
+    # Expressions that raise, e.g. on a zero divisor, are left out of every stage
+    exprs = []
+    for expr in generate_corpus(spec):
+        try:
+            evaluator.evaluate(expr)
+        except EVALUATION_ERRORS:
+            continue
+        exprs.append(expr)
+
+    token_streams = [tokenize(expr, base=base) for expr in exprs]
+    trees = [parse(tokens) for tokens in token_streams]
+    values = [_evaluate_parse_tree(root, base) for root in trees]
+
+    stages: dict[str, Callable[[], object]] = {
+        "tokenize": lambda: [tokenize(expr, base=base) for expr in exprs],
+        "parse": lambda: [parse(tokens) for tokens in token_streams],
+        "evaluate": lambda: [_evaluate_parse_tree(root, base) for root in trees],
+        "num_to_str": lambda: [num_to_str(value, base) for value in values],
+        "end_to_end": lambda: [AlgebraEval(base=base).evaluate(expr) for expr in exprs],
+    }
+    chars = sum(len(expr) for expr in exprs)
+    results: dict = {
+        "spec": spec.as_dict(),
+        "expressions": len(exprs),
+        "chars": chars,
+        "stages": {},
+    }
+    for stage, run in stages.items():
+        seconds = _best_time(run, repeat)
+        results["stages"][stage] = {
+            "seconds": seconds,
+            "exprs_per_second": len(exprs) / seconds if seconds else 0.0,
+            "mb_per_second": chars / seconds / 1e6 if seconds else 0.0,
+            "peak_bytes": _peak_memory(run),
+        }
+    return results
+
+
+def _best_time(run: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _peak_memory(run: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_baseline(results: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Return a description of every stage that got slower or used more memory.
+
+    Stages are compared by time per expression, so corpora of different sizes
+    can be compared. Corpora and stages missing from either result are skipped."""
+    regressions = []
+    for name, corpus in current["corpora"].items():
+        old_corpus = baseline["corpora"].get(name)
+        if old_corpus is None:
+            continue
+        for stage, result in corpus["stages"].items():
+            old = old_corpus["stages"].get(stage)
+            if old is None:
+                continue
+            old_time = old["seconds"] / max(old_corpus["expressions"], 1)
+            new_time = result["seconds"] / max(corpus["expressions"], 1)
+            if old_time and new_time > old_time * (1 + threshold):
+                regressions.append(
+                    f"{name}/{stage}: {new_time * 1e6:.1f} us per expression, "
+                    f"was {old_time * 1e6:.1f} us ({new_time / old_time - 1:+.0%})"
+                )
+            old_peak = old["peak_bytes"] / max(old_corpus["expressions"], 1)
+            new_peak = result["peak_bytes"] / max(corpus["expressions"], 1)
+            if old_peak and new_peak > old_peak * (1 + threshold):
+                regressions.append(
+                    f"{name}/{stage}: {new_peak / 1e3:.1f} kB peak per expression, "
+                    f"was {old_peak / 1e3:.1f} kB ({new_peak / old_peak - 1:+.0%})"
+                )
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    lines = [
+        f"{'corpus':<14} {'stage':<11} {'exprs':>6} {'ms':>9} {'exprs/s':>10} "
+        f"{'MB/s':>7} {'peak kB':>9}"
+    ]
+    for name, corpus in results["corpora"].items():
+        for stage, result in corpus["stages"].items():
+            lines.append(
+                f"{name:<14} {stage:<11} {corpus['expressions']:>6} "
+                f"{result['seconds'] * 1e3:>9.2f} {result['exprs_per_second']:>10.0f} "
+                f"{result['mb_per_second']:>7.2f} {result['peak_bytes'] / 1e3:>9.1f}"
+            )
+    return "\n".join(lines)
@@ -1,2 +1,5 @@
-from .pyeval import AlgebraEval
+from .budget import BudgetExceeded
+from .compiler import CompiledExpression
+from .operators import register_operator
+from .pyeval import AlgebraEval, EvaluationResult, evaluate
 from .tokenizer import SyntaxError
@@ -1,11 +1,14 @@
 import argparse
 import logging
+import sys
 
+from .batch import evaluate_file
 from .pyeval import AlgebraEval
 from .tokenizer import SyntaxError
 
 CMD_CHAR = "#"
 
+# Profiling is enabled by --profile or by the first #stats command
 algebra_eval = AlgebraEval()
 
 
@@ -13,7 +16,7 @@ def init_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="pypratt",
         description="A pratt parser for simple algebraic expressions.",
-        usage="python -m %(prog)s [OPTIONS] message",
+        usage="python -m %(prog)s [OPTIONS] message\n       python -m %(prog)s serve [OPTIONS]",
     )
 
     parser.add_argument(
@@ -31,6 +34,56 @@ def init_parser() -> argparse.ArgumentParser:
         help="Verbose mode: Display the parse tree",
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Measure the time spent in each stage and operator for #stats",
+    )
+
+    parser.add_argument(
+        "-i",
+        "--input",
+        metavar="FILE",
+        help="Batch mode: Evaluate one expression per line of FILE ('-' for stdin)",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        help="Batch mode: Write one JSON result per line to FILE ('-' for stdout, the default)",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Batch mode: Number of worker processes (default = 1)",
+    )
+
+    parser.add_argument(
+        "--max-bits",
+        metavar="N",
+        type=int,
+        help="Batch mode: Reject results larger than N bits",
+    )
+
+    parser.add_argument(
+        "--max-cost",
+        metavar="N",
+        type=float,
+        help="Batch mode: Reject expressions estimated to cost more than N",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        metavar="SECONDS",
+        type=float,
+        help="Batch mode: Seconds allowed per expression",
+    )
+
     return parser
 
 
@@ -42,12 +95,72 @@ def pre_parse(cmd:str, args) -> str:
         case "notree":
             args.v = False 
             return "Tree display disabled"
+        case "stats":
+            if not algebra_eval.profile:
+                algebra_eval.profile = True
+                return "Profiling enabled, statistics are collected from the next expression"
+            return algebra_eval.stats_report()
+        case "resetstats":
+            algebra_eval.reset_stats()
+            return "Statistics reset"
         case _:
             return "Invalid command!"
 
 
 
+def run_batch(args) -> None:
+    """Evaluate the expressions of the input file and print a summary to stderr."""
+    source = sys.stdin if args.input in (None, "-") else open(args.input)
+    destination = (
+        sys.stdout if args.output in (None, "-") else open(args.output, "w", buffering=1 << 16)
+    )
+    try:
+        summary = evaluate_file(
+            source,
+            destination,
+            base=args.base,
+            jobs=args.jobs,
+            max_bits=args.max_bits,
+            max_cost=args.max_cost,
+            deadline=args.timeout,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
+        else:
+            destination.flush()
+
+    count = summary["expressions"]
+    seconds = summary["seconds"]
+    print(
+        f"Evaluated {count} expressions ({summary['errors']} errors) in {seconds:.3f}s"
+        f" ({count / seconds if seconds else 0:.0f} expressions/s)",
+        file=sys.stderr,
+    )
+
+
 def main() -> None:
+    if sys.argv[1:2] == ["serve"]:
+        from .server import main as serve
+
+        serve(sys.argv[2:])
+        return
+
+    parser = init_parser()
+    args = parser.parse_args()
+
+    if not args.base or args.base < 2:
+        print("Base must be a positive integer greater than 1.")
+        raise SystemExit
+
+    if args.input is not None or args.output is not None:
+        # No per-expression log records in batch mode
+        logging.basicConfig(level=logging.WARNING)
+        run_batch(args)
+        return
+
     logging.basicConfig(
         format="{asctime}: {levelname} - {name} - {message}",
         style="{",
@@ -57,13 +170,6 @@ def main() -> None:
         level=logging.INFO,
     )
 
-    parser = init_parser()
-    args = parser.parse_args()
-
-    if not args.base or args.base < 2:
-        print("Base must be a positive integer greater than 1.")
-        raise SystemExit
-
     print("Welcome to the Algebra Evaluator")
     print("You can enter algebraic expressions at the prompt or press enter to exit.")
     # print("The supported operators are: +, -, *, /, ^ and brackets.")
@@ -72,6 +178,10 @@ def main() -> None:
             "Parse tree display enabled."
         )
 
+    if args.profile:
+        algebra_eval.profile = True
+        print("Profiling enabled.")
+
     if args.base != 10:
         print(f"Using base {args.base} for evaluation.")
         algebra_eval.set_base(args.base)
@@ -85,8 +195,7 @@ def main() -> None:
 
         if expr[0] == CMD_CHAR:
             msg = pre_parse(expr[1:].strip(), args)
-            args.v = not args.v
-            print(f"Verbose mode {'enabled' if args.v else 'disabled'}.")
+            print(msg)
             continue
 
         try:
@@ -102,4 +211,5 @@ def main() -> None:
             print(f"Syntax error: {e}")
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import weakref
+
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+
+from .batch import EVALUATION_ERRORS, WorkerError, batch_result
+from .budget import BudgetExceeded, check_budget
+from .cache import ParseCache
+from .pyeval import estimate, evaluate
+from .radix import check_base
+
+
+# Size of the parse cache
+DEFAULT_CACHE_SIZE = 1024
+
+# Expressions estimated to cost more word operations than this are evaluated
+# by a worker process, the others on the event loop (see budget.estimate_tree)
+DEFAULT_OFFLOAD_COST = 1e5
+
+# Default evaluators of the module functions, by event loop
+_default_evaluators: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, "AsyncEvaluator"] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class AsyncEvaluator:
+    """Evaluate expressions from asyncio code without blocking the event loop.
+
+    Expressions are tokenized, parsed and estimated on the event loop, with a
+    parse cache. Cheap expressions are evaluated there too, and those
+    whose estimated cost exceeds offload_cost by one of up to `workers` worker
+    processes. When an offloaded evaluation is cancelled or times out, its
+    worker is terminated, so that no CPU time is spent on abandoned work even
+    inside a single operator such as a huge factorial. The worker is replaced
+    on demand, also when it dies, which raises WorkerError.
+
+    An AsyncEvaluator must be used from a single event loop."""
+
+    def __init__(
+        self,
+        *,
+        workers: int | None = None,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        offload_cost: float = DEFAULT_OFFLOAD_COST,
+        max_bits: int | None = None,
+        max_cost: float | None = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.offload_cost = offload_cost
+        self.max_bits = max_bits
+        self.max_cost = max_cost
+        self.offloaded = 0
+        self.terminated = 0
+        self.cache = ParseCache(cache_size)
+        self._idle: list[_Worker] = []
+        self._slots = asyncio.Semaphore(self.workers)
+        # Threads waiting for the results of the workers
+        self._receivers = ThreadPoolExecutor(self.workers, thread_name_prefix="pypratt-aio")
+        # Forking a process that runs threads can deadlock the child
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+
+    async def evaluate(self, expr: str, *, base: int = 10, timeout: float | None = None) -> str:
+        """Evaluate an expression, in a worker process if it is expensive.
+
+        The timeout in seconds covers the whole call, including the wait for a
+        free worker. When it expires, BudgetExceeded is raised with the limit
+        "deadline". Offloaded evaluations also check the deadline between the
+        nodes of the parse tree, so most of them stop by themselves."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            async with asyncio.timeout_at(deadline):
+                return await self._evaluate(expr, base, deadline)
+        except TimeoutError:
+            raise BudgetExceeded("Evaluation exceeded its deadline.", "deadline") from None
+
+    async def evaluate_many(
+        self, exprs: Iterable[str], *, base: int = 10, timeout: float | None = None
+    ) -> list[batch_result]:
+        """Evaluate many expressions concurrently, preserving their order.
+
+        Each item of the returned list is either the result string or the
+        exception raised by the corresponding expression. The timeout applies to
+        each expression. Cheap expressions do not wait behind expensive ones."""
+
+        async def evaluate(expr: str) -> batch_result:
+            try:
+                return await self.evaluate(expr, base=base, timeout=timeout)
+            except EVALUATION_ERRORS as e:
+                return e
+
+        return list(await asyncio.gather(*(evaluate(expr) for expr in exprs)))
+
+    async def close(self) -> None:
+        """Stop the idle worker processes.
+
+        Evaluations still running are not waited for, and should be cancelled
+        by the caller."""
+        idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+        await asyncio.to_thread(_join, idle)
+        await asyncio.to_thread(self._receivers.shutdown)
+
+    async def _evaluate(self, expr: str, base: int, deadline: float | None) -> str:
+        check_base(base)
+        estimated = estimate(expr, base, cache=self.cache)
+        check_budget(estimated, self.max_bits, self.max_cost)
+        if estimated.cost <= self.offload_cost:
+            return evaluate(expr, base, cache=self.cache).string
+
+        self.offloaded += 1
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else _Worker(self._context)
+            timeout = None if deadline is None else max(deadline - loop.time(), 0.0)
+            try:
+                worker.conn.send((expr, base, timeout))
+                result = await loop.run_in_executor(self._receivers, worker.conn.recv)
+            except (EOFError, OSError):
+                # The worker died, e.g. killed by the operating system for
+                # running out of memory. The error is raised outside of this
+                # block, since its traceback must not keep the frames of the
+                # connection alive.
+                result = None
+            except BaseException:
+                # The evaluation may be stuck in a single operator, so the
+                # only way to stop it is to stop the process
+                worker.terminate()
+                self.terminated += 1
+                raise
+            if result is None:
+                worker.terminate()
+                raise WorkerError(
+                    f"The worker process evaluating '{expr}' died "
+                    f"(exit code {worker.process.exitcode})."
+                )
+            self._idle.append(worker)
+
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class _Worker:
+    """A process evaluating the expressions sent over a pipe."""
+
+    __slots__ = ("process", "conn")
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self) -> None:
+        self.conn.send(None)
+
+    def terminate(self) -> None:
+        # The thread receiving from the worker gets an EOFError once the
+        # process is gone, so the connection is left to be garbage collected
+        self.process.terminate()
+
+
+def _worker_main(conn: Connection) -> None:
+    # The parent process handles interrupts
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            # The parent process has exited
+            return
+        if request is None:
+            return
+        expr, base, timeout = request
+        try:
+            result: str | Exception = evaluate(expr, base, deadline=timeout).string
+        except Exception as e:
+            result = e
+        conn.send(result)
+
+
+def _join(workers: list[_Worker]) -> None:
+    for worker in workers:
+        worker.process.join()
+
+
+def _default_evaluator() -> AsyncEvaluator:
+    loop = asyncio.get_running_loop()
+    evaluator = _default_evaluators.get(loop)
+    if evaluator is None:
+        evaluator = _default_evaluators[loop] = AsyncEvaluator()
+    return evaluator
+
+
+async def aevaluate(expr: str, *, base: int = 10, timeout: float | None = None) -> str:
+    """Evaluate an expression without blocking the event loop.
+
+    This uses an AsyncEvaluator shared by the calls made from the running event
+    loop. See AsyncEvaluator.evaluate."""
+    return await _default_evaluator().evaluate(expr, base=base, timeout=timeout)
+
+
+async def aevaluate_many(
+    exprs: Iterable[str], *, base: int = 10, timeout: float | None = None
+) -> list[batch_result]:
+    """Evaluate many expressions concurrently without blocking the event loop.
+
+    See AsyncEvaluator.evaluate_many."""
+    return await _default_evaluator().evaluate_many(exprs, base=base, timeout=timeout)
+
+
+async def aclose() -> None:
+    """Stop the worker processes used by aevaluate in the running event loop."""
+    evaluator = _default_evaluators.pop(asyncio.get_running_loop(), None)
+    if evaluator is not None:
+        await evaluator.close()
@@ -0,0 +1,170 @@
+import math
+
+from . import radix
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+# Below these sizes, converting to and from GMP types costs more than it saves
+GMP_MIN_FACTORIAL = 256
+GMP_MIN_POWER_BITS = 1 << 14
+GMP_MIN_CONVERSION_BITS = 1024
+
+# Results of more bits than this are rejected by all backends. GMP aborts the
+# interpreter on integers of more than about 2^37 bits, and Python would
+# exhaust the memory long before (2^36 bits are 8 GiB).
+MAX_RESULT_BITS = 1 << 36
+
+
+def check_result_bits(bits: float) -> None:
+    """Raise OverflowError if a result of this many bits exceeds MAX_RESULT_BITS."""
+    if bits > MAX_RESULT_BITS:
+        raise OverflowError(f"Integer result too large: more than {MAX_RESULT_BITS} bits.")
+
+
+# Above this argument, lgamma is too imprecise to estimate the sizes of
+# combinations and permutations of small k, which are bounded by n^k instead
+LGAMMA_MAX_ARGUMENT = 1 << 53
+
+
+def factorial_bits(n: int) -> float:
+    """Estimate the number of bits of n!, for n >= 0."""
+    if n >= LGAMMA_MAX_ARGUMENT:
+        return math.inf
+    return math.lgamma(n + 1) / math.log(2)
+
+
+def comb_bits(n: int, k: int) -> float:
+    """Estimate the number of bits of n C k, for 0 <= k <= n."""
+    k = min(k, n - k)
+    if n >= LGAMMA_MAX_ARGUMENT:
+        return k * n.bit_length()
+    return factorial_bits(n) - factorial_bits(k) - factorial_bits(n - k)
+
+
+def perm_bits(n: int, k: int) -> float:
+    """Estimate the number of bits of n P k, for 0 <= k <= n."""
+    if n >= LGAMMA_MAX_ARGUMENT:
+        return k * n.bit_length()
+    return factorial_bits(n) - factorial_bits(n - k)
+
+
+def power_bits(a: int, b: int) -> float:
+    """Bound the number of bits of a ** b, for b >= 0."""
+    return 0 if abs(a) <= 1 else a.bit_length() * b
+
+
+class NumericBackend:
+    """The big-integer arithmetic and radix conversion used by the evaluator.
+
+    This backend uses the math module, Python integers and the conversions of
+    the radix module. Subclasses may override any of the methods, but must
+    return the same Python ints and strings."""
+
+    name = "python"
+
+    def factorial(self, n: int) -> int:
+        if n > 0:
+            check_result_bits(factorial_bits(n))
+        return math.factorial(n)
+
+    def comb(self, n: int, k: int) -> int:
+        if 0 <= k <= n:
+            check_result_bits(comb_bits(n, k))
+        return math.comb(n, k)
+
+    def perm(self, n: int, k: int) -> int:
+        if 0 <= k <= n:
+            check_result_bits(perm_bits(n, k))
+        return math.perm(n, k)
+
+    def power(self, a: int, b: int) -> int:
+        """Raise an integer to a non-negative integer power."""
+        check_result_bits(power_bits(a, b))
+        return a**b
+
+    def int_to_digits(self, num: int, base: int) -> str:
+        return radix.int_to_digits(num, base)
+
+    def digits_to_int(self, digits: str, base: int) -> int:
+        return radix.digits_to_int(digits, base)
+
+
+class GmpyBackend(NumericBackend):
+    """A backend that hands large operations to GMP through gmpy2."""
+
+    name = "gmpy2"
+
+    def __init__(self):
+        if gmpy2 is None:
+            raise ImportError("The gmpy2 backend requires the gmpy2 package.")
+
+    # The sizes of the results are checked before calling GMP, which aborts
+    # the interpreter instead of raising when it runs out of memory
+
+    def factorial(self, n: int) -> int:
+        if n < GMP_MIN_FACTORIAL:
+            return math.factorial(n)
+        check_result_bits(factorial_bits(n))
+        return int(gmpy2.fac(n))
+
+    def comb(self, n: int, k: int) -> int:
+        if n < GMP_MIN_FACTORIAL or not 0 <= k <= n:
+            return math.comb(n, k)
+        check_result_bits(comb_bits(n, k))
+        return int(gmpy2.comb(n, k))
+
+    def perm(self, n: int, k: int) -> int:
+        if n < GMP_MIN_FACTORIAL or not 0 <= k <= n:
+            return math.perm(n, k)
+        check_result_bits(perm_bits(n, k))
+        # gmpy2 has no permutation function, but n P k = (n C k) * k!
+        return int(gmpy2.comb(n, k) * gmpy2.fac(k))
+
+    def power(self, a: int, b: int) -> int:
+        bits = power_bits(a, b)
+        if bits < GMP_MIN_POWER_BITS:
+            return a**b
+        check_result_bits(bits)
+        return int(gmpy2.mpz(a) ** b)
+
+    def int_to_digits(self, num: int, base: int) -> str:
+        radix.check_base(base)
+        if num.bit_length() < GMP_MIN_CONVERSION_BITS:
+            return radix.int_to_digits(num, base)
+        return gmpy2.digits(num, base).upper()
+
+    def digits_to_int(self, digits: str, base: int) -> int:
+        if len(digits) * math.log2(base) < GMP_MIN_CONVERSION_BITS:
+            return radix.digits_to_int(digits, base)
+        return int(gmpy2.mpz(digits, base))
+
+
+BACKENDS: dict[str, type[NumericBackend]] = {
+    NumericBackend.name: NumericBackend,
+    GmpyBackend.name: GmpyBackend,
+}
+
+_current: NumericBackend = GmpyBackend() if gmpy2 is not None else NumericBackend()
+
+
+def get_backend() -> NumericBackend:
+    """Return the numeric backend in use."""
+    return _current
+
+
+def set_backend(backend: str | NumericBackend) -> NumericBackend:
+    """Select the numeric backend by name ("python" or "gmpy2") or instance.
+
+    The gmpy2 backend is selected by default when gmpy2 can be imported.
+    Returns the previously used backend."""
+    global _current
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Choose one of {tuple(BACKENDS)}.")
+        backend = BACKENDS[backend]()
+    previous, _current = _current, backend
+    return previous
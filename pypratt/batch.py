@@ -0,0 +1,254 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice, tee
+from typing import TextIO
+
+from .budget import BudgetExceeded
+from .pyeval import ENGINES, evaluate
+from .tokenizer import SyntaxError
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("serial", "thread", "process")
+
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker process dies while evaluating an expression."""
+
+
+# Errors that are reported per expression instead of aborting the batch
+EVALUATION_ERRORS = (SyntaxError, ValueError, ArithmeticError, BudgetExceeded, WorkerError)
+
+# Number of chunks submitted per worker ahead of the chunk being collected
+CHUNKS_IN_FLIGHT_PER_WORKER = 4
+
+type batch_result = (
+    str | SyntaxError | ValueError | ArithmeticError | BudgetExceeded | WorkerError
+)
+
+
+def evaluate_many(
+    exprs: Iterable[str],
+    *,
+    base: int = 10,
+    workers: int | None = None,
+    backend: str = "process",
+    chunksize: int = 64,
+    engine: str = "tree",
+    cse: bool = False,
+    max_bits: int | None = None,
+    max_cost: float | None = None,
+    deadline: float | None = None,
+) -> list[batch_result]:
+    """Evaluate many expressions, preserving their order.
+
+    Each item of the returned list is either the result string or the exception
+    raised while evaluating the corresponding expression."""
+    return list(
+        iter_evaluate_many(
+            exprs,
+            base=base,
+            workers=workers,
+            backend=backend,
+            chunksize=chunksize,
+            engine=engine,
+            cse=cse,
+            max_bits=max_bits,
+            max_cost=max_cost,
+            deadline=deadline,
+        )
+    )
+
+
+def iter_evaluate_many(
+    exprs: Iterable[str],
+    *,
+    base: int = 10,
+    workers: int | None = None,
+    backend: str = "process",
+    chunksize: int = 64,
+    engine: str = "tree",
+    cse: bool = False,
+    max_bits: int | None = None,
+    max_cost: float | None = None,
+    deadline: float | None = None,
+) -> Iterator[batch_result]:
+    """Lazily evaluate many expressions, yielding the results in input order.
+
+    The expressions are split into chunks of the given size, which are evaluated
+    by a pool of worker threads or processes. Only a bounded number of chunks is
+    in flight at a time, so arbitrarily long iterables can be processed. The
+    engine, cse and budget options apply to each expression, as in AlgebraEval;
+    an expression exceeding its budget is reported as BudgetExceeded.
+
+    Worker processes start from a fresh interpreter. If one dies, e.g. when it
+    runs out of memory, the pool is replaced, the expressions of its chunk are
+    evaluated again one at a time, and those that kill a worker again are
+    reported as WorkerError."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose one of {BACKENDS}.")
+    if chunksize < 1:
+        raise ValueError("Chunk size must be a positive integer.")
+    if base < 2:
+        raise ValueError("Base must be a positive integer greater than 1.")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Choose one of {ENGINES}.")
+    options = {
+        "engine": engine,
+        "cse": cse,
+        "max_bits": max_bits,
+        "max_cost": max_cost,
+        "deadline": deadline,
+    }
+
+    chunks = _chunked(exprs, chunksize)
+    if backend == "serial":
+        for chunk in chunks:
+            yield from _evaluate_chunk(chunk, base, options)
+        return
+
+    workers = workers or os.cpu_count() or 1
+
+    def new_executor() -> Executor:
+        if backend == "process":
+            return ProcessPoolExecutor(max_workers=workers, mp_context=_process_context())
+        return ThreadPoolExecutor(max_workers=workers)
+
+    executor = new_executor()
+    max_pending = workers * CHUNKS_IN_FLIGHT_PER_WORKER
+    pending: deque[tuple[list[str], Future]] = deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(_evaluate_chunk, chunk, base, options)))
+            if len(pending) >= max_pending:
+                results, executor = _collect(pending, executor, new_executor, base, options)
+                yield from results
+        while pending:
+            results, executor = _collect(pending, executor, new_executor, base, options)
+            yield from results
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def evaluate_file(
+    source: TextIO,
+    destination: TextIO,
+    *,
+    base: int = 10,
+    jobs: int = 1,
+    chunksize: int = 64,
+    max_bits: int | None = None,
+    max_cost: float | None = None,
+    deadline: float | None = None,
+) -> dict[str, float]:
+    """Evaluate one expression per line of source and write JSON lines to destination.
+
+    Each output line holds the expression and either its "result" or its
+    "error" (the exception type) and "message", plus the "index" of syntax
+    errors. Lines are written in input order. With more than one job, the
+    expressions are evaluated by a pool of worker processes. Returns a summary
+    with the numbers of expressions and errors and the elapsed seconds. The
+    budgets apply to each expression (see iter_evaluate_many)."""
+    start = time.perf_counter()
+    # The expressions are read lazily, and the copy made by tee only holds
+    # those whose results have not been written yet
+    exprs, echoed = tee(line.rstrip("\r\n") for line in source)
+    budgets = {"max_bits": max_bits, "max_cost": max_cost, "deadline": deadline}
+    if jobs > 1:
+        results = iter_evaluate_many(
+            exprs, base=base, workers=jobs, backend="process", chunksize=chunksize, **budgets
+        )
+    else:
+        results = iter_evaluate_many(
+            exprs, base=base, backend="serial", chunksize=chunksize, **budgets
+        )
+
+    count = errors = 0
+    for expr, result in zip(echoed, results):
+        count += 1
+        if not isinstance(result, str):
+            errors += 1
+        destination.write(json.dumps({"expr": expr, **result_record(result)}))
+        destination.write("\n")
+
+    elapsed = time.perf_counter() - start
+    return {"expressions": count, "errors": errors, "seconds": elapsed}
+
+
+def result_record(result: batch_result) -> dict:
+    """Return the JSON record of a result string or an evaluation error.
+
+    The record holds either the "result" or the "error" (the exception type)
+    and "message", plus the "index" of syntax errors."""
+    if isinstance(result, str):
+        return {"result": result}
+    record: dict = {"error": type(result).__name__, "message": str(result)}
+    if isinstance(result, SyntaxError):
+        record["index"] = result.index
+    return record
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    # Forking a process that runs threads can deadlock the child
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _collect(
+    pending: deque[tuple[list[str], Future]],
+    executor: Executor,
+    new_executor: Callable[[], Executor],
+    base: int,
+    options: dict,
+) -> tuple[list[batch_result], Executor]:
+    """Return the results of the first pending chunk and the executor to use from now on.
+
+    If a worker process died, the broken pool is replaced. The expressions of
+    the chunk are evaluated again one at a time, each one that kills a worker
+    is reported as WorkerError, and the other pending chunks are resubmitted."""
+    chunk, future = pending.popleft()
+    try:
+        return future.result(), executor
+    except BrokenProcessPool:
+        pass
+    logger.warning(f"A worker process died, evaluating {len(chunk)} expressions one at a time.")
+    executor.shutdown(cancel_futures=True)
+    executor = new_executor()
+    results: list[batch_result] = []
+    for expr in chunk:
+        try:
+            results.extend(executor.submit(_evaluate_chunk, [expr], base, options).result())
+        except BrokenProcessPool:
+            executor.shutdown(cancel_futures=True)
+            executor = new_executor()
+            results.append(WorkerError(f"The worker process evaluating '{expr}' died."))
+    for index, (other, other_future) in enumerate(pending):
+        if other_future.exception() is not None:
+            pending[index] = (other, executor.submit(_evaluate_chunk, other, base, options))
+    return results, executor
+
+
+def _chunked(exprs: Iterable[str], chunksize: int) -> Iterator[list[str]]:
+    iterator = iter(exprs)
+    while chunk := list(islice(iterator, chunksize)):
+        yield chunk
+
+
+def _evaluate_chunk(exprs: list[str], base: int, options: dict) -> list[batch_result]:
+    results: list[batch_result] = []
+    for expr in exprs:
+        try:
+            results.append(evaluate(expr, base, **options).string)
+        except EVALUATION_ERRORS as e:
+            results.append(e)
+    return results
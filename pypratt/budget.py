@@ -0,0 +1,328 @@
+import math
+import time
+
+from collections.abc import Callable, Sequence
+
+from .num_utils import DECIMAL_POINT, SEPARATOR, str_to_int
+from .operators import (
+    OP_ADD,
+    OP_CHOOSE,
+    OP_DIVIDE,
+    OP_EXPONENT,
+    OP_FACTORIAL,
+    OP_MODULO,
+    OP_MULTIPLY,
+    OP_NEGATE,
+    OP_PERMUTE,
+    OP_SUBTRACT,
+    Operator,
+    get_operator_table,
+)
+from .parser import Node
+from .tokenizer import TokenTypes
+
+
+# Costs are measured in operations on the 30-bit digits of Python integers
+WORD_BITS = 30
+# Operand size in words above which CPython multiplies with Karatsuba's algorithm
+KARATSUBA_CUTOFF = 70
+KARATSUBA_EXPONENT = math.log2(3)
+
+# Floats cannot hold more than this many bits before overflowing
+FLOAT_BITS = 1024
+
+# Results of exact operands that are estimated to fit in this many bits are
+# computed during estimation, so that the operators above them are estimated
+# from exact values, e.g. the factorial in (2^10)!
+EXACT_BITS = 64
+
+# Literals of up to this many digits are converted to get their exact values
+EXACT_DIGITS = 18
+
+LN2 = math.log(2)
+
+
+class BudgetExceeded(Exception):
+    """Raised when an expression exceeds the resource budget of the evaluator.
+
+    The "limit" attribute names the budget that was exceeded ("bits", "cost" or
+    "deadline")."""
+
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.message = message
+        self.limit = limit
+
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.limit))
+
+
+class Estimate:
+    """Upper bounds on the size and cost of the value of a subtree.
+
+    bits is a bound on log2 of the absolute value (0 for values up to 1),
+    peak_bits the largest such bound over the subtree, and cost the estimated
+    number of word operations needed to evaluate the subtree. The exact value
+    is known (not None) when it is small and all its operands are known."""
+
+    __slots__ = ("bits", "peak_bits", "cost", "is_int", "value")
+
+    def __init__(
+        self,
+        bits: float,
+        cost: float,
+        is_int: bool = True,
+        value: int | None = None,
+        peak_bits: float | None = None,
+    ):
+        self.bits = bits if is_int else min(bits, FLOAT_BITS)
+        self.peak_bits = self.bits if peak_bits is None else max(self.bits, peak_bits)
+        self.cost = cost
+        self.is_int = is_int
+        self.value = value
+
+    def __repr__(self):
+        return (
+            f"Estimate(bits={self.bits:.4g}, peak_bits={self.peak_bits:.4g}, "
+            f"cost={self.cost:.4g})"
+        )
+
+
+def estimate_tree(
+    root: Node, base: int, variables: Sequence[int | float] | None = None
+) -> Estimate:
+    """Estimate the size of the result and the cost of evaluating a parse tree.
+
+    The estimate is computed bottom up from the lengths of the literals, using
+    log-gamma for factorials, combinations and permutations, without evaluating
+    any expensive operator. It includes the cost of converting the result to a
+    string. Shared subtrees of a DAG (see dag.intern_subtrees) are counted once.
+    The values of the variables are looked up in variables by their slot index
+    (see parser.assign_variable_slots), and unbound variables are estimated as 0."""
+    result = estimate_subtrees(root, base, variables)[id(root)]
+    return Estimate(
+        result.bits,
+        result.cost + (_conversion_cost(result.bits) if result.is_int else 1),
+        result.is_int,
+        result.value,
+        result.peak_bits,
+    )
+
+
+def estimate_subtrees(
+    root: Node, base: int, variables: Sequence[int | float] | None = None
+) -> dict[int, Estimate]:
+    """Estimate the value of every subtree of a parse tree, by node id.
+
+    Unlike estimate_tree, the estimates do not include converting the values to
+    strings."""
+    estimates: dict[int, Estimate] = {}
+    operators = get_operator_table().operators
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if id(node) in estimates:
+            continue
+        token = node.token
+        if token is None:
+            raise ValueError("Cannot estimate a node without a token.")
+
+        if token.type == TokenTypes.NUMBER:
+            estimates[id(node)] = _estimate_literal(token.value, base)
+        elif token.type == TokenTypes.VARIABLE:
+            if variables is None or node.slot is None:
+                estimates[id(node)] = Estimate(0, 0)
+            else:
+                estimates[id(node)] = _estimate_number(variables[node.slot])
+        elif not children_done:
+            stack.append((node, True))
+            for child in (node.right, node.left):
+                if child is not None:
+                    stack.append((child, False))
+        else:
+            operands = [
+                estimates[id(child)] for child in (node.left, node.right) if child is not None
+            ]
+            estimates[id(node)] = _estimate_operator(operators[node.opcode], operands)
+    return estimates
+
+
+def check_budget(estimate: Estimate, max_bits: int | None, max_cost: float | None) -> None:
+    """Raise BudgetExceeded if the estimate exceeds one of the given limits."""
+    if max_bits is not None and estimate.peak_bits > max_bits:
+        raise BudgetExceeded(
+            f"Estimated size of {estimate.peak_bits:.4g} bits exceeds the limit of {max_bits} bits.",
+            "bits",
+        )
+    if max_cost is not None and estimate.cost > max_cost:
+        raise BudgetExceeded(
+            f"Estimated cost of {estimate.cost:.4g} exceeds the limit of {max_cost:.4g}.",
+            "cost",
+        )
+
+
+def check_deadline(deadline: float) -> None:
+    """Raise BudgetExceeded if the time.monotonic() deadline has passed."""
+    if time.monotonic() > deadline:
+        raise BudgetExceeded("Evaluation exceeded its deadline.", "deadline")
+
+
+def _estimate_literal(literal: str, base: int) -> Estimate:
+    digits = literal.replace(SEPARATOR, "")
+    bits = len(digits) * math.log2(base)
+    if DECIMAL_POINT in digits:
+        return Estimate(bits, _words(bits), is_int=False)
+    if len(digits) <= EXACT_DIGITS:
+        try:
+            value = str_to_int(digits, base)
+        except ValueError:
+            # The error is raised when the tree is evaluated
+            return Estimate(0, 1)
+        return Estimate(_bits_of(value), 1, value=value)
+    return Estimate(bits, _conversion_cost(bits))
+
+
+def _estimate_number(value: int | float) -> Estimate:
+    if isinstance(value, int):
+        bits = _bits_of(value)
+        return Estimate(bits, 1, value=value if bits <= EXACT_BITS else None)
+    return Estimate(_bits_of(value) if math.isfinite(value) else FLOAT_BITS, 1, is_int=False)
+
+
+def _estimate_operator(op: Operator, operands: list[Estimate]) -> Estimate:
+    children_cost = sum(operand.cost for operand in operands)
+    peak_bits = max(operand.peak_bits for operand in operands)
+    is_int = all(operand.is_int for operand in operands)
+
+    if not is_int and op is not OP_NEGATE:
+        # Float arithmetic takes constant time, and the combinatorial
+        # operators reject floats before doing any work
+        bits, cost = FLOAT_BITS, 1.0
+    else:
+        estimator = _OPERATOR_ESTIMATORS.get(op)
+        if estimator is None:
+            # Registered operators are assumed to be as costly as multiplying
+            # their operands, or negating their operand
+            estimator = _estimate_multiply if len(operands) == 2 else _estimate_negate
+        bits, cost, is_int = estimator(*operands)
+
+    value = None
+    if bits <= EXACT_BITS and is_int and all(operand.value is not None for operand in operands):
+        try:
+            value = op.function(*(operand.value for operand in operands))
+        except (ValueError, ArithmeticError):
+            # The error is raised when the tree is evaluated
+            pass
+        else:
+            if isinstance(value, int):
+                bits = _bits_of(value)
+            else:
+                value = None
+
+    return Estimate(bits, children_cost + cost, is_int, value, peak_bits)
+
+
+def _estimate_negate(a: Estimate) -> tuple[float, float, bool]:
+    return a.bits, _words(a.bits), a.is_int
+
+
+def _estimate_add(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    bits = max(a.bits, b.bits) + 1
+    return bits, _words(bits), True
+
+
+def _estimate_multiply(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    return a.bits + b.bits, _multiplication_cost(a.bits, b.bits), True
+
+
+def _estimate_divide(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    return FLOAT_BITS, _words(a.bits) + _words(b.bits), False
+
+
+def _estimate_modulo(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    return min(a.bits, b.bits), _words(a.bits) * _words(b.bits), True
+
+
+def _estimate_exponent(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    exponent = _magnitude(b)
+    if b.value is not None and b.value < 0:
+        return FLOAT_BITS, 1.0, False
+    if a.value is not None and abs(a.value) <= 1:
+        return 0, math.log2(exponent + 1), True
+    bits = max(a.bits, 1) * exponent
+    # Repeated squaring, dominated by the last squaring
+    return bits, 2 * _multiplication_cost(bits / 2, bits / 2), True
+
+
+def _estimate_factorial(a: Estimate) -> tuple[float, float, bool]:
+    n = _magnitude(a)
+    bits = _log2_factorial(n)
+    return bits, _multiplication_cost(bits / 2, bits / 2) * math.log2(n + 2), True
+
+
+def _estimate_choose(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    n = _magnitude(a)
+    if a.value is not None and b.value is not None and 0 <= b.value <= a.value:
+        k = min(b.value, a.value - b.value)
+        bits = _log2_factorial(n) - _log2_factorial(k) - _log2_factorial(n - k)
+    else:
+        k = min(_magnitude(b), n / 2)
+        bits = min(n, k * math.log2(n + 1))
+    return bits, _multiplication_cost(bits / 2, bits / 2) * math.log2(k + 2), True
+
+
+def _estimate_permute(a: Estimate, b: Estimate) -> tuple[float, float, bool]:
+    n = _magnitude(a)
+    k = min(_magnitude(b), n)
+    if a.value is not None and b.value is not None and 0 <= b.value <= a.value:
+        bits = _log2_factorial(n) - _log2_factorial(n - k)
+    else:
+        bits = min(_log2_factorial(n), k * math.log2(n + 1))
+    return bits, _multiplication_cost(bits / 2, bits / 2) * math.log2(k + 2), True
+
+
+_OPERATOR_ESTIMATORS: dict[Operator, Callable[..., tuple[float, float, bool]]] = {
+    OP_NEGATE: _estimate_negate,
+    OP_ADD: _estimate_add,
+    OP_SUBTRACT: _estimate_add,
+    OP_MULTIPLY: _estimate_multiply,
+    OP_DIVIDE: _estimate_divide,
+    OP_MODULO: _estimate_modulo,
+    OP_EXPONENT: _estimate_exponent,
+    OP_FACTORIAL: _estimate_factorial,
+    OP_CHOOSE: _estimate_choose,
+    OP_PERMUTE: _estimate_permute,
+}
+
+
+def _bits_of(value: int) -> float:
+    return math.log2(abs(value)) if abs(value) > 1 else 0.0
+
+
+def _magnitude(estimate: Estimate) -> float:
+    """Return an upper bound of the absolute value of an estimate."""
+    if estimate.value is not None:
+        return float(abs(estimate.value))
+    if estimate.bits >= FLOAT_BITS:
+        return math.inf
+    return 2.0**estimate.bits
+
+
+def _log2_factorial(n: float) -> float:
+    return math.lgamma(n + 1) / LN2 if n < math.inf else math.inf
+
+
+def _words(bits: float) -> float:
+    return bits / WORD_BITS + 1
+
+
+def _multiplication_cost(a_bits: float, b_bits: float) -> float:
+    small, large = sorted((_words(a_bits), _words(b_bits)))
+    if small < KARATSUBA_CUTOFF:
+        return small * large
+    return large * small ** (KARATSUBA_EXPONENT - 1)
+
+
+def _conversion_cost(bits: float) -> float:
+    # Divide-and-conquer radix conversion: one multiplication per level
+    return _multiplication_cost(bits, bits) * math.log2(_words(bits) + 1)
@@ -0,0 +1,89 @@
+import threading
+
+from collections import OrderedDict
+
+from .parser import Node
+from .tokenizer import TokenStream
+from .vm import Program
+
+
+type cache_key = tuple[str, int, bool]
+type cache_entry = tuple[TokenStream, Node, Program | None]
+
+
+class ParseCache:
+    """A size-bounded LRU cache of token streams, parse trees and VM programs.
+
+    Entries are keyed by the expression string, the base it was tokenized
+    in, and whether its identical subtrees are shared (see dag.intern_subtrees),
+    since the parse tree and the program differ. When the cache is full, the least recently used entry is evicted. The
+    cache can be shared between threads."""
+
+    def __init__(self, capacity: int = 256):
+        if capacity < 1:
+            raise ValueError("Cache capacity must be a positive integer.")
+
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[cache_key, cache_entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self):
+        return (
+            f"ParseCache(size={len(self)}, capacity={self.capacity}, "
+            f"hits={self.hits}, misses={self.misses}, evictions={self.evictions})"
+        )
+
+    def get(self, expr: str, base: int, cse: bool = False) -> cache_entry | None:
+        """Return the cached tokens, parse tree and program, or None on a miss."""
+        key = (expr, base, cse)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        expr: str,
+        base: int,
+        tokens: TokenStream,
+        root: Node,
+        program: Program | None = None,
+        cse: bool = False,
+    ) -> None:
+        """Store the tokens, parse tree and program, evicting the oldest entry if needed."""
+        key = (expr, base, cse)
+        with self._lock:
+            self._entries[key] = (tokens, root, program)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self) -> dict[str, int]:
+        """Return the cache counters as a dictionary."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+            }
@@ -0,0 +1,416 @@
+import logging
+import math
+
+from collections.abc import Callable, Mapping
+from functools import cache
+from typing import Any
+
+from .cache import ParseCache
+from .inference import literal_value
+from .operators import (
+    INFIX,
+    OP_ADD,
+    OP_CHOOSE,
+    OP_DIVIDE,
+    OP_EXPONENT,
+    OP_FACTORIAL,
+    OP_MODULO,
+    OP_MULTIPLY,
+    OP_NEGATE,
+    OP_PERMUTE,
+    OP_SUBTRACT,
+    Operator,
+    OperatorTable,
+    get_operator_table,
+)
+from .parser import Node, assign_variable_slots
+from .pyeval import _parse_expression
+from .tokenizer import TokenTypes
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+# Number of rows evaluated at once, which bounds the memory of the intermediate columns
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+INT64_MAX = 2**63 - 1
+# Integers of at most this magnitude are converted to floats exactly
+FLOAT_EXACT_MAX = 2**53
+# The largest n for which n! and n P k fit in an int64
+MAX_INT64_FACTORIAL = 20
+# The largest n for which every n C k fits in an int64
+MAX_INT64_COMB = 66
+
+# A column is an array, or a number that is the same for all rows
+type column = Any
+
+
+def evaluate_columns(
+    expr: str,
+    base: int | Any = 10,
+    columns: Mapping[str, Any] | None = None,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: ParseCache | None = None,
+) -> Any:
+    """Evaluate an expression over whole columns of variable values and bases.
+
+    The columns bind the variables of the expression to one-dimensional arrays
+    of equal length, or to numbers shared by all rows, and the base may also be
+    an array of bases. The expression is parsed once per distinct base, and
+    each node of the parse tree is then evaluated with one vectorized NumPy
+    operation per chunk of chunk_size rows, which bounds the memory of the
+    intermediate columns. Subtrees without variables, like 1000! in
+    1000! + x, are evaluated once before the rows. Columns that bind no
+    variable of the expression are ignored.
+
+    The results are those of the other engines, except that powers of floats
+    are computed by NumPy and may differ in the last bit. Integer columns are
+    int64 as long as the bounds of the operands rule out an overflow, and
+    operators whose results may not fit, like 30!, or that NumPy computes
+    differently, like a division by zero, fall back to an object column of
+    Python numbers, which evaluates the operator functions row by row.
+    Registered operators are always evaluated row by row. Like in NumPy, a
+    column mixing integers and floats is returned as floats, unless it is an
+    object column.
+
+    Returns an array with one result per row."""
+    if np is None:
+        raise ImportError("Columnar evaluation requires the numpy package.")
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be a positive number of rows.")
+
+    bases = _column(base)
+    if not isinstance(bases, np.ndarray):
+        groups = [(bases, None)]
+    elif bases.dtype.kind != "i":
+        raise ValueError("Bases must be integers.")
+    else:
+        distinct, inverse = np.unique(bases, return_inverse=True)
+        groups = [(int(b), np.flatnonzero(inverse == i)) for i, b in enumerate(distinct)]
+
+    trees = []
+    for group_base, rows in groups:
+        if group_base < 2:
+            raise ValueError("Base must be a positive integer greater than 1.")
+        _, root, _, _ = _parse_expression(expr, group_base, cache, False)
+        trees.append((root, assign_variable_slots(root), group_base, rows))
+    known = {name for _, names, _, _ in trees for name in names}
+    columns = columns or {}
+    unknown = columns.keys() - known
+    if unknown:
+        logger.info(f"Ignoring the columns of unknown variables: {', '.join(sorted(unknown))}")
+    bound = {name: _column(values) for name, values in columns.items() if name in known}
+    lengths = {len(values) for values in (*bound.values(), bases) if isinstance(values, np.ndarray)}
+    if not lengths:
+        raise ValueError("At least one column or the base must be an array.")
+    if len(lengths) > 1:
+        raise ValueError(f"Columns must have the same length, got {sorted(lengths)}.")
+    length = lengths.pop()
+
+    logger.info(
+        f"Evaluating '{expr}' over {length} rows in {len(groups)} bases, "
+        f"{chunk_size} rows at a time"
+    )
+    functions = _operator_functions(get_operator_table())
+    # Values of the subtrees without variables, shared by all chunks and bases
+    folded: dict[tuple, column] = {}
+    out = None
+    for root, names, group_base, rows in trees:
+        try:
+            variables = [bound[name] for name in names]
+        except KeyError as e:
+            raise ValueError(f"Variable '{e.args[0]}' is not bound.") from None
+        count = length if rows is None else len(rows)
+        constants = _fold_constants(root, group_base, folded) if count else {}
+        for start in range(0, count, chunk_size):
+            stop = min(start + chunk_size, count)
+            index = slice(start, stop) if rows is None else rows[start:stop]
+            chunk = [v[index] if isinstance(v, np.ndarray) else v for v in variables]
+            with np.errstate(all="ignore"):
+                values = _evaluate_node(root, group_base, chunk, constants, functions)
+            out = _store(out, length, index, _as_array(values), stop - start)
+    assert out is not None or length == 0
+    return out if out is not None else np.empty(0, dtype=np.int64)
+
+
+def _column(values: Any) -> column:
+    """Convert the values of a variable to an int64, float64 or object array, or a number."""
+    if isinstance(values, (int, float)):
+        return values
+    if isinstance(values, np.generic):
+        return values.item()
+    array = np.asarray(values)
+    if array.ndim != 1:
+        raise ValueError("Columns must be one-dimensional arrays or numbers.")
+    kind = array.dtype.kind
+    if kind == "u" and array.size and array.max() > INT64_MAX:
+        return array.astype(object)
+    if kind in "biu":
+        return array.astype(np.int64, copy=False)
+    if kind == "f":
+        return array.astype(np.float64, copy=False)
+    if kind == "O":
+        return array
+    raise ValueError(f"Columns must be numeric, got an array of {array.dtype}.")
+
+
+def _as_array(value: column) -> Any:
+    """Convert a number to a 0-d array, keeping integers that do not fit in an int64 exact."""
+    if isinstance(value, np.ndarray):
+        return value
+    if isinstance(value, int) and not -INT64_MAX <= value <= INT64_MAX:
+        return np.array(value, dtype=object)
+    return np.asarray(value)
+
+
+def _store(out: Any, length: int, index: slice | Any, values: Any, count: int) -> Any:
+    """Store the results of a chunk, promoting the output to a common dtype."""
+    if out is None:
+        out = np.empty(length, dtype=values.dtype)
+    else:
+        dtype = np.result_type(out, values)
+        if dtype != out.dtype:
+            out = out.astype(dtype)
+    out[index] = np.broadcast_to(values, (count,))
+    return out
+
+
+def _evaluate_node(
+    root: Node | None,
+    base: int,
+    variables: list[column],
+    constants: dict[int, column],
+    functions: tuple[tuple[Callable | None, Any], ...],
+) -> column:
+    """Evaluate a parse tree over a chunk of rows, in post-order with explicit stacks.
+
+    The values of the subtrees without variables are taken from constants, by
+    node id (see _fold_constants)."""
+    values: list[column] = []
+    # Nodes to visit, and whether the values of their operands are on values
+    stack: list[tuple[Node | None, bool]] = [(root, False)]
+    while stack:
+        node, operands_done = stack.pop()
+        if operands_done:
+            assert node is not None and node.token is not None
+            arity = 2 if node.token.type == TokenTypes.BINARY_OP else 1
+            operands = values[-arity:]
+            del values[-arity:]
+            values.append(_apply(node.opcode, operands, functions))
+        elif node is None:
+            raise ValueError("Cannot evaluate an empty tree.")
+        elif id(node) in constants:
+            values.append(constants[id(node)])
+        elif node.token is None:
+            raise ValueError("Cannot evaluate a node without a token.")
+        elif node.token.type == TokenTypes.VARIABLE:
+            assert node.slot is not None
+            values.append(variables[node.slot])
+        elif node.token.type == TokenTypes.BINARY_OP:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+        elif node.token.type in (TokenTypes.PREFIX_UNARY_OP, TokenTypes.POSTFIX_UNARY_OP):
+            stack.append((node, True))
+            stack.append((node.left, False))
+        else:
+            raise ValueError(f"Cannot evaluate a node of type {node.token.type.name}.")
+    return values.pop()
+
+
+def _fold_constants(root: Node, base: int, folded: dict[tuple, column]) -> dict[int, column]:
+    """Evaluate the subtrees of a parse tree that have no variables, by node id.
+
+    The values of operators are memoized in folded by opcode and operands, so
+    that the parse trees of other bases share them. The operands are keyed
+    with their types, since e.g. 2 ^ 3 and 2.0 ^ 3 differ."""
+    functions = get_operator_table().functions
+    constants: dict[int, column] = {}
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        token = node.token
+        assert token is not None
+        if token.type == TokenTypes.NUMBER:
+            constants[id(node)] = literal_value(node, base)
+        elif token.type == TokenTypes.VARIABLE:
+            pass
+        elif not children_done:
+            stack.append((node, True))
+            for child in (node.right, node.left):
+                if child is not None:
+                    stack.append((child, False))
+        elif all(id(child) in constants for child in (node.left, node.right) if child is not None):
+            operands = [constants[id(child)] for child in (node.left, node.right) if child is not None]
+            key = (node.opcode, *((type(value), value) for value in operands))
+            if key not in folded:
+                folded[key] = functions[node.opcode](*operands)
+            constants[id(node)] = folded[key]
+    return constants
+
+
+def _apply(
+    opcode: int, operands: list[column], functions: tuple[tuple[Callable | None, Any], ...]
+) -> column:
+    """Apply an operator to columns, vectorized if possible."""
+    vectorized, row_function = functions[opcode]
+    if not any(isinstance(operand, np.ndarray) for operand in operands):
+        return get_operator_table().functions[opcode](*operands)
+    arrays = [_as_array(operand) for operand in operands]
+    if vectorized is not None and all(array.dtype != object for array in arrays):
+        result = vectorized(*arrays)
+        if result is not None:
+            return result
+    return row_function(*(array.astype(object) for array in arrays))
+
+
+@cache
+def _operator_functions(table: OperatorTable) -> tuple[tuple[Callable | None, Any], ...]:
+    """Return the vectorized function and the row by row ufunc of each operator, by opcode.
+
+    A vectorized function takes int64 or float64 arrays and returns None if its
+    result may differ from that of the operator function, e.g. on overflow."""
+    return tuple(
+        (_VECTORIZED.get(op), np.frompyfunc(op.function, 2 if fixity == INFIX else 1, 1))
+        for op, fixity in zip(table.operators, table.fixities)
+    )
+
+
+# Vectorized versions of the operators. Integer results are checked against
+# the bounds of the operands, which is cheaper than checking each row.
+
+
+def _is_int(*arrays: Any) -> bool:
+    return all(array.dtype.kind == "i" for array in arrays)
+
+
+def _bounds(array: Any) -> tuple[int, int]:
+    return int(array.min()), int(array.max())
+
+
+def _fits(*values: int, limit: int = INT64_MAX) -> bool:
+    # -2^63 is excluded, so that negating and dividing it cannot overflow
+    return all(-limit <= value <= limit for value in values)
+
+
+def _negate(a: Any) -> Any:
+    if _is_int(a) and not _fits(*_bounds(a)):
+        return None
+    return np.negative(a)
+
+
+def _add(a: Any, b: Any) -> Any:
+    if _is_int(a, b):
+        (a_low, a_high), (b_low, b_high) = _bounds(a), _bounds(b)
+        if not _fits(a_low + b_low, a_high + b_high):
+            return None
+    return np.add(a, b)
+
+
+def _subtract(a: Any, b: Any) -> Any:
+    if _is_int(a, b):
+        (a_low, a_high), (b_low, b_high) = _bounds(a), _bounds(b)
+        if not _fits(a_low - b_high, a_high - b_low):
+            return None
+    return np.subtract(a, b)
+
+
+def _multiply(a: Any, b: Any) -> Any:
+    if _is_int(a, b):
+        (a_low, a_high), (b_low, b_high) = _bounds(a), _bounds(b)
+        if not _fits(a_low * b_low, a_low * b_high, a_high * b_low, a_high * b_high):
+            return None
+    return np.multiply(a, b)
+
+
+def _divide(a: Any, b: Any) -> Any:
+    # Python divides integers exactly before rounding, NumPy converts them to floats first
+    if not b.all() or (_is_int(a, b) and not _fits(*_bounds(a), *_bounds(b), limit=FLOAT_EXACT_MAX)):
+        return None
+    return np.true_divide(a, b)
+
+
+def _modulo(a: Any, b: Any) -> Any:
+    if not b.all() or (_is_int(a, b) and not _fits(*_bounds(a), *_bounds(b))):
+        return None
+    return np.remainder(a, b)
+
+
+def _power(a: Any, b: Any) -> Any:
+    if _is_int(a, b):
+        a_low, a_high = _bounds(a)
+        b_low, b_high = _bounds(b)
+        # Negative integer exponents give floats
+        if b_low < 0:
+            return None
+        magnitude = max(-a_low, a_high)
+        if magnitude > 1 and magnitude.bit_length() * b_high >= 64:
+            return None
+        return np.power(a, b)
+    result = np.power(a, b, dtype=np.float64)
+    # Python raises on overflow and returns complex roots of negative numbers
+    if (~np.isfinite(result) & np.isfinite(a) & np.isfinite(b)).any():
+        return None
+    return result
+
+
+def _factorial(a: Any) -> Any:
+    if not _is_int(a):
+        return None
+    low, high = _bounds(a)
+    if low < 0 or high > MAX_INT64_FACTORIAL:
+        return None
+    return _factorial_table()[a]
+
+
+def _choose(n: Any, k: Any) -> Any:
+    if not _is_int(n, k) or ((k < 0) | (k > n)).any() or n.max() > MAX_INT64_COMB:
+        return None
+    return _comb_table()[n, k]
+
+
+def _permute(n: Any, k: Any) -> Any:
+    if not _is_int(n, k) or ((k < 0) | (k > n)).any() or n.max() > MAX_INT64_FACTORIAL:
+        return None
+    return _perm_table()[n, k]
+
+
+@cache
+def _factorial_table() -> Any:
+    return np.array([math.factorial(n) for n in range(MAX_INT64_FACTORIAL + 1)], dtype=np.int64)
+
+
+@cache
+def _comb_table() -> Any:
+    size = MAX_INT64_COMB + 1
+    return np.array(
+        [[math.comb(n, k) for k in range(size)] for n in range(size)], dtype=np.int64
+    )
+
+
+@cache
+def _perm_table() -> Any:
+    size = MAX_INT64_FACTORIAL + 1
+    return np.array(
+        [[math.perm(n, k) for k in range(size)] for n in range(size)], dtype=np.int64
+    )
+
+
+_VECTORIZED: dict[Operator, Callable[..., Any]] = {
+    OP_NEGATE: _negate,
+    OP_ADD: _add,
+    OP_SUBTRACT: _subtract,
+    OP_MULTIPLY: _multiply,
+    OP_DIVIDE: _divide,
+    OP_MODULO: _modulo,
+    OP_EXPONENT: _power,
+    OP_FACTORIAL: _factorial,
+    OP_CHOOSE: _choose,
+    OP_PERMUTE: _permute,
+}
@@ -0,0 +1,222 @@
+import ast
+import logging
+import time
+
+from collections.abc import Callable
+
+from .budget import check_budget, estimate_tree
+from .inference import literal_value
+from .num_utils import num_to_str
+from .operators import (
+    Operator,
+    OP_NEGATE,
+    OP_ADD,
+    OP_SUBTRACT,
+    OP_MULTIPLY,
+    OP_DIVIDE,
+    OP_MODULO,
+    get_operator_table,
+)
+from .parser import Node, assign_variable_slots
+from .tokenizer import TokenTypes
+
+logger = logging.getLogger(__name__)
+
+
+# Operators whose functions are plain Python arithmetic are emitted as native
+# BinOp and UnaryOp nodes; everything else becomes a call to the operator's function.
+INLINE_BINARY_OPS: dict[Operator, type[ast.operator]] = {
+    OP_ADD: ast.Add,
+    OP_SUBTRACT: ast.Sub,
+    OP_MULTIPLY: ast.Mult,
+    OP_DIVIDE: ast.Div,
+    OP_MODULO: ast.Mod,
+}
+
+INLINE_UNARY_OPS: dict[Operator, type[ast.unaryop]] = {
+    OP_NEGATE: ast.USub,
+}
+
+
+class CompiledExpression:
+    """An expression compiled once into a Python function.
+
+    Calling the object evaluates the expression without tokenizing, parsing or
+    walking the parse tree again, and returns the result as a string in the
+    base used for compilation. Values for the variables of the expression are
+    passed as keyword arguments, or positionally in the order in which the
+    variables first appear in the expression. If a check is given, it is
+    called with the bound values before each evaluation, e.g. to apply budgets."""
+
+    def __init__(
+        self,
+        expr: str,
+        base: int,
+        function,
+        variables: list[str],
+        check: Callable[[tuple[int | float, ...]], None] | None = None,
+    ):
+        self.expr = expr
+        self.base = base
+        self.function = function
+        self.variables = variables
+        self.check = check
+        self._slots = {name: slot for slot, name in enumerate(variables)}
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expr!r}, base={self.base})"
+
+    def value(self, *args: int | float, **bindings: int | float) -> int | float:
+        """Evaluate the compiled expression and return the numeric result."""
+        if bindings:
+            if args:
+                raise ValueError("Cannot mix positional and keyword variable bindings.")
+            args = self._bind(bindings)
+        elif len(args) != len(self.variables):
+            raise ValueError(
+                f"Expected {len(self.variables)} variable bindings, got {len(args)}."
+            )
+        if self.check is not None:
+            self.check(args)
+        return self.function(*args)
+
+    def __call__(self, *args: int | float, **bindings: int | float) -> str:
+        return num_to_str(self.value(*args, **bindings), self.base)
+
+    def _bind(self, bindings: dict[str, int | float]) -> tuple[int | float, ...]:
+        """Order the keyword bindings by variable slot."""
+        unknown = bindings.keys() - self._slots.keys()
+        if unknown:
+            raise ValueError(f"Unknown variables: {', '.join(sorted(unknown))}.")
+        try:
+            return tuple(bindings[name] for name in self.variables)
+        except KeyError as e:
+            raise ValueError(f"Variable '{e.args[0]}' is not bound.") from None
+
+
+def compile_tree(
+    root: Node,
+    base: int,
+    expr: str = "",
+    *,
+    max_bits: int | None = None,
+    max_cost: float | None = None,
+    deadline: float | None = None,
+) -> CompiledExpression:
+    """Compile a parse tree into a CompiledExpression.
+
+    The tree is translated into a lambda whose positional parameters are the
+    variable slots of the expression. Trees too deep for CPython's compiler
+    are evaluated by the tree evaluator when called.
+
+    The budgets are those of AlgebraEval. Without variables, the estimate is
+    checked once here, and otherwise on each call with the bound values.
+    Compiled code cannot check a deadline between operators, so with a
+    deadline each call is evaluated by the tree evaluator instead."""
+    variables = assign_variable_slots(root)
+    check = None
+    if max_bits is not None or max_cost is not None:
+        if variables:
+
+            def check(args: tuple[int | float, ...]) -> None:
+                check_budget(estimate_tree(root, base, args), max_bits, max_cost)
+
+        else:
+            check_budget(estimate_tree(root, base), max_bits, max_cost)
+    if deadline is not None:
+        return CompiledExpression(
+            expr, base, _tree_function(root, base, deadline), variables, check
+        )
+
+    namespace: dict = {"__builtins__": {}}
+    body = _build_ast(root, base, namespace)
+    params = [ast.arg(arg=_slot_name(slot)) for slot in range(len(variables))]
+    func = ast.Lambda(
+        args=ast.arguments(
+            posonlyargs=params, args=[], kwonlyargs=[], kw_defaults=[], defaults=[]
+        ),
+        body=body,
+    )
+    try:
+        tree = ast.fix_missing_locations(ast.Expression(body=func))
+        code = compile(tree, filename=f"<pypratt {expr!r}>", mode="eval")
+    except (RecursionError, MemoryError):
+        # CPython walks the AST recursively, so very deep trees are evaluated
+        # by the iterative tree evaluator instead
+        logger.info(f"Expression '{expr}' is too deep to compile, using the tree evaluator.")
+        return CompiledExpression(expr, base, _tree_function(root, base), variables, check)
+    return CompiledExpression(expr, base, eval(code, namespace), variables, check)
+
+
+def _tree_function(root: Node, base: int, deadline: float | None = None) -> Callable:
+    """Return a function evaluating the parse tree with the variable slots as parameters.
+
+    The deadline is in seconds from the start of each call."""
+    from .pyeval import _evaluate_parse_tree
+
+    def function(*args: int | float) -> int | float:
+        stop = None if deadline is None else time.monotonic() + deadline
+        return _evaluate_parse_tree(root, base, args, deadline=stop)
+
+    return function
+
+
+def _slot_name(slot: int) -> str:
+    return f"_v{slot}"
+
+
+def _bind_function(op: Operator, namespace: dict) -> ast.Name:
+    """Bind the function of an operator in the namespace and return a reference to it."""
+    name = f"_op_{op.name}"
+    namespace[name] = op.function
+    return ast.Name(id=name, ctx=ast.Load())
+
+
+def _build_ast(root: Node | None, base: int, namespace: dict) -> ast.expr:
+    """Translate a parse tree into a Python expression AST, in post-order with explicit stacks."""
+    table = get_operator_table()
+    exprs: list[ast.expr] = []
+    # Nodes to visit, and whether the ASTs of their operands are on exprs
+    stack: list[tuple[Node | None, bool]] = [(root, False)]
+    while stack:
+        node, operands_done = stack.pop()
+        if node is None:
+            raise ValueError("Cannot compile an empty tree.")
+        if node.token is None:
+            raise ValueError("Cannot compile a node without a token.")
+        kind = node.token.type
+        if kind == TokenTypes.NUMBER:
+            exprs.append(ast.Constant(value=literal_value(node, base)))
+        elif kind == TokenTypes.VARIABLE:
+            exprs.append(ast.Name(id=_slot_name(node.slot), ctx=ast.Load()))
+        elif kind not in (
+            TokenTypes.PREFIX_UNARY_OP,
+            TokenTypes.POSTFIX_UNARY_OP,
+            TokenTypes.BINARY_OP,
+        ):
+            raise ValueError(f"Cannot compile a node of type {kind.name}.")
+        elif not operands_done:
+            stack.append((node, True))
+            if kind == TokenTypes.BINARY_OP:
+                stack.append((node.right, False))
+            stack.append((node.left, False))
+        elif kind == TokenTypes.BINARY_OP:
+            op = table.operators[node.opcode]
+            right = exprs.pop()
+            left = exprs.pop()
+            if op in INLINE_BINARY_OPS:
+                exprs.append(ast.BinOp(left=left, op=INLINE_BINARY_OPS[op](), right=right))
+            else:
+                exprs.append(
+                    ast.Call(func=_bind_function(op, namespace), args=[left, right], keywords=[])
+                )
+        else:
+            op = table.operators[node.opcode]
+            operand = exprs.pop()
+            if kind == TokenTypes.PREFIX_UNARY_OP and op in INLINE_UNARY_OPS:
+                exprs.append(ast.UnaryOp(op=INLINE_UNARY_OPS[op](), operand=operand))
+            else:
+                exprs.append(
+                    ast.Call(func=_bind_function(op, namespace), args=[operand], keywords=[])
+                )
+    return exprs.pop()
@@ -0,0 +1,89 @@
+from .parser import Node
+
+
+type node_key = tuple[int, str, int, int]
+
+
+def intern_subtrees(root: Node) -> tuple[Node, int]:
+    """Share structurally identical subtrees of a parse tree (hash-consing).
+
+    Children are replaced in place by a canonical node for their structure, so
+    the tree becomes a DAG in which each distinct subtree occurs once. Returns
+    the root together with the number of nodes that were shared, i.e. the size
+    of the tree minus the number of distinct nodes. Interning an already
+    interned tree leaves it unchanged and reports the same count."""
+    canonical: dict[node_key, Node] = {}
+    # Canonical node and number of tree nodes, keyed by the id of each visited node
+    visited: dict[int, tuple[Node, int]] = {}
+
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if id(node) in visited:
+            continue
+        if not children_done:
+            stack.append((node, True))
+            for child in (node.right, node.left):
+                if child is not None and id(child) not in visited:
+                    stack.append((child, False))
+            continue
+
+        size = 1
+        if node.left is not None:
+            node.left, left_size = visited[id(node.left)]
+            size += left_size
+        if node.right is not None:
+            node.right, right_size = visited[id(node.right)]
+            size += right_size
+
+        assert node.token is not None
+        key = (
+            node.token.type,
+            node.token.value,
+            id(node.left) if node.left is not None else 0,
+            id(node.right) if node.right is not None else 0,
+        )
+        visited[id(node)] = (canonical.setdefault(key, node), size)
+
+    root, size = visited[id(root)]
+    return root, size - len(canonical)
+
+
+def reference_counts(root: Node) -> dict[int, int]:
+    """Count the number of parents of each node of a DAG, keyed by node id."""
+    counts: dict[int, int] = {id(root): 1}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for child in (node.left, node.right):
+            if child is None:
+                continue
+            if id(child) in counts:
+                counts[id(child)] += 1
+            else:
+                counts[id(child)] = 1
+                stack.append(child)
+    return counts
+
+
+def count_shared_nodes(root: Node) -> int:
+    """Return the number of nodes shared in a DAG, as reported by intern_subtrees.
+
+    Unlike intern_subtrees, this does not modify the DAG, so it is safe to call
+    on DAGs used by other threads."""
+    sizes: dict[int, int] = {}
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if id(node) in sizes:
+            continue
+        if not children_done:
+            stack.append((node, True))
+            for child in (node.right, node.left):
+                if child is not None and id(child) not in sizes:
+                    stack.append((child, False))
+            continue
+        sizes[id(node)] = 1 + sum(
+            sizes[id(child)] for child in (node.left, node.right) if child is not None
+        )
+    return sizes[id(root)] - len(sizes)
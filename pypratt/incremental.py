@@ -0,0 +1,275 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+
+from .budget import check_deadline
+from .inference import literal_value
+from .operators import function, get_operator_table
+from .parser import Node, parse
+from .tokenizer import SyntaxError, Token, TokenStream, TokenTypes, tokenize
+
+
+class IncrementalExpression:
+    """An expression that is re-parsed and re-evaluated incrementally after edits.
+
+    Besides the tokens and the parse tree, this keeps the root node of every
+    bracketed group, the parent of every node, and the value of every subtree
+    on its node. An edit is re-tokenized and re-parsed only within the
+    innermost bracketed group that contains it, found with the distances
+    between matching brackets of the token stream. The new subtree replaces
+    the old one, and only the values on the path from it to the root are
+    recomputed. Edits that are not inside any group, or that make the group
+    invalid on its own, e.g. by adding a bracket, re-parse the whole
+    expression.
+
+    When an edit makes the expression invalid, the SyntaxError is raised and
+    the next edit re-parses the whole expression. Values that cannot be
+    computed, such as a division by zero, are raised by value."""
+
+    def __init__(self, expr: str, base: int):
+        self.source = expr
+        self.base = base
+        self.tokens: TokenStream | None = None
+        self.root: Node | None = None
+        # Root of the subtree of each group, by opening bracket token index
+        self._groups: dict[int, Node] = {}
+        self._parents: dict[int, Node] = {}
+        # Number of tokens re-parsed by the last edit, not counting the end
+        self.reparsed_tokens = 0
+        try:
+            self._rebuild()
+        except SyntaxError:
+            # An invalid expression may be made valid by an edit
+            pass
+
+    @property
+    def value(self) -> int | float:
+        """The value of the expression, evaluating the subtrees that changed."""
+        return self.evaluate()
+
+    def evaluate(
+        self, deadline: float | None = None, functions: Sequence[function] | None = None
+    ) -> int | float:
+        """Return the value of the expression, evaluating the subtrees that changed.
+
+        If a time.monotonic() deadline is given, it is checked before each
+        operator. The operator functions can be replaced by a sequence indexed
+        by opcode, like the functions of the operator table."""
+        if self.root is None:
+            self._rebuild()
+        assert self.root is not None
+        return _evaluate_cached(self.root, self.base, deadline, functions)
+
+    def update(self, edit_start: int, edit_end: int, new_text: str) -> None:
+        """Replace source[edit_start:edit_end] with new_text and re-parse the damage."""
+        if not 0 <= edit_start <= edit_end <= len(self.source):
+            raise ValueError(
+                f"Invalid edit range {edit_start}:{edit_end} for an expression of "
+                f"length {len(self.source)}."
+            )
+        self.source = self.source[:edit_start] + new_text + self.source[edit_end:]
+        if self.root is None:
+            self._rebuild()
+            return
+
+        assert self.tokens is not None
+        enclosing = self._enclosing_groups(edit_start, edit_end)
+        if not enclosing:
+            self._rebuild()
+            return
+        try:
+            self._reparse_group(enclosing, len(new_text) - (edit_end - edit_start))
+            return
+        except SyntaxError:
+            # An edit such as adding a bracket may be valid in the context of
+            # the whole expression only
+            pass
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.root = None
+        tokens = tokenize(self.source, base=self.base)
+        groups: dict[int, Node] = {}
+        root = parse(tokens, groups)
+        self._parents = {}
+        _index_subtree(root, self._parents)
+        self.tokens, self.root, self._groups = tokens, root, groups
+        self.reparsed_tokens = len(tokens) - 1
+
+    def _enclosing_groups(self, edit_start: int, edit_end: int) -> list[tuple[int, int]]:
+        """Return the (opening, closing) token indices of the groups containing
+        the edit, innermost first.
+
+        The edit is contained in a group if it lies between its brackets in the
+        source before the edit."""
+        assert self.tokens is not None
+        kinds = self.tokens.kinds
+        starts = self.tokens.starts
+        distances = self.tokens.distances
+        OPEN_BRACKET = TokenTypes.OPEN_BRACKET
+        CLOSE_BRACKET = TokenTypes.CLOSE_BRACKET
+
+        enclosing = []
+        # Walk back from the last token starting before the edit, skipping the
+        # groups that close before it
+        index = bisect_left(starts, edit_start) - 1
+        while index >= 0:
+            kind = kinds[index]
+            if kind == CLOSE_BRACKET:
+                index += distances[index]
+            elif kind == OPEN_BRACKET:
+                closing = index + distances[index]
+                if starts[closing] >= edit_end:
+                    enclosing.append((index, closing))
+            index -= 1
+        return enclosing
+
+    def _reparse_group(self, enclosing: list[tuple[int, int]], shift: int) -> None:
+        assert self.tokens is not None and self.root is not None
+        opening, closing = enclosing[0]
+        old = self.tokens
+        interior_start = old.starts[opening] + 1
+        interior = self.source[interior_start : old.starts[closing] + shift]
+        # A group is tokenized and parsed like a whole expression, since an
+        # opening bracket is followed by the same tokens as the start of an
+        # expression, and a closing bracket follows the same as its end
+        sub_tokens = tokenize(interior, base=self.base)
+        sub_groups: dict[int, Node] = {}
+        sub_root = parse(sub_tokens, sub_groups)
+
+        # Splice the new tokens, without the END token, between the brackets
+        count = len(sub_tokens) - 1
+        token_shift = count - (closing - opening - 1)
+        tokens = TokenStream(self.source)
+        tokens.kinds = old.kinds[: opening + 1] + sub_tokens.kinds[:-1] + old.kinds[closing:]
+        tokens.starts = (
+            old.starts[: opening + 1]
+            + array("i", [start + interior_start for start in sub_tokens.starts[:-1]])
+            + array("i", [start + shift for start in old.starts[closing:]])
+        )
+        tokens.ends = (
+            old.ends[: opening + 1]
+            + array("i", [end + interior_start for end in sub_tokens.ends[:-1]])
+            + array("i", [end + shift for end in old.ends[closing:]])
+        )
+        tokens.distances = (
+            old.distances[: opening + 1] + sub_tokens.distances[:-1] + old.distances[closing:]
+        )
+        tokens.codes = old.codes[: opening + 1] + sub_tokens.codes[:-1] + old.codes[closing:]
+        for outer_opening, outer_closing in enclosing:
+            tokens.distances[outer_opening] += token_shift
+            tokens.distances[outer_closing + token_shift] -= token_shift
+        for index, value in old._synthetic.items():
+            if index < opening:
+                tokens._synthetic[index] = value
+            elif index > closing:
+                tokens._synthetic[index + token_shift] = value
+        for index, value in sub_tokens._synthetic.items():
+            tokens._synthetic[index + opening + 1] = value
+
+        # Replace the subtree of the group
+        old_root = self._groups[opening]
+        parent = self._parents.get(id(old_root))
+        if parent is None:
+            self.root = sub_root
+        elif parent.left is old_root:
+            parent.left = sub_root
+        else:
+            parent.right = sub_root
+        _forget_parents(old_root, self._parents)
+        _index_subtree(sub_root, self._parents)
+        if parent is not None:
+            self._parents[id(sub_root)] = parent
+
+        groups: dict[int, Node] = {}
+        for index, node in self._groups.items():
+            if index < opening:
+                # The enclosing groups may share the root of the group
+                groups[index] = sub_root if node is old_root else node
+            elif index > closing:
+                groups[index + token_shift] = node
+        groups[opening] = sub_root
+        for index, node in sub_groups.items():
+            groups[index + opening + 1] = node
+        self._groups = groups
+        self.tokens = tokens
+        self.reparsed_tokens = count
+
+        # Only the values on the path to the root are out of date
+        node = parent
+        while node is not None:
+            node.value = None
+            node = self._parents.get(id(node))
+
+
+def _index_subtree(root: Node, parents: dict[int, Node]) -> None:
+    """Record the parent of each node of a new subtree.
+
+    The tokens of the leaves get their own copy of their text, so that the
+    nodes that survive later edits do not keep old versions of the source
+    alive."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.left is None:
+            token = node.token
+            assert token is not None
+            node.token = Token(token.type, token.value)
+            continue
+        for child in (node.left, node.right):
+            if child is not None:
+                parents[id(child)] = node
+                stack.append(child)
+
+
+def _forget_parents(root: Node, parents: dict[int, Node]) -> None:
+    parents.pop(id(root), None)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for child in (node.left, node.right):
+            if child is not None:
+                parents.pop(id(child), None)
+                stack.append(child)
+
+
+def _evaluate_cached(
+    root: Node,
+    base: int,
+    deadline: float | None = None,
+    functions: Sequence[function] | None = None,
+) -> int | float:
+    """Evaluate a parse tree, reusing and filling the values cached on its nodes."""
+    if functions is None:
+        functions = get_operator_table().functions
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if node.value is not None:
+            continue
+        token = node.token
+        assert token is not None
+        if token.type == TokenTypes.NUMBER:
+            node.value = literal_value(node, base)
+        elif token.type == TokenTypes.VARIABLE:
+            raise ValueError(f"Variable '{token.value}' is not bound.")
+        elif not children_done:
+            if deadline is not None:
+                check_deadline(deadline)
+            stack.append((node, True))
+            for child in (node.right, node.left):
+                if child is not None and child.value is None:
+                    stack.append((child, False))
+        elif token.type == TokenTypes.BINARY_OP:
+            assert node.left is not None and node.right is not None
+            node.value = functions[node.opcode](node.left.value, node.right.value)
+        elif token.type == TokenTypes.POSTFIX_UNARY_OP:
+            assert node.left is not None
+            node.value = functions[node.opcode](node.left.value)
+        elif token.type == TokenTypes.PREFIX_UNARY_OP:
+            assert node.left is not None
+            node.value = functions[node.opcode](node.left.value)
+        else:
+            raise ValueError(f"Cannot evaluate a node of type {token.type.name}.")
+    assert root.value is not None
+    return root.value
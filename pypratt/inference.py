@@ -0,0 +1,229 @@
+import math
+import sys
+
+from collections.abc import Callable
+from functools import cache
+
+from .num_utils import DECIMAL_POINT, SEPARATOR, str_to_float, str_to_int
+from .operators import (
+    OP_ADD,
+    OP_CHOOSE,
+    OP_DIVIDE,
+    OP_EXPONENT,
+    OP_FACTORIAL,
+    OP_MODULO,
+    OP_MULTIPLY,
+    OP_NEGATE,
+    OP_PERMUTE,
+    OP_SUBTRACT,
+    Operator,
+    OperatorTable,
+    function,
+    get_operator_table,
+)
+from .parser import Node
+from .tokenizer import TokenTypes
+
+
+# Numeric types of the values of parse tree nodes. Nodes are dynamic until
+# they are labelled, so that unlabelled trees are evaluated as before.
+# The type is only known at run time, e.g. for variables and registered operators
+DYNAMIC = 0
+# An integer, computed without any float conversion
+EXACT_INT = 1
+# A float computed from floats and from integers that fit in a float
+FLOAT = 2
+# A float computed from an integer that may not fit in a float, or a power
+# with a float operand, which may overflow
+OVERFLOW_RISK = 3
+
+NUMERIC_TYPE_NAMES = ("dynamic", "int", "float", "overflow risk")
+
+# Integers of this many bits or more do not fit in a float
+FLOAT_MAX_BITS = sys.float_info.max_exp
+
+# The numeric type of a node, an upper bound of the number of bits of its
+# value if it is an integer, and whether the value is known to be non-negative
+type type_info = tuple[int, float, bool]
+
+_DYNAMIC_INFO: type_info = (DYNAMIC, math.inf, False)
+_FLOAT_INFO: type_info = (FLOAT, math.inf, False)
+_OVERFLOW_INFO: type_info = (OVERFLOW_RISK, math.inf, False)
+
+
+def infer_types(root: Node, base: int) -> int:
+    """Label each node of a parse tree with the numeric type of its value.
+
+    Literals with a decimal point are floats and other literals are exact
+    integers. The arithmetic operators keep integers exact, except /, which
+    returns a float, and ^, whose result is an integer only if the exponent is
+    known to be non-negative. Float results are overflow risks if an integer
+    operand may not fit in a float, which is decided with an upper bound of the
+    bits of each integer. Subtrees shared in a DAG are labelled once.
+
+    Returns the type of the root."""
+    rules = _operator_rules(get_operator_table())
+    digit_bits = math.log2(base)
+    infos: dict[int, type_info] = {}
+    # Post-order traversal with an explicit stack of (node, children_done)
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        left = node.left
+        if children_done:
+            right = node.right
+            info = rules[node.opcode](infos[id(left)], None if right is None else infos[id(right)])
+        elif id(node) in infos:
+            continue
+        elif left is None:
+            token = node.token
+            if token is None:
+                raise ValueError("Cannot infer the type of a node without a token.")
+            if token.type != TokenTypes.NUMBER:
+                info = _DYNAMIC_INFO
+            elif DECIMAL_POINT in token.value:
+                info = _FLOAT_INFO
+            else:
+                # A literal of n digits is less than base^n
+                info = EXACT_INT, len(token.value.replace(SEPARATOR, "")) * digit_bits, True
+        else:
+            stack.append((node, True))
+            if node.right is not None:
+                stack.append((node.right, False))
+            stack.append((left, False))
+            continue
+        node.numeric_type = info[0]
+        infos[id(node)] = info
+    return root.numeric_type
+
+
+def literal_value(node: Node, base: int) -> int | float:
+    """Convert the literal of a NUMBER node with the converter for its type.
+
+    Literals of unlabelled trees are floats if they have a decimal point."""
+    assert node.token is not None
+    text = node.token.value
+    numeric_type = node.numeric_type
+    if numeric_type == EXACT_INT:
+        return str_to_int(text, base)
+    if numeric_type == FLOAT or DECIMAL_POINT in text:
+        return str_to_float(text, base)
+    return str_to_int(text, base)
+
+
+def typed_functions(table: OperatorTable) -> tuple[tuple[function, ...], ...]:
+    """Return the operator functions of a table indexed by numeric type, then by opcode."""
+    return (table.functions, table.int_functions, table.float_functions, table.functions)
+
+
+@cache
+def _operator_rules(table: OperatorTable) -> tuple[Callable[..., type_info], ...]:
+    """Return the type rules of the operators of a table, indexed by opcode.
+
+    A rule takes the type infos of the operands, with None as the second one
+    of unary operators. Registered operators are dynamic."""
+    return tuple(_RULES.get(op, _dynamic_rule) for op in table.operators)
+
+
+def _float_info(*operands: type_info) -> type_info:
+    """Return the type info of a float result of operands that are not all integers."""
+    info = _FLOAT_INFO
+    for numeric_type, bits, _ in operands:
+        if numeric_type == DYNAMIC:
+            return _DYNAMIC_INFO
+        if numeric_type == EXACT_INT and bits >= FLOAT_MAX_BITS:
+            info = _OVERFLOW_INFO
+    return info
+
+
+def _pow2(bits: float) -> float:
+    return 2.0**bits if bits < FLOAT_MAX_BITS else math.inf
+
+
+# The rules bound the bits of integer results: an integer of b bits is less
+# than 2^b, so that a + b has at most max(a, b) + 1 bits and a * b at most a + b.
+
+
+def _dynamic_rule(a: type_info, b: type_info | None) -> type_info:
+    return _DYNAMIC_INFO
+
+
+def _negate_rule(a: type_info, _: None) -> type_info:
+    if a[0] == EXACT_INT:
+        return EXACT_INT, a[1], False
+    return _float_info(a)
+
+
+def _add_rule(a: type_info, b: type_info) -> type_info:
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        return EXACT_INT, max(a[1], b[1]) + 1, a[2] and b[2]
+    return _float_info(a, b)
+
+
+def _subtract_rule(a: type_info, b: type_info) -> type_info:
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        return EXACT_INT, max(a[1], b[1]) + 1, False
+    return _float_info(a, b)
+
+
+def _multiply_rule(a: type_info, b: type_info) -> type_info:
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        return EXACT_INT, a[1] + b[1], a[2] and b[2]
+    return _float_info(a, b)
+
+
+def _modulo_rule(a: type_info, b: type_info) -> type_info:
+    # The remainder is smaller than the divisor and has its sign
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        return EXACT_INT, b[1], b[2]
+    return _float_info(a, b)
+
+
+def _divide_rule(a: type_info, b: type_info) -> type_info:
+    return _float_info(a, b)
+
+
+def _exponent_rule(a: type_info, b: type_info) -> type_info:
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        # A negative exponent gives a float
+        if not b[2]:
+            return _DYNAMIC_INFO
+        return EXACT_INT, a[1] * _pow2(b[1]), a[2]
+    info = _float_info(a, b)
+    # Powers of floats may overflow
+    return _DYNAMIC_INFO if info is _DYNAMIC_INFO else _OVERFLOW_INFO
+
+
+def _factorial_rule(a: type_info, _: None) -> type_info:
+    # n! < n^n; floats are rejected when evaluated
+    if a[0] == EXACT_INT:
+        return EXACT_INT, a[1] * _pow2(a[1]), True
+    return _DYNAMIC_INFO
+
+
+def _choose_rule(a: type_info, b: type_info) -> type_info:
+    # n C k < 2^n
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        return EXACT_INT, _pow2(a[1]), True
+    return _DYNAMIC_INFO
+
+
+def _permute_rule(a: type_info, b: type_info) -> type_info:
+    # n P k <= n!
+    if a[0] == EXACT_INT and b[0] == EXACT_INT:
+        return EXACT_INT, a[1] * _pow2(a[1]), True
+    return _DYNAMIC_INFO
+
+
+_RULES: dict[Operator, Callable[..., type_info]] = {
+    OP_NEGATE: _negate_rule,
+    OP_ADD: _add_rule,
+    OP_SUBTRACT: _subtract_rule,
+    OP_MULTIPLY: _multiply_rule,
+    OP_DIVIDE: _divide_rule,
+    OP_MODULO: _modulo_rule,
+    OP_EXPONENT: _exponent_rule,
+    OP_FACTORIAL: _factorial_rule,
+    OP_CHOOSE: _choose_rule,
+    OP_PERMUTE: _permute_rule,
+}
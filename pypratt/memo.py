@@ -0,0 +1,237 @@
+import math
+import sys
+import threading
+
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from collections.abc import Callable
+
+
+# Total size of the memoized results
+DEFAULT_CAPACITY_BYTES = 64 << 20
+
+# Below this argument, the operators are cheaper to compute than to look up
+MIN_ARGUMENT = 64
+
+# n! is derived from a memoized m! if |n - m| is at most this, which costs
+# a small fraction of computing n! (see _derive_factorial)
+MAX_FACTORIAL_STEPS = 8
+
+FACTORIAL = "!"
+CHOOSE = "C"
+PERMUTE = "P"
+
+type memo_key = tuple[str, int, int]
+
+
+class OperatorMemo:
+    """A memo of the results of factorials, combinations and permutations.
+
+    The memo is bounded by the total size of the memoized integers in bytes,
+    and the least recently used results are evicted first. Results that are
+    not memoized are derived from a memoized neighbour when that is cheap:
+    n! from m! for m close to n, and n C k and n P k from the results for
+    n ± 1 or k ± 1, with one multiplication and one division by small
+    integers. Only the results of arguments of at least MIN_ARGUMENT are
+    memoized. The memo can be shared between threads.
+
+    The counters record the results found in the memo (hits), derived from a
+    neighbour (derived) and computed from scratch (misses)."""
+
+    def __init__(self, capacity_bytes: int = DEFAULT_CAPACITY_BYTES):
+        if capacity_bytes < 1:
+            raise ValueError("Memo capacity must be a positive number of bytes.")
+
+        self.capacity_bytes = capacity_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.derived = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[memo_key, int] = OrderedDict()
+        # Sorted arguments of the memoized factorials
+        self._factorials: list[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self):
+        return (
+            f"OperatorMemo(size={len(self)}, bytes={self.size_bytes}, "
+            f"capacity_bytes={self.capacity_bytes}, hits={self.hits}, "
+            f"derived={self.derived}, misses={self.misses}, evictions={self.evictions})"
+        )
+
+    def factorial(self, n: int, compute: Callable[[int], int]) -> int:
+        """Return n!, computing it with compute(n) if it cannot be derived."""
+        if n < MIN_ARGUMENT:
+            return compute(n)
+        return self._memoized((FACTORIAL, n, 0), self._derive_factorial, lambda: compute(n))
+
+    def comb(self, n: int, k: int, compute: Callable[[int, int], int]) -> int:
+        """Return n C k for 0 <= k <= n, computing it with compute(n, k) if needed."""
+        if n < MIN_ARGUMENT:
+            return compute(n, k)
+        # n C k = n C (n - k)
+        k = min(k, n - k)
+        return self._memoized((CHOOSE, n, k), self._derive_comb, lambda: compute(n, k))
+
+    def perm(self, n: int, k: int, compute: Callable[[int, int], int]) -> int:
+        """Return n P k for 0 <= k <= n, computing it with compute(n, k) if needed."""
+        if n < MIN_ARGUMENT:
+            return compute(n, k)
+        return self._memoized((PERMUTE, n, k), self._derive_perm, lambda: compute(n, k))
+
+    def clear(self) -> None:
+        """Remove all results and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._factorials.clear()
+            self.size_bytes = 0
+            self.hits = 0
+            self.derived = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self) -> dict[str, int]:
+        """Return the memo counters as a dictionary."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "derived": self.derived,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "bytes": self.size_bytes,
+                "capacity_bytes": self.capacity_bytes,
+            }
+
+    def _memoized(
+        self,
+        key: memo_key,
+        derive: Callable[[int, int], int | None],
+        compute: Callable[[], int],
+    ) -> int:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        # Results are computed without holding the lock, so two threads may
+        # compute the same result at once
+        value = derive(key[1], key[2])
+        if value is not None:
+            with self._lock:
+                self.derived += 1
+        else:
+            value = compute()
+            with self._lock:
+                self.misses += 1
+        self._put(key, value)
+        return value
+
+    def _get(self, key: memo_key) -> int | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _put(self, key: memo_key, value: int) -> None:
+        size = sys.getsizeof(value)
+        if size > self.capacity_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self.size_bytes += size
+            if key[0] == FACTORIAL:
+                insort(self._factorials, key[1])
+            while self.size_bytes > self.capacity_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= sys.getsizeof(evicted)
+                self.evictions += 1
+                if evicted_key[0] == FACTORIAL:
+                    del self._factorials[bisect_left(self._factorials, evicted_key[1])]
+
+    def _derive_factorial(self, n: int, _: int) -> int | None:
+        """Derive n! from the memoized m! closest to n, if any is close enough.
+
+        n! = m! * (n P (n - m)) for m < n, and m! / (m P (m - n)) for m > n,
+        where the permutation count is a product of |n - m| small integers."""
+        with self._lock:
+            index = bisect_left(self._factorials, n)
+            neighbours = self._factorials[max(index - 1, 0) : index + 1]
+        if not neighbours:
+            return None
+        m = min(neighbours, key=lambda m: abs(n - m))
+        if abs(n - m) > MAX_FACTORIAL_STEPS:
+            return None
+        value = self._get((FACTORIAL, m, 0))
+        if value is None:
+            return None
+        if m < n:
+            return value * math.perm(n, n - m)
+        return value // math.perm(m, m - n)
+
+    def _derive_comb(self, n: int, k: int) -> int | None:
+        # Pascal's rule between neighbours: n C k = n C (k - 1) * (n - k + 1) / k
+        # and n C k = (n - 1) C k * n / (n - k)
+        if k >= 1:
+            value = self._get((CHOOSE, n, min(k - 1, n - k + 1)))
+            if value is not None:
+                return value * (n - k + 1) // k
+        if k < n - k:
+            value = self._get((CHOOSE, n, min(k + 1, n - k - 1)))
+            if value is not None:
+                return value * (k + 1) // (n - k)
+        if k < n:
+            value = self._get((CHOOSE, n - 1, min(k, n - 1 - k)))
+            if value is not None:
+                return value * n // (n - k)
+        value = self._get((CHOOSE, n + 1, k))
+        if value is not None:
+            return value * (n + 1 - k) // (n + 1)
+        return None
+
+    def _derive_perm(self, n: int, k: int) -> int | None:
+        # n P k = n! / (n - k)! = n P (k - 1) * (n - k + 1) = (n - 1) P k * n / (n - k)
+        if k >= n - 1:
+            value = self._get((FACTORIAL, n, 0))
+            if value is not None:
+                return value
+        if k >= 1:
+            value = self._get((PERMUTE, n, k - 1))
+            if value is not None:
+                return value * (n - k + 1)
+        if k < n:
+            value = self._get((PERMUTE, n, k + 1))
+            if value is not None:
+                return value // (n - k)
+            value = self._get((PERMUTE, n - 1, k))
+            if value is not None:
+                return value * n // (n - k)
+        value = self._get((PERMUTE, n + 1, k))
+        if value is not None:
+            return value * (n + 1 - k) // (n + 1)
+        return None
+
+
+_current: OperatorMemo | None = OperatorMemo()
+
+
+def get_memo() -> OperatorMemo | None:
+    """Return the memo used by the factorial, combination and permutation operators."""
+    return _current
+
+
+def set_memo(memo: OperatorMemo | None) -> OperatorMemo | None:
+    """Select the memo of the operators, or disable memoization with None.
+
+    Returns the previously used memo."""
+    global _current
+    previous, _current = _current, memo
+    return previous
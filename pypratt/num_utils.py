@@ -1,3 +1,9 @@
+import math
+
+from .backend import get_backend
+from .radix import DIGITS, MAX_BASE, check_base, digit_values
+
+
 DECIMAL_POINT = "."
 SEPARATOR = ","
 
@@ -6,109 +12,97 @@ MAX_DIGITS_AFTER_DECIMAL = 10
 
 def digit_char_to_num(char: str, base: int = 10) -> int:
     """Convert a single digit character to a number in the specified base."""
-    if 2 <= base <= 10:
-        if char.isdigit():
-            return int(char)
-        else:
-            raise ValueError(f"Invalid digit '{char}' for base {base}.")
-    elif 10 < base < 36:
-        if char.isdigit():
-            return int(char)
-        elif "A" <= char.upper() < chr(ord("A") + base - 10):
-            return ord(char.upper()) - ord("A") + 10
-        else:
-            raise ValueError(f"Invalid digit '{char}' for base {base}.")
-    else:
-        raise ValueError(f"Base {base} is not supported. Supported bases are 2-36.")
+    try:
+        return digit_values(base)[char]
+    except KeyError:
+        raise ValueError(f"Invalid digit '{char}' for base {base}.") from None
+
+
+def is_valid_digit(char: str, base: int) -> bool:
+    """Check if a character is a valid digit in the specified base."""
+    try:
+        digit_char_to_num(char, base)
+    except ValueError:
+        return False
+    return True
 
 
 def num_to_digit_char(num: int, base: int) -> str:
     """Convert a number to a string representation in the specified base."""
-    if base < 2:
-        raise ValueError("Base must be a positive integer greater than 1.")
-    if base > 36:
-        raise ValueError("Base must be a positive integer less than or equal to 36.")
-
+    check_base(base)
     if num < 0 or num >= base:
         raise ValueError(f"Digits must be integers between 0 and {base - 1}.")
-    elif 0 <= num <= 9:
-        return str(num)
-    else:
-        return chr(ord("A") + num - 10)
+    return DIGITS[num]
 
 
 def num_to_str(num: int | float, base: int) -> str:
     """Convert the result (float) to the given base as a string"""
-    if base == 10:
+    if isinstance(num, int):
+        sign_str = "-" if num < 0 else ""
+        return sign_str + get_backend().int_to_digits(abs(num), base)
+    elif base == 10:
         return str(num)
     else:
+        check_base(base)
         sign, int_digits, frac_digits = num_to_base(num, base)
         sign_str = "-" if sign == -1 else ""
-        int_part_str = "".join(num_to_digit_char(digit, base) for digit in int_digits)
+        int_part_str = "".join(DIGITS[digit] for digit in int_digits) or "0"
         if not frac_digits:
             return sign_str + int_part_str
         else:
-            frac_part_str = "".join(
-                num_to_digit_char(digit, base) for digit in frac_digits
-            )
+            frac_part_str = "".join(DIGITS[digit] for digit in frac_digits)
             return sign_str + int_part_str + DECIMAL_POINT + frac_part_str
 
 
 def str_to_float(expr: str, base: int) -> float:
     """Convert a string to a number in the specified base."""
-    if not str:
-        raise ValueError("Empty string cannot be converted to a number.")
-
-    num:float = 0.0
-    decimal_flag = False
-    mul_factor: float = 1
-
-    for char in expr:
-        if char == DECIMAL_POINT:
-            if decimal_flag:
+    table = digit_values(base)
+    int_str, decimal_point, frac_str = expr.partition(DECIMAL_POINT)
+    int_digits = int_str.replace(SEPARATOR, "")
+    if not table.keys() >= set(int_digits):
+        _raise_invalid_digit(int_digits, base)
+    if not table.keys() >= set(frac_str):
+        for char in frac_str:
+            if char == DECIMAL_POINT:
                 raise ValueError(
                     f"Invalid number '{expr}' for base {base}. Multiple decimal points found."
                 )
-            decimal_flag = True
-        elif char == SEPARATOR:
-            if decimal_flag:
+            elif char == SEPARATOR:
                 raise ValueError(
                     f"Invalid number '{expr}' for base {base}. Separator found after decimal point."
                 )
-            continue
-        else:
-            try:
-                digit = digit_char_to_num(char, base)
-            except ValueError:
-                raise
-            if decimal_flag:
-                mul_factor /= base
-                num += digit * mul_factor
-            else:
-                num = num * base + digit
-    return num
-
-
-def str_to_int(expr: str, base: int) -> float:
+            elif char not in table:
+                break
+        _raise_invalid_digit(frac_str, base)
+
+    # A single correctly rounded division of exact integers
+    try:
+        return get_backend().digits_to_int(int_digits + frac_str, base) / base ** len(frac_str)
+    except OverflowError:
+        # Literals are unsigned, so only positive values can be too large for a float
+        return math.inf
+
+
+def str_to_int(expr: str, base: int) -> int:
     """Convert a string to a number in the specified base."""
-    if not str:
-        raise ValueError("Empty string cannot be converted to a number.")
-
-    num:int = 0
-    for char in expr:
-        if char == DECIMAL_POINT:
-            raise ValueError(
-                f"Integer expected, but encountered a decimal point."
-            )
-        elif char == SEPARATOR:
-            continue
-        else:
-            try:
-                digit = digit_char_to_num(char, base)
-            except ValueError:
-                raise
-            num = num * base + digit
-    return num
+    table = digit_values(base)
+    digits = expr.replace(SEPARATOR, "")
+    if not table.keys() >= set(digits):
+        for char in digits:
+            if char == DECIMAL_POINT:
+                raise ValueError(
+                    f"Integer expected, but encountered a decimal point."
+                )
+            elif char not in table:
+                break
+        _raise_invalid_digit(digits, base)
+    return get_backend().digits_to_int(digits, base)
+
+
+def _raise_invalid_digit(digits: str, base: int) -> None:
+    """Raise the error for the first character of digits that is not a valid digit."""
+    for char in digits:
+        digit_char_to_num(char, base)
 
 
 def num_to_base(num: int | float, base: int) -> tuple[int, list[int], list[int]]:
@@ -131,10 +125,14 @@ def num_to_base(num: int | float, base: int) -> tuple[int, list[int], list[int]]
     frac_part = num - int_part
 
     # Convert integer part
-    while int_part > 0:
-        int_digits.append(int_part % base)
-        int_part //= base
-    int_digits.reverse()
+    if int_part > 0 and base <= MAX_BASE:
+        values = digit_values(base)
+        int_digits = [values[char] for char in get_backend().int_to_digits(int_part, base)]
+    else:
+        while int_part > 0:
+            int_digits.append(int_part % base)
+            int_part //= base
+        int_digits.reverse()
 
     # Convert fractional part
     if frac_part > 0:
@@ -1,6 +1,13 @@
-import math
+import operator
+import threading
 
 from collections.abc import Callable
+from functools import partial
+from types import MappingProxyType
+
+from .backend import get_backend
+from .memo import get_memo
+from .num_utils import DECIMAL_POINT, SEPARATOR
 
 type unary_function = Callable[[int | float], int | float]
 type binary_function = Callable[[int | float, int | float], int | float]
@@ -17,7 +24,11 @@ MATCHING_BRACKET = {
 OP_START_SYM = "_"
 
 class Operator:
-    """Enum for binary operators used in expressions."""
+    """Enum for binary operators used in expressions.
+
+    Besides the function, which accepts any operands, an operator may have
+    specialized functions for operands that type inference (see inference)
+    proved to be integers, or floats and integers that fit in a float."""
 
     def __init__(
         self,
@@ -25,15 +36,28 @@ class Operator:
         name: str,
         precedence: int,
         func: function,
+        right_assoc: bool = False,
+        int_func: function | None = None,
+        float_func: function | None = None,
     ):
         self.symbol = symbol
         self.name = name
         self.precedence = precedence
         self.function = func
+        self.right_assoc = right_assoc
+        self.int_function = int_func or func
+        self.float_function = float_func or func
 
 
 # DEFINE PREFIX UNARY OPERATORS
-OP_NEGATE = Operator(symbol="-", name="NEGATE", precedence=3, func=lambda a: -a)
+OP_NEGATE = Operator(
+    symbol="-",
+    name="NEGATE",
+    precedence=3,
+    func=lambda a: -a,
+    int_func=operator.neg,
+    float_func=operator.neg,
+)
 
 PREFIX_UNARY_OPS = {
     OP_NEGATE.symbol: OP_NEGATE,
@@ -49,14 +73,22 @@ POSTFIX_UNARY_OP_SYMS = {FACTORIAL_SYM}
 
 
 def factorial(num: int | float) -> int:
-    """A wrapper around math.factorial."""
+    """A wrapper around the factorial of the numeric backend, memoized (see memo)."""
     if not isinstance(num, int):
         raise ValueError("Factorial is only defined for integers.")
-    return math.factorial(num)
+    return int_factorial(num)
+
+
+def int_factorial(num: int) -> int:
+    """The factorial of an operand known to be an integer."""
+    memo = get_memo()
+    if memo is None:
+        return get_backend().factorial(num)
+    return memo.factorial(num, get_backend().factorial)
 
 
 OP_FACTORIAL = Operator(
-    symbol=FACTORIAL_SYM, name="FACTORIAL", precedence=4, func=factorial
+    symbol=FACTORIAL_SYM, name="FACTORIAL", precedence=4, func=factorial, int_func=int_factorial
 )
 
 
@@ -73,52 +105,112 @@ DIVIDE_SYM = "/"
 EXPONENT_SYM = "^"
 MODULO_SYM = "%"
 
-OP_ADD = Operator(symbol=ADD_SYM, name="ADD", precedence=1, func=lambda a, b: a + b)
+OP_ADD = Operator(
+    symbol=ADD_SYM,
+    name="ADD",
+    precedence=1,
+    func=lambda a, b: a + b,
+    int_func=operator.add,
+    float_func=operator.add,
+)
 
 OP_SUBTRACT = Operator(
-    symbol=SUBTRACT_SYM, name="SUBTRACT", precedence=1, func=lambda a, b: a - b
+    symbol=SUBTRACT_SYM,
+    name="SUBTRACT",
+    precedence=1,
+    func=lambda a, b: a - b,
+    int_func=operator.sub,
+    float_func=operator.sub,
 )
 
 OP_MULTIPLY = Operator(
-    symbol=MULTIPLY_SYM, name="MULTIPLY", precedence=2, func=lambda a, b: a * b
+    symbol=MULTIPLY_SYM,
+    name="MULTIPLY",
+    precedence=2,
+    func=lambda a, b: a * b,
+    int_func=operator.mul,
+    float_func=operator.mul,
 )
 
 OP_DIVIDE = Operator(
-    symbol=DIVIDE_SYM, name="DIVIDE", precedence=2, func=lambda a, b: a / b
+    symbol=DIVIDE_SYM,
+    name="DIVIDE",
+    precedence=2,
+    func=lambda a, b: a / b,
+    int_func=operator.truediv,
+    float_func=operator.truediv,
 )
 
+def power(a: int | float, b: int | float) -> int | float:
+    """Exponentiation, with integer powers computed by the numeric backend."""
+    if isinstance(a, int) and isinstance(b, int) and b >= 0:
+        return get_backend().power(a, b)
+    return a**b
+
+
+def int_power(a: int, b: int) -> int:
+    """Exponentiation of integers known to have a non-negative exponent."""
+    return get_backend().power(a, b)
+
+
 OP_EXPONENT = Operator(
-    symbol=EXPONENT_SYM, name="EXPONENT", precedence=3, func=lambda a, b: a**b
+    symbol=EXPONENT_SYM,
+    name="EXPONENT",
+    precedence=3,
+    func=power,
+    right_assoc=True,
+    int_func=int_power,
 )
 
 OP_MODULO = Operator(
-    symbol=MODULO_SYM, name="MODULO", precedence=2, func=lambda a, b: a % b
+    symbol=MODULO_SYM,
+    name="MODULO",
+    precedence=2,
+    func=lambda a, b: a % b,
+    int_func=operator.mod,
+    float_func=operator.mod,
 )
 
 def comb(a: int | float, b: int | float) -> int:
-    """A wrapper around math.comb."""
+    """A wrapper around the binomial coefficient of the numeric backend, memoized."""
     if not isinstance(a, int) or not isinstance(b, int):
         raise ValueError("Combination is only defined for integers.")
+    return int_comb(a, b)
+
+
+def int_comb(a: int, b: int) -> int:
+    """The binomial coefficient of operands known to be integers."""
     if b < 0 or b > a:
         raise ValueError(f"N {OP_START_SYM}C k is only defined for 0 ≤ k ≤ N.")
-    return math.comb(a, b)
+    memo = get_memo()
+    if memo is None:
+        return get_backend().comb(a, b)
+    return memo.comb(a, b, get_backend().comb)
 
 
 def perm(a: int | float, b: int | float) -> int:
-    """A wrapper around math.perm."""
+    """A wrapper around the permutation count of the numeric backend, memoized."""
     if not isinstance(a, int) or not isinstance(b, int):
         raise ValueError("Permutation is only defined for integers.")
+    return int_perm(a, b)
+
+
+def int_perm(a: int, b: int) -> int:
+    """The permutation count of operands known to be integers."""
     if b < 0 or b > a:
         raise ValueError(f"N {OP_START_SYM}P k is only defined for 0 ≤ k ≤ N.")
-    return math.perm(a, b)
+    memo = get_memo()
+    if memo is None:
+        return get_backend().perm(a, b)
+    return memo.perm(a, b, get_backend().perm)
 
 
 OP_PERMUTE = Operator(
-    symbol="P", name="PERMUTE", precedence=3, func=perm
+    symbol="P", name="PERMUTE", precedence=3, func=perm, int_func=int_perm
 )
 
 OP_CHOOSE = Operator(
-    symbol="C", name="CHOOSE", precedence=3, func=comb
+    symbol="C", name="CHOOSE", precedence=3, func=comb, int_func=int_comb
 )
 
 BINARY_OPS = {
@@ -133,3 +225,223 @@ BINARY_OPS = {
 }
 
 BINARY_OP_SYMS = {op.symbol for op in BINARY_OPS.values()}
+
+
+# OPERATOR REGISTRY
+
+# Positions of operators relative to their operands
+PREFIX = "prefix"
+POSTFIX = "postfix"
+INFIX = "infix"
+
+# Characters that cannot be operator symbols, since they delimit other tokens
+RESERVED_CHARS = {DECIMAL_POINT, SEPARATOR, OP_START_SYM, *OPEN_BRACKETS, *CLOSE_BRACKETS}
+
+
+def binding_powers(op: Operator, fixity: str) -> tuple[int, int]:
+    """Return the left and right binding powers of an operator.
+
+    An operand between two operators is claimed by the operator with the higher
+    binding power on that side. Left-associative binary operators bind slightly
+    more strongly to the right, so that a - b - c groups as (a - b) - c, and
+    right-associative operators the other way around. Unary operators have no
+    operand on one side, whose binding power is 0."""
+    if fixity == PREFIX:
+        return 0, 2 * op.precedence
+    if fixity == POSTFIX:
+        return 2 * op.precedence, 0
+    if op.right_assoc:
+        return 2 * op.precedence + 1, 2 * op.precedence
+    return 2 * op.precedence, 2 * op.precedence + 1
+
+
+class OperatorTable:
+    """An immutable table of the operators of a registry, indexed by opcode.
+
+    The opcode of an operator is its index in the registry. The tokenizer maps
+    symbols to opcodes with the code mappings, and the parser and the
+    evaluators index the tuples with the opcodes of the tokens and nodes.
+    Named binary operators are mapped with their leading OP_START_SYM, as they
+    are written, e.g. "_C"."""
+
+    __slots__ = (
+        "operators",
+        "fixities",
+        "symbols",
+        "functions",
+        "int_functions",
+        "float_functions",
+        "binding_powers",
+        "prefix_codes",
+        "postfix_codes",
+        "binary_codes",
+        "named_codes",
+    )
+
+    def __init__(self, entries: list[tuple[Operator, str]]):
+        def codes(fixity: str) -> MappingProxyType[str, int]:
+            return MappingProxyType(
+                {op.symbol: code for code, (op, f) in enumerate(entries) if f == fixity}
+            )
+
+        set_field = partial(object.__setattr__, self)
+        set_field("operators", tuple(op for op, _ in entries))
+        set_field("fixities", tuple(fixity for _, fixity in entries))
+        set_field("symbols", tuple(op.symbol for op, _ in entries))
+        set_field("functions", tuple(op.function for op, _ in entries))
+        set_field("int_functions", tuple(op.int_function for op, _ in entries))
+        set_field("float_functions", tuple(op.float_function for op, _ in entries))
+        set_field("binding_powers", tuple(binding_powers(op, f) for op, f in entries))
+        set_field("prefix_codes", codes(PREFIX))
+        set_field("postfix_codes", codes(POSTFIX))
+        set_field("binary_codes", codes(INFIX))
+        set_field(
+            "named_codes",
+            MappingProxyType(
+                {
+                    OP_START_SYM + symbol: code
+                    for symbol, code in self.binary_codes.items()
+                    if symbol.isalnum()
+                }
+            ),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("OperatorTable is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("OperatorTable is immutable.")
+
+    def __len__(self) -> int:
+        return len(self.operators)
+
+    def __repr__(self):
+        return f"OperatorTable({', '.join(self.symbols)})"
+
+
+class OperatorRegistry:
+    """The operators known to the tokenizer, the parser and the evaluators.
+
+    Operators can only be added, so the opcode of an operator never changes
+    and parse trees and VM programs stay valid after new registrations. The
+    registry is frozen into an OperatorTable, which is rebuilt only after a
+    registration."""
+
+    def __init__(self):
+        self._entries: list[tuple[Operator, str]] = []
+        self._table: OperatorTable | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"OperatorRegistry({len(self)} operators)"
+
+    def register(
+        self,
+        symbol: str,
+        func: function,
+        *,
+        precedence: int,
+        arity: int = 2,
+        postfix: bool = False,
+        right_assoc: bool = False,
+        name: str | None = None,
+    ) -> Operator:
+        """Register an operator and return it.
+
+        The symbol is either a single punctuation character or, for binary
+        operators, an alphanumeric name that is written with a leading
+        OP_START_SYM, like _C. Unary operators (arity 1) are prefix operators,
+        unless postfix is True. The precedences of the built-in operators range
+        from 1 for + and - to 4 for !. The name, which defaults to one derived
+        from the symbol, must be a Python identifier.
+
+        A character may be both a prefix and a binary operator, like -, but
+        otherwise each symbol and each name can only be registered once. Note
+        that worker processes started with the forkserver or spawn method, as by
+        the parallel engine and the aio module, only know the operators
+        registered on import."""
+        if arity not in (1, 2):
+            raise ValueError("Operators must have an arity of 1 or 2.")
+        if postfix and arity != 1:
+            raise ValueError("Only unary operators can be postfix operators.")
+        if right_assoc and arity != 2:
+            raise ValueError("Only binary operators can be right-associative.")
+        if not isinstance(precedence, int) or precedence < 1:
+            raise ValueError("Precedence must be a positive integer.")
+        fixity = INFIX if arity == 2 else POSTFIX if postfix else PREFIX
+        if symbol.isalnum():
+            if fixity != INFIX:
+                raise ValueError(f"Named operator '{symbol}' must be a binary operator.")
+        elif len(symbol) != 1 or symbol in RESERVED_CHARS or symbol.isspace():
+            raise ValueError(
+                f"Operator symbol '{symbol}' must be a single punctuation character or a name."
+            )
+        if name is None:
+            name = symbol.upper() if symbol.isidentifier() else f"OPERATOR_{len(self)}"
+        if not name.isidentifier():
+            raise ValueError(f"Operator name '{name}' must be a Python identifier.")
+
+        op = Operator(
+            symbol=symbol, name=name, precedence=precedence, func=func, right_assoc=right_assoc
+        )
+        self._add(op, fixity)
+        return op
+
+    def copy(self) -> "OperatorRegistry":
+        """Return a registry with the same operators and opcodes."""
+        registry = OperatorRegistry()
+        with self._lock:
+            registry._entries = list(self._entries)
+        return registry
+
+    def table(self) -> OperatorTable:
+        """Return the table of the registered operators."""
+        table = self._table
+        if table is None:
+            with self._lock:
+                table = self._table = OperatorTable(self._entries)
+        return table
+
+    def _add(self, op: Operator, fixity: str) -> None:
+        with self._lock:
+            for other, other_fixity in self._entries:
+                # The tokenizer tells prefix and binary operators apart by
+                # their position, but no other operators
+                if other.symbol == op.symbol and {fixity, other_fixity} != {PREFIX, INFIX}:
+                    raise ValueError(f"Operator '{op.symbol}' is already registered.")
+                if other.name == op.name:
+                    raise ValueError(f"Operator name '{op.name}' is already registered.")
+            self._entries.append((op, fixity))
+            self._table = None
+
+
+_registry = OperatorRegistry()
+for _fixity, _ops in ((PREFIX, PREFIX_UNARY_OPS), (POSTFIX, POSTFIX_UNARY_OPS), (INFIX, BINARY_OPS)):
+    for _op in _ops.values():
+        _registry._add(_op, _fixity)
+
+
+def get_registry() -> OperatorRegistry:
+    """Return the operator registry in use."""
+    return _registry
+
+
+def set_registry(registry: OperatorRegistry) -> OperatorRegistry:
+    """Select the operator registry, e.g. a copy of the default one with more
+    operators. Returns the previously used registry."""
+    global _registry
+    previous, _registry = _registry, registry
+    return previous
+
+
+def register_operator(symbol: str, func: function, **options) -> Operator:
+    """Register an operator in the registry in use (see OperatorRegistry.register)."""
+    return _registry.register(symbol, func, **options)
+
+
+def get_operator_table() -> OperatorTable:
+    """Return the table of the operators of the registry in use."""
+    return _registry.table()
@@ -0,0 +1,155 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .budget import Estimate, estimate_subtrees
+from .parser import Node
+from .pyeval import _evaluate_parse_tree
+from .vm import Program, lower, run
+
+
+logger = logging.getLogger(__name__)
+
+# Subtrees estimated to cost fewer word operations than this, about 10ms, are
+# not worth sending to a worker process (see budget.estimate_tree)
+DEFAULT_MIN_COST = 1e8
+
+# Evaluator of the "parallel" engine, created on first use
+_default_evaluator: "ParallelEvaluator | None" = None
+_default_evaluator_lock = threading.Lock()
+
+
+class ParallelEvaluator:
+    """Evaluate the independent heavy subtrees of parse trees on a process pool.
+
+    The subtrees are chosen from the estimated cost of every subtree. Starting
+    from the whole tree, the heaviest subtree that has two operands, possibly
+    below lighter operators, costing at least min_cost each, is replaced by
+    these operands, until there are as many subtrees as workers or none can be
+    split. Each subtree is then evaluated by a worker, and the operators above
+    them, like the light subtrees, are evaluated in the calling process with
+    the results of the workers. Trees that cannot be split are evaluated in the
+    calling process.
+
+    The results are those of the tree engine, including which error is raised
+    when several subtrees fail. Workers evaluating a subtree whose result is
+    no longer needed, because another subtree failed, are not interrupted."""
+
+    def __init__(self, *, workers: int | None = None, min_cost: float = DEFAULT_MIN_COST):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_cost = min_cost
+        self.offloaded = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ParallelEvaluator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def evaluate(self, root: Node, base: int, deadline: float | None = None) -> int | float:
+        """Evaluate a parse tree, offloading its heavy subtrees.
+
+        The deadline is a time.monotonic() time, as for the tree engine."""
+        subtrees = heavy_subtrees(root, estimate_subtrees(root, base), self.workers, self.min_cost)
+        if len(subtrees) < 2:
+            return _evaluate_parse_tree(root, base, deadline=deadline)
+
+        logger.info(f"Evaluating {len(subtrees)} subtrees in parallel.")
+        executor = self._get_executor()
+        futures: dict[int, Future] = {}
+        for node in subtrees:
+            if id(node) not in futures:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                futures[id(node)] = executor.submit(_run, lower(node, base), timeout)
+        self.offloaded += len(futures)
+
+        memo: dict[int, int | float] = {}
+        try:
+            # In tree order, so that the error of the leftmost subtree is raised
+            for key, future in futures.items():
+                memo[key] = future.result()
+        finally:
+            for future in futures.values():
+                future.cancel()
+        return _evaluate_parse_tree(root, base, memo=memo, deadline=deadline)
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs threads can deadlock the child
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else "spawn"
+                )
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+            return self._executor
+
+
+def heavy_subtrees(
+    root: Node, estimates: dict[int, Estimate], count: int, min_cost: float
+) -> list[Node]:
+    """Return up to count independent subtrees worth evaluating in parallel.
+
+    The subtrees are returned in the order of the tree, from left to right.
+    The result is [root] if the tree has no two heavy independent subtrees."""
+    subtrees = [root]
+    while len(subtrees) < count:
+        # The heaviest subtree that can be split
+        best = None
+        for index, node in enumerate(subtrees):
+            operands = _heavy_operands(node, estimates, min_cost)
+            if operands and (best is None or estimates[id(node)].cost > best[1]):
+                best = (index, estimates[id(node)].cost, operands)
+        if best is None:
+            break
+        index, _, operands = best
+        subtrees[index : index + 1] = operands
+    return subtrees
+
+
+def _heavy_operands(node: Node, estimates: dict[int, Estimate], min_cost: float) -> list[Node]:
+    """Return the two heavy operands of the first operator with two below node, if any.
+
+    Operators with a single heavy operand are skipped, since they have to wait
+    for it anyway."""
+    while True:
+        heavy = [
+            child
+            for child in (node.left, node.right)
+            if child is not None and estimates[id(child)].cost >= min_cost
+        ]
+        if len(heavy) == 2:
+            return heavy
+        if not heavy:
+            return []
+        node = heavy[0]
+
+
+def _run(program: Program, timeout: float | None) -> int | float:
+    return run(program, deadline=None if timeout is None else time.monotonic() + timeout)
+
+
+def evaluate_parallel(root: Node, base: int, deadline: float | None = None) -> int | float:
+    """Evaluate a parse tree with a ParallelEvaluator shared by the process.
+
+    This is the "parallel" engine of AlgebraEval and evaluate. The worker
+    processes are started on first use."""
+    global _default_evaluator
+    with _default_evaluator_lock:
+        if _default_evaluator is None:
+            _default_evaluator = ParallelEvaluator()
+        evaluator = _default_evaluator
+    return evaluator.evaluate(root, base, deadline)
@@ -1,12 +1,23 @@
-from .operators import BINARY_OPS
-from .tokenizer import Token, TokenTypes, SyntaxError
+from .operators import OperatorTable, get_operator_table
+from .tokenizer import Token, TokenStream, TokenTypes, SyntaxError
 
 
 class Node:
-    def __init__(self, token: Token | None = None):
+    __slots__ = ("token", "opcode", "left", "right", "slot", "value", "numeric_type")
+
+    def __init__(self, token: Token | None = None, opcode: int = 0):
         self.token: Token | None = token
+        # Index into the operator table for operator nodes
+        self.opcode = opcode
         self.left: Node | None = None
         self.right: Node | None = None
+        # Index into the variable bindings for VARIABLE leaves
+        self.slot: int | None = None
+        # Value of the subtree, cached by incremental evaluation
+        self.value: int | float | None = None
+        # Type of the value of the subtree, labelled by inference.infer_types.
+        # Unlabelled nodes are dynamic, i.e. their type is checked at run time.
+        self.numeric_type = 0
 
     def __repr__(self):
         return f"Node({self.token})"
@@ -30,63 +41,175 @@ def display_tree(node: Node | None, indent: str = "  ") -> None:
             return
 
 
-def parse(tokens: list[Token]) -> Node:
-    """Parse the list of tokens into a binary expression tree."""
+def assign_variable_slots(root: Node | None) -> list[str]:
+    """Assign a slot index to each variable leaf of the tree.
+
+    Slots are numbered in the order in which the variables first appear from left
+    to right, and repeated occurrences of a variable share a slot. Returns the list
+    of variable names indexed by slot."""
+    names: list[str] = []
+    slots: dict[str, int] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        if node.token is not None and node.token.type == TokenTypes.VARIABLE:
+            name = node.token.value
+            if name not in slots:
+                slots[name] = len(names)
+                names.append(name)
+            node.slot = slots[name]
+        stack.append(node.right)
+        stack.append(node.left)
+    return names
+
+
+def parse(tokens: TokenStream | list[Token], groups: dict[int, Node] | None = None) -> Node:
+    """Parse the stream of tokens into a binary expression tree.
+
+    Operators are resolved by their binding powers using explicit operand and
+    operator stacks instead of recursion, so the parser runs in time and stack
+    depth independent of how deeply the expression is nested. Each token is
+    pushed and popped at most once, which makes parsing linear in the number of
+    tokens. Token objects are only created for the tokens that become nodes.
+    Operators are looked up in the operator table by the opcodes of the tokens.
+
+    If a groups dictionary is given, the root of the subtree of each bracketed
+    group is stored in it under the index of the opening bracket token."""
     if not tokens:
         raise SyntaxError("No tokens to parse", 0)
+    if isinstance(tokens, list):
+        tokens = TokenStream.from_tokens(tokens)
 
-    root, _ = _parse(tokens)
-    return root
+    kinds = tokens.kinds
+    starts = tokens.starts
+    distances = tokens.distances
+    codes = tokens.codes
+    table = get_operator_table()
+    symbols = table.symbols
+    binding_powers = table.binding_powers
 
+    NUMBER = TokenTypes.NUMBER
+    VARIABLE = TokenTypes.VARIABLE
+    PREFIX_UNARY_OP = TokenTypes.PREFIX_UNARY_OP
+    POSTFIX_UNARY_OP = TokenTypes.POSTFIX_UNARY_OP
+    BINARY_OP = TokenTypes.BINARY_OP
+    OPEN_BRACKET = TokenTypes.OPEN_BRACKET
+    CLOSE_BRACKET = TokenTypes.CLOSE_BRACKET
+    END = TokenTypes.END
 
-def _parse(tokens: list[Token], start: int = 0, prec: int = 0) -> tuple[Node, int]:
-    """Internal method to parse tokens into a binary expression tree."""
+    operands: list[Node] = []
+    # Pending operators as (right binding power, node, token index). Opening
+    # brackets are pushed with a node of None and a binding power of 0.
+    operators: list[tuple[int, Node | None, int]] = []
+    expect_operand = True
 
-    token = tokens[start]
-    prev_prec = 0
+    for index, kind in enumerate(kinds):
+        if expect_operand:
+            if kind == NUMBER or kind == VARIABLE:
+                operands.append(Node(tokens[index]))
+                expect_operand = False
+            elif kind == PREFIX_UNARY_OP:
+                code = codes[index]
+                operators.append(
+                    (
+                        binding_powers[code][1],
+                        Node(_operator_token(kind, symbols[code]), code),
+                        index,
+                    )
+                )
+            elif kind == OPEN_BRACKET:
+                operators.append((0, None, index))
+            else:
+                raise SyntaxError(
+                    f"Expected a number, a variable, a prefix operator or an opening bracket, got {TokenTypes(kind).name}",
+                    starts[index],
+                )
+        elif kind == BINARY_OP:
+            code = codes[index]
+            left_bp, right_bp = binding_powers[code]
+            _reduce(operands, operators, left_bp)
+            if operators and operators[-1][1] is not None and operators[-1][1].token.type == BINARY_OP:
+                _check_associativity(table, operators[-1][1].opcode, code, starts[index])
+            operators.append((right_bp, Node(_operator_token(kind, symbols[code]), code), index))
+            expect_operand = True
+        elif kind == POSTFIX_UNARY_OP:
+            code = codes[index]
+            _reduce(operands, operators, binding_powers[code][0])
+            op_node = Node(_operator_token(kind, symbols[code]), code)
+            op_node.left = operands.pop()
+            operands.append(op_node)
+        elif kind == CLOSE_BRACKET:
+            _reduce(operands, operators, 0)
+            if not operators:
+                raise SyntaxError(
+                    "Closing bracket without matching opening bracket", starts[index]
+                )
+            _, _, opening_index = operators.pop()
+            # The tokenizer records the distance between matching brackets
+            distance = distances[opening_index]
+            if distance and distance != index - opening_index:
+                raise SyntaxError("Mismatched brackets", starts[index])
+            if groups is not None:
+                groups[opening_index] = operands[-1]
+        elif kind == END:
+            break
+        else:
+            raise SyntaxError(
+                f"Expected an operator or a closing bracket, got {TokenTypes(kind).name}",
+                starts[index],
+            )
 
-    if token.type == TokenTypes.END:
-        raise ValueError("Encountered END token: Something wrong here! ")
-    elif token.type == TokenTypes.OPEN_BRACKET:
-        root, ind = _parse(tokens, start + 1, prec)
-    elif token.type == TokenTypes.NUMBER:
-        root = Node(token)
-        ind = start + 1
-    else:
+    if expect_operand:
+        raise SyntaxError("Unexpected end of expression", len(tokens.source))
+
+    _reduce(operands, operators, 0)
+    if operators:
         raise SyntaxError(
-            f"Unexpected token at the beginning of a subtree, got {token.type}", 0
+            "Opening bracket without matching closing bracket", starts[operators[-1][2]]
         )
+    return operands.pop()
 
-    while ind < len(tokens):
-        token = tokens[ind]
-        if token.type == TokenTypes.END:
-            break
-        elif token.type == TokenTypes.NUMBER:
-            root.right = Node(token)
-        elif token.type == TokenTypes.OPEN_BRACKET:
-            node, ind = _parse(tokens, ind + 1, prec)
-            root.right = node
-        elif token.type == TokenTypes.CLOSE_BRACKET:
-            return root, ind + 1
-        elif token.type == TokenTypes.POSTFIX_UNARY_OP:
-            op_node = Node(token)
-            op_node.left = root
-            root = op_node
-        elif token.type == TokenTypes.BINARY_OP:
-            op_node = Node(token)
-            cur_prec = BINARY_OPS[token.value].precedence
-            if prev_prec == 0:
-                op_node.left = root
-                root = op_node
-            elif cur_prec > prev_prec:
-                node, ind = _parse(tokens, ind - 1, cur_prec)
-                root.right = node
-            else:
-                op_node.left = root
-                root = op_node
-            prev_prec = cur_prec
-        else:
-            raise SyntaxError(f"Unexpected token in expression, got {token.type}", ind)
-        ind += 1
 
-    return root, ind
+# Operator tokens are immutable once parsed, so all nodes of the same operator
+# share a single token
+_OPERATOR_TOKENS: dict[tuple[int, str], Token] = {}
+
+
+def _operator_token(kind: int, symbol: str) -> Token:
+    token = _OPERATOR_TOKENS.get((kind, symbol))
+    if token is None:
+        token = _OPERATOR_TOKENS[(kind, symbol)] = Token(TokenTypes(kind), symbol)
+    return token
+
+
+def _check_associativity(table: OperatorTable, previous: int, code: int, position: int) -> None:
+    """Reject a binary operator following one of the same precedence but opposite associativity.
+
+    The operand between them, like 3 in 2 ^ 3 _C 2, has no clear owner."""
+    previous_left_bp, previous_right_bp = table.binding_powers[previous]
+    left_bp, right_bp = table.binding_powers[code]
+    if min(previous_left_bp, previous_right_bp) == min(left_bp, right_bp) and (
+        previous_left_bp > previous_right_bp
+    ) != (left_bp > right_bp):
+        raise SyntaxError(
+            f"Operators '{table.symbols[previous]}' and '{table.symbols[code]}' have the same "
+            "precedence but opposite associativity, use brackets",
+            position,
+        )
+
+
+def _reduce(
+    operands: list[Node], operators: list[tuple[int, Node | None, int]], min_bp: int
+) -> None:
+    """Apply the pending operators that bind tighter than min_bp."""
+    while operators and operators[-1][0] > min_bp:
+        _, op_node, _ = operators.pop()
+        assert op_node is not None and op_node.token is not None
+        if op_node.token.type == TokenTypes.PREFIX_UNARY_OP:
+            op_node.left = operands.pop()
+        else:
+            op_node.right = operands.pop()
+            op_node.left = operands.pop()
+        operands.append(op_node)
@@ -1,24 +1,94 @@
 import logging
+import threading
+import time
 
-from .num_utils import DECIMAL_POINT, str_to_int, str_to_float, num_to_str
-from .operators import PREFIX_UNARY_OPS, POSTFIX_UNARY_OPS, BINARY_OPS
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from time import perf_counter_ns
+from typing import Any, TextIO
+
+from .budget import Estimate, check_budget, check_deadline, estimate_tree
+from .cache import ParseCache
+from .compiler import CompiledExpression, compile_tree
+from .dag import count_shared_nodes, intern_subtrees
+from .incremental import IncrementalExpression
+from .inference import NUMERIC_TYPE_NAMES, infer_types, literal_value, typed_functions
+from .num_utils import num_to_str
+from .operators import function, get_operator_table
 from .parser import Node, parse, display_tree
-from .tokenizer import Token, TokenTypes, tokenize
+from .stats import EvaluationStats, count_nodes, timed_operators
+from .stream import evaluate_stream
+from .tokenizer import TokenStream, TokenTypes, tokenize
+from .vm import Program, lower, run
 
 
 logger = logging.getLogger(__name__)
 
+ENGINES = ("tree", "vm", "parallel")
+
 
 class AlgebraEval:
-    def __init__(self, expr: str = "", *, base: int = 10):
-        """Initialize the AlgebraEval with an expression and base."""
+    def __init__(
+        self,
+        expr: str = "",
+        *,
+        base: int = 10,
+        cache_size: int = 0,
+        engine: str = "tree",
+        cse: bool = False,
+        max_bits: int | None = None,
+        max_cost: float | None = None,
+        deadline: float | None = None,
+        profile: bool = False,
+        stats_hook: Callable[[str, EvaluationStats], None] | None = None,
+    ):
+        """Initialize the AlgebraEval with an expression and base.
+
+        If cache_size is positive, the tokens and parse trees of the most
+        recently used expressions are kept in an LRU cache of that size. The
+        engine is either "tree", which walks the parse tree, or
+        "vm", which lowers the tree to a postfix Program for a stack machine,
+        or "parallel", which evaluates the independent heavy subtrees of the
+        tree on a pool of worker processes (see parallel.ParallelEvaluator).
+        All engines produce identical results.
+
+        If cse is True, structurally identical subtrees are shared after parsing
+        (common subexpression elimination), so that each distinct subtree is
+        evaluated once per evaluation. The number of shared nodes of the last
+        expression is available as shared_nodes.
+
+        The budgets limit the resources of each evaluation. Before evaluating,
+        the size of every intermediate result (in bits) and the total cost are
+        estimated (see budget.estimate_tree), and expressions exceeding
+        max_bits or max_cost are rejected with BudgetExceeded. The deadline is
+        a wall-clock limit in seconds, checked between operators.
+
+        If profile is True, the time spent in each stage and in each operator
+        is measured and accumulated (see stats()). A stats_hook is called with
+        the expression and the EvaluationStats of every evaluation, and implies
+        profiling. Without profiling, no timers are read."""
         if base < 2:
             raise ValueError("Base must be a positive integer greater than 1.")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Choose one of {ENGINES}.")
 
         self.expr = expr
         self.base = base
-        self.tokens:list[Token] = []
+        self.tokens: TokenStream | None = None
         self.tree_root: Node | None = None
+        self.program: Program | None = None
+        self.engine = engine
+        self.cse = cse
+        self.shared_nodes = 0
+        self.cache: ParseCache | None = ParseCache(cache_size) if cache_size else None
+        self.max_bits = max_bits
+        self.max_cost = max_cost
+        self.deadline = deadline
+        self.profile = profile or stats_hook is not None
+        self.stats_hook = stats_hook
+        self._stats = EvaluationStats()
+        self._stats_lock = threading.Lock()
+        # State of incremental updates, see update()
+        self._incremental: IncrementalExpression | None = None
 
 
     def set_base(self, base: int):
@@ -28,31 +98,231 @@ class AlgebraEval:
 
 
     def evaluate(self, expr: str = "") -> str:
-        """Evaluate the algebraic expression."""
+        """Evaluate the algebraic expression.
 
-        if expr:
-            self.expr = expr
-        logger.info(f"Evaluating expression '{self.expr}' in base {self.base}")
+        The tokens, parse tree and result of the last evaluation are kept on the
+        evaluator for inspection. Concurrent calls from several threads return
+        their own results, but these attributes are then those of any one of
+        them; use the evaluate function for the complete result of each call."""
 
-        self.tokens = tokenize(self.expr, base=self.base)
-        logger.info(
-            f"Done tokenizing: Found {len(self.tokens)} tokens (including END Token)."
+        result = evaluate(
+            expr or self.expr,
+            self.base,
+            cache=self.cache,
+            engine=self.engine,
+            cse=self.cse,
+            max_bits=self.max_bits,
+            max_cost=self.max_cost,
+            deadline=self.deadline,
+            profile=self.profile,
         )
-        logger.debug(self.get_tokens())
+        self.expr = result.expr
+        self.tokens = result.tokens
+        self.tree_root = result.tree
+        self.program = result.program
+        self.shared_nodes = result.shared_nodes
+        self.result_base10 = result.value
+        self.result = result.string
+        if result.stats is not None:
+            self._record_stats(result.expr, result.stats)
+        return result.string
+
+    def update(self, edit_start: int, edit_end: int, new_text: str) -> str:
+        """Replace expr[edit_start:edit_end] with new_text and evaluate the result.
 
-        self.tree_root = parse(self.tokens)
-        logger.info(f"Done parsing.")
-        logger.debug(self.get_parse_tree())
+        The first update parses the current expression once. Each update then
+        re-parses only the innermost bracketed group containing the edit, and
+        re-evaluates only the operators above it (see IncrementalExpression).
+        The budgets and the deadline are applied as in evaluate, and profiled
+        updates count re-tokenizing and re-parsing the group as parsing. Since
+        the values are kept on the parse tree, updates always use the tree
+        engine without cse, which gives the same results."""
+        stop = None if self.deadline is None else time.monotonic() + self.deadline
+        stats = EvaluationStats() if self.profile else None
+        if stats is not None:
+            start = perf_counter_ns()
+        incremental = self._incremental
+        if incremental is None or (incremental.source, incremental.base) != (self.expr, self.base):
+            incremental = self._incremental = IncrementalExpression(self.expr, self.base)
+        try:
+            incremental.update(edit_start, edit_end, new_text)
+        finally:
+            self.expr = incremental.source
+        if stats is not None:
+            stats.stage_ns["parse"] = perf_counter_ns() - start
+        self.tokens = incremental.tokens
+        self.tree_root = incremental.root
+        self.program = None
+        assert self.tree_root is not None and self.tokens is not None
+        if self.max_bits is not None or self.max_cost is not None:
+            check_budget(estimate_tree(self.tree_root, self.base), self.max_bits, self.max_cost)
+        if stop is not None:
+            check_deadline(stop)
 
-        self.result_base10: int | float = _evaluate_parse_tree(
-            self.tree_root, self.base
+        if stats is not None:
+            start = perf_counter_ns()
+        self.result_base10 = incremental.evaluate(
+            stop, None if stats is None else timed_operators(stats)
         )
-        self.result: str = num_to_str(self.result_base10, self.base)
-        logger.info(
-            f"{self.expr} =  {self.result_base10} in base 10 = {self.result_base10} in {self.base}"
+        if stats is not None:
+            stats.stage_ns["evaluate"] = perf_counter_ns() - start
+            start = perf_counter_ns()
+        self.result = num_to_str(self.result_base10, self.base)
+        if stats is not None:
+            stats.stage_ns["num_to_str"] = perf_counter_ns() - start
+            stats.evaluations = 1
+            stats.tokens = len(self.tokens)
+            stats.nodes = count_nodes(self.tree_root)
+            self._record_stats(self.expr, stats)
+        return self.result
+
+    def estimate(self, expr: str = "") -> Estimate:
+        """Estimate the result size and the cost of evaluating an expression.
+
+        Without an argument, the last parsed expression is estimated."""
+        base = self.base
+        root = None if expr else self.tree_root
+        if root is None:
+            root = self._parse(expr or self.expr, base)
+        return estimate_tree(root, base)
+
+    def compile(self, expr: str = "") -> CompiledExpression:
+        """Compile the algebraic expression into a reusable callable.
+
+        The budgets and the deadline apply to each call (see compiler.compile_tree),
+        and an expression without variables that exceeds the budgets is
+        rejected here."""
+        expr = expr or self.expr
+        base = self.base
+        logger.info(f"Compiling expression '{expr}' in base {base}")
+
+        return compile_tree(
+            self._parse(expr, base),
+            base,
+            expr,
+            max_bits=self.max_bits,
+            max_cost=self.max_cost,
+            deadline=self.deadline,
         )
+
+    def prepare(self, expr: str = "") -> CompiledExpression:
+        """Parse an expression with variables once for evaluation with many bindings.
+
+        The variables are bound when calling the returned object, for instance
+        evaluator.prepare("a*x^2 + b")(a=1, b=2, x=3). The bound values are numbers
+        and are not interpreted in the base of the evaluator."""
+        return self.compile(expr)
+
+    def evaluate_columns(
+        self,
+        expr: str = "",
+        columns: Mapping[str, Any] | None = None,
+        *,
+        bases: Any = None,
+        chunk_size: int | None = None,
+    ) -> Any:
+        """Evaluate an expression over NumPy arrays of variable values, and optionally of bases.
+
+        For instance, evaluator.evaluate_columns("a*x^2 + b", {"a": a, "x": x, "b": 2})
+        returns an array with the result of each row. Without bases, the base of
+        the evaluator is used. See columnar.evaluate_columns."""
+        from .columnar import DEFAULT_CHUNK_SIZE, evaluate_columns
+
+        expr = expr or self.expr
+        result = evaluate_columns(
+            expr,
+            self.base if bases is None else bases,
+            columns,
+            chunk_size=chunk_size or DEFAULT_CHUNK_SIZE,
+            cache=self.cache,
+        )
+        self.expr = expr
+        return result
+
+    def evaluate_many(
+        self,
+        exprs: Iterable[str],
+        *,
+        workers: int | None = None,
+        backend: str = "process",
+        chunksize: int = 64,
+    ) -> list[str | Exception]:
+        """Evaluate many expressions in the current base, preserving their order.
+
+        The backend is one of "process", "thread" or "serial". The engine, cse
+        and budgets of the evaluator apply to each expression. Each item of the
+        returned list is either the result string or the exception (SyntaxError,
+        ValueError, ArithmeticError or BudgetExceeded) raised by the
+        corresponding expression."""
+        from .batch import evaluate_many
+
+        return evaluate_many(
+            exprs,
+            base=self.base,
+            workers=workers,
+            backend=backend,
+            chunksize=chunksize,
+            engine=self.engine,
+            cse=self.cse,
+            max_bits=self.max_bits,
+            max_cost=self.max_cost,
+            deadline=self.deadline,
+        )
+
+    def evaluate_stream(self, source: TextIO | Iterable[str]) -> str:
+        """Evaluate an expression read from a text stream or an iterable of chunks.
+
+        The input is tokenized lazily and never held in memory as a whole, so
+        this is suited to huge expressions. No tokens or parse tree are stored
+        on the evaluator."""
+        logger.info(f"Evaluating a streamed expression in base {self.base}")
+        self.result_base10 = evaluate_stream(source, base=self.base)
+        self.result = num_to_str(self.result_base10, self.base)
         return self.result
 
+    def stats(self) -> dict:
+        """Return the statistics accumulated over the profiled evaluations.
+
+        The result has the stage timings in nanoseconds ("stage_ns"), the call
+        count and time of each operator ("operators") and the total numbers of
+        evaluations, tokens and parse tree nodes. It is empty unless profiling."""
+        if not self.profile:
+            return {}
+        return self._stats.as_dict()
+
+    def stats_report(self) -> str:
+        """Return the accumulated statistics as a human readable table."""
+        return self._stats.format()
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats = EvaluationStats()
+
+    def _record_stats(self, expr: str, stats: EvaluationStats) -> None:
+        with self._stats_lock:
+            self._stats.add(stats)
+        if self.stats_hook is not None:
+            self.stats_hook(expr, stats)
+
+    def cache_info(self) -> dict[str, int]:
+        """Return the hit, miss and eviction counters of the parse cache."""
+        if self.cache is None:
+            return {}
+        return self.cache.info()
+
+    def _parse(self, expr: str, base: int) -> Node:
+        """Tokenize and parse an expression, using the cache if enabled.
+
+        The results are stored for inspection, but only read from the return
+        value, so that concurrent calls do not see each other's expressions."""
+        tokens, root, program, shared_nodes = _parse_expression(expr, base, self.cache, self.cse)
+        self.expr = expr
+        self.tokens = tokens
+        self.tree_root = root
+        self.program = program
+        self.shared_nodes = shared_nodes
+        return root
+
     def display(self) -> None:
         """Display the expression and its evaluation."""
         if self.tree_root:
@@ -60,10 +330,7 @@ class AlgebraEval:
             display_tree(self.tree_root)
 
     def get_tokens(self) -> str:
-        tokens_str = ""
-        for index, token in enumerate(self.tokens):
-            tokens_str += f" {index}. {token}\n"
-        return tokens_str
+        return _tokens_to_str(self.tokens or [])
 
     def get_parse_tree(self) -> str:
         """Return a string representation of the parse tree"""
@@ -72,26 +339,275 @@ class AlgebraEval:
         return "No parse tree available."
 
 
-def _evaluate_parse_tree(root: Node | None, base: int, int_flag:bool = True) -> int | float:
-    """Recursively evaluate the parse tree."""
-    if root is None:
-        raise ValueError("Cannot evaluate an empty tree.")
-    if root.token is None:
-        raise ValueError("Cannot evaluate a node without a token.")
-    elif root.token.type == TokenTypes.NUMBER:
-        if int_flag:
-            return str_to_int(root.token.value, base)
+class EvaluationResult:
+    """The immutable result of evaluating an expression.
+
+    It holds the expression and base, the token stream, the parse tree (a DAG
+    if common subexpressions were shared) and its number of shared nodes, the
+    VM program if the "vm" engine was used, and the numeric value with its
+    string in the base. stats holds the EvaluationStats of a profiled
+    evaluation, and is None otherwise."""
+
+    __slots__ = (
+        "expr",
+        "base",
+        "tokens",
+        "tree",
+        "program",
+        "shared_nodes",
+        "value",
+        "string",
+        "stats",
+    )
+
+    def __init__(
+        self,
+        expr: str,
+        base: int,
+        tokens: TokenStream,
+        tree: Node,
+        program: Program | None,
+        shared_nodes: int,
+        value: int | float,
+        string: str,
+        stats: EvaluationStats | None = None,
+    ):
+        fields = (expr, base, tokens, tree, program, shared_nodes, value, string, stats)
+        for name, field in zip(self.__slots__, fields):
+            object.__setattr__(self, name, field)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("EvaluationResult is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("EvaluationResult is immutable.")
+
+    def __repr__(self):
+        return f"EvaluationResult(expr={self.expr!r}, base={self.base}, string={self.string!r})"
+
+
+def evaluate(
+    expr: str,
+    base: int = 10,
+    *,
+    cache: ParseCache | None = None,
+    engine: str = "tree",
+    cse: bool = False,
+    max_bits: int | None = None,
+    max_cost: float | None = None,
+    deadline: float | None = None,
+    profile: bool = False,
+) -> EvaluationResult:
+    """Evaluate an expression and return the complete result.
+
+    This keeps no state between calls, so it can be called from any number of
+    threads at once. The cache, which is thread-safe, may be shared between
+    calls. The options are those of AlgebraEval."""
+    if base < 2:
+        raise ValueError("Base must be a positive integer greater than 1.")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Choose one of {ENGINES}.")
+    logger.info(f"Evaluating expression '{expr}' in base {base}")
+
+    stop = None if deadline is None else time.monotonic() + deadline
+    stats = EvaluationStats() if profile else None
+    tokens, root, program, shared_nodes = _parse_expression(expr, base, cache, cse, stats)
+    if max_bits is not None or max_cost is not None:
+        check_budget(estimate_tree(root, base), max_bits, max_cost)
+    if stop is not None:
+        check_deadline(stop)
+
+    if stats is not None:
+        start = perf_counter_ns()
+    value: int | float
+    if engine == "vm":
+        if program is None:
+            program = lower(root, base, shared=cse)
+            if cache is not None:
+                cache.put(expr, base, tokens, root, program, cse)
+        value = run(
+            program,
+            deadline=stop,
+            functions=None if stats is None else timed_operators(stats),
+        )
+    elif engine == "parallel":
+        from .parallel import evaluate_parallel
+
+        # The operators evaluated by worker processes are not profiled
+        value = evaluate_parallel(root, base, deadline=stop)
+    else:
+        value = _evaluate_parse_tree(
+            root,
+            base,
+            memo={} if cse else None,
+            deadline=stop,
+            functions=None if stats is None else timed_operators(stats),
+        )
+    if stats is not None:
+        stats.stage_ns["evaluate"] = perf_counter_ns() - start
+        start = perf_counter_ns()
+    string = num_to_str(value, base)
+    if stats is not None:
+        stats.stage_ns["num_to_str"] = perf_counter_ns() - start
+        stats.evaluations = 1
+        stats.tokens = len(tokens)
+        stats.nodes = count_nodes(root)
+
+    if logger.isEnabledFor(logging.INFO):
+        # str() of a huge int would exceed the interpreter's digit limit
+        logger.info(f"{expr} =  {num_to_str(value, 10)} in base 10 = {string} in {base}")
+    return EvaluationResult(expr, base, tokens, root, program, shared_nodes, value, string, stats)
+
+
+def estimate(expr: str, base: int = 10, *, cache: ParseCache | None = None) -> Estimate:
+    """Estimate the result size and the cost of evaluating an expression.
+
+    Like evaluate, this keeps no state and may share a cache between threads."""
+    _, root, _, _ = _parse_expression(expr, base, cache, False)
+    return estimate_tree(root, base)
+
+
+def _parse_expression(
+    expr: str,
+    base: int,
+    cache: ParseCache | None,
+    cse: bool,
+    stats: EvaluationStats | None = None,
+) -> tuple[TokenStream, Node, Program | None, int]:
+    """Tokenize and parse an expression, using the cache if given.
+
+    Returns the tokens, the parse tree, the cached VM program if any, and the
+    number of shared nodes if cse is True."""
+    if cache is not None:
+        entry = cache.get(expr, base, cse)
+        if entry is not None:
+            tokens, root, program = entry
+            logger.info("Found tokens and parse tree in the cache.")
+            # Trees cached with cse are already interned
+            return tokens, root, program, count_shared_nodes(root) if cse else 0
+
+    if stats is not None:
+        start = perf_counter_ns()
+    tokens = tokenize(expr, base=base)
+    if stats is not None:
+        stats.stage_ns["tokenize"] = perf_counter_ns() - start
+    logger.info(f"Done tokenizing: Found {len(tokens)} tokens (including END Token).")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_tokens_to_str(tokens))
+
+    if stats is not None:
+        start = perf_counter_ns()
+    root = parse(tokens)
+    if stats is not None:
+        stats.stage_ns["parse"] = perf_counter_ns() - start
+    logger.info(f"Done parsing.")
+    shared_nodes = 0
+    if cse:
+        root, shared_nodes = intern_subtrees(root)
+        logger.info(f"Shared {shared_nodes} nodes of the parse tree.")
+    numeric_type = infer_types(root, base)
+    logger.info(f"Inferred the type of the result: {NUMERIC_TYPE_NAMES[numeric_type]}.")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_parse_tree_to_str(root))
+
+    if cache is not None:
+        cache.put(expr, base, tokens, root, cse=cse)
+    return tokens, root, None, shared_nodes
+
+
+def _evaluate_parse_tree(
+    root: Node | None,
+    base: int,
+    variables: Sequence[int | float] | None = None,
+    memo: dict[int, int | float] | None = None,
+    deadline: float | None = None,
+    functions: Sequence[function] | None = None,
+) -> int | float:
+    """Evaluate the parse tree.
+
+    Nodes labelled by inference.infer_types are evaluated with the functions
+    specialized for their numeric type, and literals are converted with the
+    converter for their type. Variable leaves are looked up in variables by
+    their slot index (see parser.assign_variable_slots). If a memo dictionary
+    is given, the value of each operator node is recorded under its id, so that
+    subtrees shared by several parents (see dag.intern_subtrees) are evaluated
+    only once. If a time.monotonic() deadline is given, it is checked at each
+    node. The operator functions can be replaced by a sequence indexed by
+    opcode, like the functions of the operator table, which is then used for
+    all numeric types."""
+    if functions is None:
+        dispatch = typed_functions(get_operator_table())
+    else:
+        dispatch = (functions,) * len(NUMERIC_TYPE_NAMES)
+    return _evaluate_node(root, base, variables, memo, deadline, dispatch)
+
+
+def _evaluate_node(
+    root: Node | None,
+    base: int,
+    variables: Sequence[int | float] | None,
+    memo: dict[int, int | float] | None,
+    deadline: float | None,
+    dispatch: Sequence[Sequence[function]],
+) -> int | float:
+    """Evaluate a parse tree in post-order with explicit stacks.
+
+    Operands are evaluated from left to right, so the error of the leftmost
+    failing operator is raised, and the depth of the tree is not limited by
+    the recursion limit."""
+    values: list[int | float] = []
+    # Nodes to visit, and whether the values of their operands are on values
+    stack: list[tuple[Node | None, bool]] = [(root, False)]
+    while stack:
+        node, operands_done = stack.pop()
+        if operands_done:
+            assert node is not None and node.token is not None
+            func = dispatch[node.numeric_type][node.opcode]
+            if node.token.type == TokenTypes.BINARY_OP:
+                right = values.pop()
+                result = func(values.pop(), right)
+            else:
+                result = func(values.pop())
+            if memo is not None:
+                memo[id(node)] = result
+            values.append(result)
+            continue
+
+        if node is None:
+            raise ValueError("Cannot evaluate an empty tree.")
+        if memo is not None and id(node) in memo:
+            values.append(memo[id(node)])
+            continue
+        if deadline is not None:
+            check_deadline(deadline)
+        if node.token is None:
+            raise ValueError("Cannot evaluate a node without a token.")
+        elif node.token.type == TokenTypes.NUMBER:
+            values.append(literal_value(node, base))
+        elif node.token.type == TokenTypes.VARIABLE:
+            if variables is None or node.slot is None:
+                raise ValueError(f"Variable '{node.token.value}' is not bound.")
+            values.append(variables[node.slot])
+        elif node.token.type == TokenTypes.BINARY_OP:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+        elif (
+            node.token.type == TokenTypes.PREFIX_UNARY_OP
+            or node.token.type == TokenTypes.POSTFIX_UNARY_OP
+        ):
+            stack.append((node, True))
+            stack.append((node.left, False))
         else:
-            return str_to_float(root.token.value, base)
-    elif root.token.type == TokenTypes.POSTFIX_UNARY_OP:
-        val = _evaluate_parse_tree(root.left, base)
-        func = POSTFIX_UNARY_OPS[root.token.value].function
-        return func(val)
-    elif root.token.type == TokenTypes.BINARY_OP:
-        val_left = _evaluate_parse_tree(root.left, base)
-        val_right = _evaluate_parse_tree(root.right, base)
-        func = BINARY_OPS[root.token.value].function
-        return func(val_left, val_right)
+            raise ValueError(f"Cannot evaluate a node of type {node.token.type.name}.")
+    return values.pop()
+
+
+def _tokens_to_str(tokens: Iterable) -> str:
+    tokens_str = ""
+    for index, token in enumerate(tokens):
+        tokens_str += f" {index}. {token}\n"
+    return tokens_str
 
 
 def _parse_tree_to_str(node: Node | None, indent: str = "  ", prefix: str = "") -> str:
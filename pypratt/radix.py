@@ -0,0 +1,163 @@
+import string
+import sys
+
+from functools import cache
+
+
+MIN_BASE = 2
+MAX_BASE = 36
+
+# Digit characters indexed by their value
+DIGITS = string.digits + string.ascii_uppercase
+
+# Numbers of up to this many digits are converted directly. The conversions of
+# larger numbers are split recursively into blocks of LEAF_DIGITS * 2**k digits.
+# This must stay below sys.int_info.str_digits_check_threshold (640), the least
+# value that sys.set_int_max_str_digits accepts.
+LEAF_DIGITS = 512
+
+# Bases in which int() and format() convert in linear time
+_POWER_OF_TWO_BASES = frozenset({2, 4, 8, 16, 32})
+_FORMAT_SPECS = {2: "b", 8: "o", 16: "X"}
+
+# Largest number of digits per entry of the lookup tables of _digit_groups
+_MAX_GROUP_SIZE = 4096
+
+
+def check_base(base: int) -> None:
+    if base < MIN_BASE:
+        raise ValueError("Base must be a positive integer greater than 1.")
+    if base > MAX_BASE:
+        raise ValueError("Base must be a positive integer less than or equal to 36.")
+
+
+@cache
+def digit_values(base: int) -> dict[str, int]:
+    """Return the lookup table from the digit characters of a base to their values.
+
+    Letters are accepted in both cases."""
+    if not MIN_BASE <= base <= MAX_BASE:
+        raise ValueError(f"Base {base} is not supported. Supported bases are 2-36.")
+    table = {char: value for value, char in enumerate(DIGITS[:base])}
+    table.update({char.lower(): value for char, value in table.items()})
+    return table
+
+
+@cache
+def _digit_groups(base: int) -> tuple[int, int, tuple[str, ...]]:
+    """Return the lookup table of all zero-padded groups of digits of a base.
+
+    The result is (group size, base ** group size, table), where table[value]
+    is the digit string of value padded to the group size."""
+    size = 1
+    while base ** (size + 1) <= _MAX_GROUP_SIZE:
+        size += 1
+    table: list[str] = [""]
+    for _ in range(size):
+        table = [prefix + digit for prefix in table for digit in DIGITS[:base]]
+    return size, base**size, tuple(table)
+
+
+def digits_to_int(digits: str, base: int) -> int:
+    """Convert a string of valid digits (without sign or separators) to an integer.
+
+    Long strings are split into halves whose values are combined with cached
+    powers of the base, so the cost is that of a few big multiplications instead
+    of being quadratic in the number of digits."""
+    if base in _POWER_OF_TWO_BASES or len(digits) <= LEAF_DIGITS:
+        return int(digits, base) if digits else 0
+    if base == 10 and _within_str_digits_limit(len(digits)):
+        return int(digits)
+
+    powers = _leaf_powers(base, len(digits))
+    return _digits_to_int(digits, base, powers)
+
+
+def _digits_to_int(digits: str, base: int, powers: list[int]) -> int:
+    length = len(digits)
+    if length <= LEAF_DIGITS:
+        return int(digits, base)
+    # Split off the largest block of LEAF_DIGITS * 2**level digits that leaves a non-empty head
+    level = ((length - 1) // LEAF_DIGITS).bit_length() - 1
+    split = length - (LEAF_DIGITS << level)
+    high = _digits_to_int(digits[:split], base, powers)
+    low = _digits_to_int(digits[split:], base, powers)
+    return high * powers[level] + low
+
+
+def int_to_digits(num: int, base: int) -> str:
+    """Convert a non-negative integer to its digits in the base, without a sign.
+
+    Large numbers are split recursively by divmod with cached powers of the base,
+    and the blocks of at most LEAF_DIGITS digits are converted with lookup tables."""
+    check_base(base)
+    if num < 0:
+        raise ValueError("Only non-negative integers can be converted to digits.")
+
+    if base in _FORMAT_SPECS:
+        return format(num, _FORMAT_SPECS[base])
+    if num < _leaf_power(base):
+        return _small_int_to_digits(num, base)
+    if base == 10 and _within_str_digits_limit(num.bit_length() * 0.302 + 1):
+        return str(num)
+
+    powers = [_leaf_power(base)]
+    while powers[-1] <= num:
+        powers.append(powers[-1] * powers[-1])
+    parts: list[str] = []
+    _int_to_digits(num, len(powers) - 1, powers, base, False, parts)
+    return "".join(parts)
+
+
+def _int_to_digits(
+    num: int, level: int, powers: list[int], base: int, pad: bool, parts: list[str]
+) -> None:
+    """Append the digits of num < powers[level] to parts.
+
+    If pad is True, the digits are padded with zeros to LEAF_DIGITS * 2**level."""
+    if level == 0:
+        digits = _small_int_to_digits(num, base)
+        parts.append(digits.rjust(LEAF_DIGITS, "0") if pad else digits)
+        return
+    high, low = divmod(num, powers[level - 1])
+    if high or pad:
+        _int_to_digits(high, level - 1, powers, base, pad, parts)
+        _int_to_digits(low, level - 1, powers, base, True, parts)
+    else:
+        _int_to_digits(low, level - 1, powers, base, False, parts)
+
+
+def _small_int_to_digits(num: int, base: int) -> str:
+    """Convert an integer of at most LEAF_DIGITS digits, a group of digits at a time."""
+    if base == 10:
+        return str(num)
+    size, group_base, table = _digit_groups(base)
+    groups: list[str] = []
+    while num >= group_base:
+        num, group = divmod(num, group_base)
+        groups.append(table[group])
+    groups.append(table[num].lstrip("0") or "0")
+    groups.reverse()
+    return "".join(groups)
+
+
+def _within_str_digits_limit(digits: float) -> bool:
+    """Whether str() and int() accept a decimal number of this many digits.
+
+    CPython converts long decimal numbers with subquadratic algorithms of its
+    own, but only up to sys.get_int_max_str_digits()."""
+    limit = sys.get_int_max_str_digits()
+    return limit == 0 or digits < limit
+
+
+@cache
+def _leaf_power(base: int) -> int:
+    return base**LEAF_DIGITS
+
+
+def _leaf_powers(base: int, length: int) -> list[int]:
+    """Return [base ** (LEAF_DIGITS * 2**k) for k = 0, 1, ...] up to the given length."""
+    powers = [_leaf_power(base)]
+    while LEAF_DIGITS << len(powers) < length:
+        powers.append(powers[-1] * powers[-1])
+    return powers
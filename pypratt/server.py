@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+
+from .aio import DEFAULT_CACHE_SIZE, DEFAULT_OFFLOAD_COST, AsyncEvaluator
+from .batch import EVALUATION_ERRORS, result_record
+from .radix import check_base
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7878
+
+# Requests read from a connection whose responses have not been written yet.
+# Beyond this, the server stops reading from the connection.
+DEFAULT_MAX_PENDING = 64
+
+# Longest request line in bytes
+DEFAULT_MAX_LINE = 1 << 20
+
+# Seconds given to the connections to answer their pending requests on shutdown
+SHUTDOWN_TIMEOUT = 10.0
+
+
+class EvaluationServer:
+    """An asyncio server evaluating newline-delimited JSON requests.
+
+    Each request is a JSON object with the expression ("expr") and optionally
+    its base ("base") and an "id", which is copied to the response. Responses
+    are written in request order, with either the "result" or the "error",
+    "message" and, for syntax errors, "index" (see batch.result_record).
+
+    Expressions are evaluated by an AsyncEvaluator, which keeps a warm parse
+    cache and sends those whose estimated cost exceeds offload_cost
+    to a pool of worker processes. Evaluations exceeding the timeout are
+    stopped. Every connection may pipeline up to max_pending requests."""
+
+    def __init__(
+        self,
+        *,
+        base: int = 10,
+        workers: int | None = None,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        offload_cost: float = DEFAULT_OFFLOAD_COST,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        max_line: int = DEFAULT_MAX_LINE,
+        max_bits: int | None = None,
+        max_cost: float | None = None,
+        timeout: float | None = None,
+    ):
+        check_base(base)
+        if max_pending < 1:
+            raise ValueError("The number of pending requests must be a positive integer.")
+        self.base = base
+        self.max_pending = max_pending
+        self.max_line = max_line
+        self.timeout = timeout
+        self.requests = 0
+        self.evaluator = AsyncEvaluator(
+            workers=workers,
+            cache_size=cache_size,
+            offload_cost=offload_cost,
+            max_bits=max_bits,
+            max_cost=max_cost,
+        )
+        self._server: asyncio.Server | None = None
+        self._receivers: set[asyncio.Task] = set()
+        self._connections: set[asyncio.Task] = set()
+
+    async def start(
+        self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, path: str | None = None
+    ) -> asyncio.Server:
+        """Listen on a Unix socket if a path is given, else on a TCP port."""
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path, limit=self.max_line
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, host, port, limit=self.max_line
+            )
+        logger.info(f"Listening on {self.address()}")
+        return self._server
+
+    def address(self) -> str:
+        assert self._server is not None
+        address = self._server.sockets[0].getsockname()
+        if isinstance(address, tuple):
+            return f"{address[0]}:{address[1]}"
+        return address
+
+    async def close(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """Stop accepting connections and requests, and answer the pending requests.
+
+        Connections still busy after the timeout are dropped."""
+        if self._server is not None:
+            self._server.close()
+        for receiver in self._receivers:
+            receiver.cancel()
+        if self._connections:
+            _, busy = await asyncio.wait(self._connections, timeout=timeout)
+            for connection in busy:
+                connection.cancel()
+            await asyncio.gather(*busy, return_exceptions=True)
+        await self.evaluator.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+        logger.info(f"Server closed after {self.requests} requests")
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        connection = asyncio.current_task()
+        assert connection is not None
+        self._connections.add(connection)
+        # The responses are queued in request order, and a slot is taken for
+        # every pending request, so that a client that does not read its
+        # responses eventually stops being read from
+        responses: asyncio.Queue[asyncio.Future | None] = asyncio.Queue()
+        slots = asyncio.Semaphore(self.max_pending)
+        receiver = asyncio.create_task(self._receive(reader, responses, slots))
+        sender = asyncio.create_task(self._send(writer, responses, slots))
+        self._receivers.add(receiver)
+        try:
+            await asyncio.wait((receiver, sender), return_when=asyncio.FIRST_COMPLETED)
+            if sender.done():
+                # The client went away before reading its responses
+                receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+            responses.put_nowait(None)
+            await sender
+        except ConnectionError:
+            pass
+        finally:
+            receiver.cancel()
+            sender.cancel()
+            self._receivers.discard(receiver)
+            self._connections.discard(connection)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _receive(
+        self,
+        reader: asyncio.StreamReader,
+        responses: asyncio.Queue[asyncio.Future | None],
+        slots: asyncio.Semaphore,
+    ) -> None:
+        while True:
+            await slots.acquire()
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # The rest of an overlong line cannot be told apart from the
+                # next request, so the connection is closed after the error
+                responses.put_nowait(
+                    _completed({"error": "ValueError", "message": "Request line is too long."})
+                )
+                return
+            if not line:
+                slots.release()
+                return
+            if not line.strip():
+                slots.release()
+                continue
+            responses.put_nowait(asyncio.ensure_future(self._respond(line)))
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        responses: asyncio.Queue[asyncio.Future | None],
+        slots: asyncio.Semaphore,
+    ) -> None:
+        while (response := await responses.get()) is not None:
+            record = await response
+            writer.write(json.dumps(record).encode())
+            writer.write(b"\n")
+            slots.release()
+            await writer.drain()
+
+    async def _respond(self, line: bytes) -> dict:
+        self.requests += 1
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Request is not valid JSON: {e}") from None
+            if not isinstance(request, dict) or not isinstance(request.get("expr"), str):
+                raise ValueError("Request must be a JSON object with a string 'expr'.")
+            request_id = request.get("id")
+            base = request.get("base", self.base)
+            if type(base) is not int:
+                raise ValueError("Base must be an integer.")
+            result = await self.evaluator.evaluate(
+                request["expr"], base=base, timeout=self.timeout
+            )
+        except EVALUATION_ERRORS as e:
+            result = e
+        except Exception as e:
+            logger.exception(f"Unexpected error while answering {line[:80]!r}")
+            result = e
+
+        record = result_record(result)
+        if request_id is not None:
+            record = {"id": request_id, **record}
+        return record
+
+
+def _completed(record: dict) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(record)
+    return future
+
+
+async def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    path: str | None = None,
+    **options,
+) -> None:
+    """Run an EvaluationServer until SIGINT or SIGTERM, then shut it down gracefully."""
+    server = EvaluationServer(**options)
+    await server.start(host, port, path)
+    print(f"Serving on {server.address()}", flush=True)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signum)
+        await server.close()
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+
+
+def init_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pypratt serve",
+        description="Evaluate newline-delimited JSON requests over a socket.",
+        usage="python -m pypratt serve [OPTIONS]",
+    )
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST, help=f"Host to listen on (default = {DEFAULT_HOST})"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"TCP port to listen on (default = {DEFAULT_PORT})",
+    )
+    parser.add_argument("--unix", metavar="PATH", help="Listen on a Unix socket instead")
+    parser.add_argument(
+        "-b", "--base", type=int, default=10, help="Default base of the requests (default = 10)"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        help="Number of worker processes (default = number of CPUs)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help=f"Parse cache size (default = {DEFAULT_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=DEFAULT_MAX_PENDING,
+        help=f"Pending requests per connection (default = {DEFAULT_MAX_PENDING})",
+    )
+    parser.add_argument("--max-bits", type=int, help="Reject results larger than this")
+    parser.add_argument("--max-cost", type=float, help="Reject more expensive expressions")
+    parser.add_argument("--timeout", type=float, help="Seconds allowed per evaluation")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = init_parser().parse_args(argv)
+    logging.basicConfig(
+        format="{asctime}: {levelname} - {name} - {message}",
+        style="{",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.WARNING,
+    )
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                args.unix,
+                base=args.base,
+                workers=args.jobs,
+                cache_size=args.cache_size,
+                max_pending=args.max_pending,
+                max_bits=args.max_bits,
+                max_cost=args.max_cost,
+                timeout=args.timeout,
+            )
+        )
+    except ValueError as e:
+        print(e)
+        raise SystemExit(1)
@@ -0,0 +1,115 @@
+from collections.abc import Callable
+from time import perf_counter_ns
+
+from .operators import PREFIX, Operator, function, get_operator_table
+from .parser import Node
+
+
+STAGES = ("tokenize", "parse", "evaluate", "num_to_str")
+
+
+class EvaluationStats:
+    """Timings and counters of one or more profiled evaluations.
+
+    Stage timings are in nanoseconds. Operators are reported by symbol, with
+    prefix operators marked as "unary", e.g. "unary -". Stages that were
+    skipped, such as tokenizing and parsing on a cache hit, take no time."""
+
+    __slots__ = ("evaluations", "stage_ns", "operator_counts", "operator_ns", "tokens", "nodes")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.stage_ns: dict[str, int] = dict.fromkeys(STAGES, 0)
+        self.operator_counts: dict[str, int] = {}
+        self.operator_ns: dict[str, int] = {}
+        self.tokens = 0
+        self.nodes = 0
+
+    def __repr__(self):
+        return f"EvaluationStats({self.as_dict()!r})"
+
+    def add(self, other: "EvaluationStats") -> None:
+        """Accumulate the counters of another EvaluationStats into this one."""
+        self.evaluations += other.evaluations
+        for stage, ns in other.stage_ns.items():
+            self.stage_ns[stage] += ns
+        for symbol, count in other.operator_counts.items():
+            self.operator_counts[symbol] = self.operator_counts.get(symbol, 0) + count
+            self.operator_ns[symbol] = self.operator_ns.get(symbol, 0) + other.operator_ns[symbol]
+        self.tokens += other.tokens
+        self.nodes += other.nodes
+
+    def as_dict(self) -> dict:
+        return {
+            "evaluations": self.evaluations,
+            "stage_ns": dict(self.stage_ns),
+            "operators": {
+                symbol: {"count": count, "ns": self.operator_ns[symbol]}
+                for symbol, count in self.operator_counts.items()
+            },
+            "tokens": self.tokens,
+            "nodes": self.nodes,
+        }
+
+    def format(self) -> str:
+        """Return the statistics as a human readable table."""
+        lines = [
+            f"Evaluations: {self.evaluations}, tokens: {self.tokens}, nodes: {self.nodes}",
+            f"{'stage':<12} {'total ms':>10}",
+        ]
+        for stage, ns in self.stage_ns.items():
+            lines.append(f"{stage:<12} {ns / 1e6:>10.3f}")
+        if self.operator_counts:
+            lines.append(f"{'operator':<12} {'count':>10} {'total ms':>10}")
+            for symbol, ns in sorted(self.operator_ns.items(), key=lambda item: -item[1]):
+                lines.append(
+                    f"{symbol:<12} {self.operator_counts[symbol]:>10} {ns / 1e6:>10.3f}"
+                )
+        return "\n".join(lines)
+
+
+def operator_label(fixity: str, op: Operator) -> str:
+    if fixity == PREFIX:
+        return f"unary {op.symbol}"
+    return op.symbol
+
+
+def timed_operators(stats: EvaluationStats) -> list[function]:
+    """Return the operator functions wrapped to record their calls into stats.
+
+    The result is indexed by opcode, like the functions of the operator table."""
+    table = get_operator_table()
+    return [
+        _timed(operator_label(fixity, op), op.function, stats)
+        for op, fixity in zip(table.operators, table.fixities)
+    ]
+
+
+def count_nodes(root: Node | None) -> int:
+    """Count the distinct nodes of a parse tree or DAG."""
+    if root is None:
+        return 0
+    seen = {id(root)}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for child in (node.left, node.right):
+            if child is not None and id(child) not in seen:
+                seen.add(id(child))
+                stack.append(child)
+    return len(seen)
+
+
+def _timed(label: str, func: Callable, stats: EvaluationStats) -> Callable:
+    counts = stats.operator_counts
+    totals = stats.operator_ns
+
+    def timed(*args):
+        start = perf_counter_ns()
+        try:
+            return func(*args)
+        finally:
+            totals[label] = totals.get(label, 0) + perf_counter_ns() - start
+            counts[label] = counts.get(label, 0) + 1
+
+    return timed
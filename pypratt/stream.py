@@ -0,0 +1,294 @@
+from collections.abc import Iterable, Iterator
+from itertools import chain
+from typing import TextIO
+
+from .num_utils import DECIMAL_POINT, str_to_float, str_to_int
+from .operators import MATCHING_BRACKET, MULTIPLY_SYM, get_operator_table
+from .parser import _check_associativity
+from .tokenizer import (
+    CHAR_BINARY_OP,
+    CHAR_CLOSE_BRACKET,
+    CHAR_INVALID,
+    CHAR_OPEN_BRACKET,
+    CHAR_POSTFIX_OP,
+    INCOMPLETE_TYPES,
+    LEXEME_PATTERN,
+    PREFIX_CONTEXT_TYPES,
+    SyntaxError,
+    TokenTypes,
+    _check_binary_operator,
+    _classify_word,
+    _describe,
+    _digit_chars,
+    char_classes,
+)
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+type stream_token = tuple[TokenTypes, str, int]
+
+
+def read_chunks(source: TextIO | Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Return an iterator over the chunks of a text stream or an iterable of strings."""
+    if isinstance(source, str):
+        return iter([source])
+    if hasattr(source, "read"):
+        return iter(lambda: source.read(chunk_size), "")
+    return iter(source)
+
+
+def stream_tokens(chunks: Iterable[str], *, base: int) -> Iterator[stream_token]:
+    """Lazily tokenize an expression that arrives in chunks.
+
+    Yields (type, value, index) triples, where index is the absolute offset of
+    the token in the whole expression, and finishes with an END token. The
+    tokens and the SyntaxErrors are the same as those of tokenizer.tokenize on
+    the concatenated chunks. Only the unfinished word at the end of a chunk and
+    the stack of open brackets are kept between chunks."""
+    for kind, value, index, _ in _stream_tokens(chunks, base):
+        yield kind, value, index
+
+
+def _stream_tokens(chunks: Iterable[str], base: int) -> Iterator[tuple[TokenTypes, str, int, int]]:
+    """Implement stream_tokens, also yielding the opcode of each operator token."""
+    digit_chars = _digit_chars(base)
+    table = get_operator_table()
+    classes = char_classes(table)
+    implicit_code = table.binary_codes.get(MULTIPLY_SYM)
+    bracket_stack: list[str] = []
+    prev_kind: TokenTypes | None = None
+    prev_value = ""
+    prev_is_operand = False
+
+    carry = ""
+    carry_offset = 0
+    for chunk in chain(chunks, [None]):
+        final = chunk is None
+        buffer = carry + (chunk or "")
+        buffer_offset = carry_offset
+        carry = ""
+        carry_offset = buffer_offset + len(buffer)
+
+        for match in LEXEME_PATTERN.finditer(buffer):
+            spaces, word, char = match.groups()
+            str_index = buffer_offset + match.start() + len(spaces)
+
+            if word:
+                if not final and match.end() == len(buffer):
+                    # The word may continue in the next chunk
+                    carry = word
+                    carry_offset = str_index
+                    break
+                end_index = str_index + len(word)
+                code = table.named_codes.get(word)
+                if code is not None:
+                    _check_binary_operator(prev_kind, word[1:], end_index)
+                    kind = TokenTypes.BINARY_OP
+                    # Named operators are reported without the leading OP_START_SYM
+                    value = word[1:]
+                    str_index += 1
+                    prev_is_operand = False
+                else:
+                    kind = _classify_word(prev_kind, word, end_index, base, digit_chars)
+                    value = word
+                    code = 0
+                    prev_is_operand = True
+
+            else:
+                char_class = classes.get(char, CHAR_INVALID)
+                value = char
+                code = 0
+                if char_class == CHAR_BINARY_OP:
+                    code = (
+                        table.prefix_codes.get(char)
+                        if prev_kind is None or prev_kind in PREFIX_CONTEXT_TYPES
+                        else None
+                    )
+                    if code is not None:
+                        kind = TokenTypes.PREFIX_UNARY_OP
+                    else:
+                        code = table.binary_codes.get(char)
+                        if code is None:
+                            raise SyntaxError(
+                                f"The prefix operator '{char}' must precede an operand!",
+                                str_index,
+                            )
+                        _check_binary_operator(prev_kind, char, str_index)
+                        kind = TokenTypes.BINARY_OP
+                    prev_is_operand = False
+
+                elif char_class == CHAR_POSTFIX_OP:
+                    if prev_kind is None:
+                        raise SyntaxError(
+                            f"Expression cannot start with a postfix operator '{char}'!",
+                            str_index,
+                        )
+                    elif not prev_is_operand:
+                        raise SyntaxError(
+                            f"The postfix operator '{char}' must follow a number, a variable or a closing bracket!",
+                            str_index,
+                        )
+                    kind = TokenTypes.POSTFIX_UNARY_OP
+                    code = table.postfix_codes[char]
+                    prev_is_operand = False
+
+                elif char_class == CHAR_OPEN_BRACKET:
+                    # Assume that an opening bracket preceeded by an operand implies multiplication
+                    if prev_is_operand:
+                        if implicit_code is None:
+                            raise SyntaxError(
+                                f"Implicit multiplication needs the operator '{MULTIPLY_SYM}'!",
+                                str_index,
+                            )
+                        yield TokenTypes.BINARY_OP, MULTIPLY_SYM, str_index, implicit_code
+                    bracket_stack.append(char)
+                    kind = TokenTypes.OPEN_BRACKET
+                    prev_is_operand = False
+
+                elif char_class == CHAR_CLOSE_BRACKET:
+                    if prev_kind is None or prev_kind in INCOMPLETE_TYPES:
+                        raise SyntaxError(
+                            f"Expression cannot end with a closing bracket '{char}'!",
+                            str_index,
+                        )
+                    if not bracket_stack:
+                        raise SyntaxError(
+                            f"Closing bracket: {char} without matching opening bracket",
+                            str_index,
+                        )
+                    opening_bracket = bracket_stack.pop()
+                    if MATCHING_BRACKET[char] != opening_bracket:
+                        raise SyntaxError(
+                            f"Mismatched brackets: {opening_bracket} closed with {char}",
+                            str_index,
+                        )
+                    kind = TokenTypes.CLOSE_BRACKET
+                    prev_is_operand = True
+
+                else:
+                    raise SyntaxError(f"Unexpected character: {char}", str_index)
+
+            yield kind, value, str_index, code
+            prev_kind = kind
+            prev_value = value
+
+    end_index = carry_offset
+    if prev_kind is None:
+        raise SyntaxError("Expression cannot be empty!", 0)
+    if bracket_stack:
+        raise SyntaxError("Encountered unmatched closing brackets:", end_index)
+    if prev_kind in INCOMPLETE_TYPES:
+        raise SyntaxError(
+            f"Expression cannot end with {_describe(prev_kind, prev_value)}", end_index
+        )
+    yield TokenTypes.END, "", end_index, 0
+
+
+def evaluate_stream(
+    source: TextIO | Iterable[str],
+    *,
+    base: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int | float:
+    """Evaluate an expression read from a text stream or an iterable of chunks.
+
+    Tokens are consumed as they are produced and operators are applied as soon
+    as their precedence allows, so no token list or parse tree is built and the
+    memory used is proportional to the nesting depth of the expression rather
+    than its length. SyntaxErrors report absolute offsets into the input.
+
+    As with the other evaluators, a syntax error anywhere in the input takes
+    precedence over evaluation errors: after the first evaluation error, the
+    rest of the input is only checked for syntax, and the error is raised at
+    the end."""
+    operands: list = []
+    # Pending operators as (right binding power, function, arity, opcode).
+    # Opening brackets are pushed with a binding power of 0 and no function.
+    operators: list[tuple[int, object, int, int]] = []
+    state = _EvaluationState()
+    expect_operand = True
+    table = get_operator_table()
+    functions = table.functions
+    binding_powers = table.binding_powers
+
+    for kind, value, index, code in _stream_tokens(read_chunks(source, chunk_size), base):
+        if expect_operand:
+            if kind == TokenTypes.NUMBER:
+                convert = str_to_float if DECIMAL_POINT in value else str_to_int
+                operands.append(state.call(convert, value, base))
+                expect_operand = False
+            elif kind == TokenTypes.VARIABLE:
+                state.fail(ValueError(f"Variable '{value}' is not bound."))
+                operands.append(None)
+                expect_operand = False
+            elif kind == TokenTypes.PREFIX_UNARY_OP:
+                operators.append((binding_powers[code][1], functions[code], 1, code))
+            elif kind == TokenTypes.OPEN_BRACKET:
+                operators.append((0, None, 0, 0))
+            else:
+                raise SyntaxError(
+                    f"Expected a number, a variable, a prefix operator or an opening bracket, got {kind.name}",
+                    index,
+                )
+        elif kind == TokenTypes.BINARY_OP:
+            left_bp, right_bp = binding_powers[code]
+            _reduce(operands, operators, left_bp, state)
+            if operators and operators[-1][2] == 2:
+                _check_associativity(table, operators[-1][3], code, index)
+            operators.append((right_bp, functions[code], 2, code))
+            expect_operand = True
+        elif kind == TokenTypes.POSTFIX_UNARY_OP:
+            _reduce(operands, operators, binding_powers[code][0], state)
+            operands.append(state.call(functions[code], operands.pop()))
+        elif kind == TokenTypes.CLOSE_BRACKET:
+            _reduce(operands, operators, 0, state)
+            operators.pop()
+        elif kind == TokenTypes.END:
+            break
+        else:
+            raise SyntaxError(
+                f"Expected an operator or a closing bracket, got {kind.name}", index
+            )
+
+    _reduce(operands, operators, 0, state)
+    if state.error is not None:
+        raise state.error
+    return operands.pop()
+
+
+class _EvaluationState:
+    """Records the first evaluation error, after which nothing is computed."""
+
+    __slots__ = ("error",)
+
+    def __init__(self):
+        self.error: Exception | None = None
+
+    def fail(self, error: Exception) -> None:
+        if self.error is None:
+            self.error = error
+
+    def call(self, func, *args):
+        if self.error is not None:
+            return None
+        try:
+            return func(*args)
+        except Exception as e:
+            self.error = e
+            return None
+
+
+def _reduce(
+    operands: list,
+    operators: list[tuple[int, object, int, int]],
+    min_bp: int,
+    state: _EvaluationState,
+) -> None:
+    """Apply the pending operators that bind tighter than min_bp."""
+    while operators and operators[-1][0] > min_bp:
+        _, func, arity, _ = operators.pop()
+        if arity == 1:
+            operands.append(state.call(func, operands.pop()))
+        else:
+            right = operands.pop()
+            operands.append(state.call(func, operands.pop(), right))
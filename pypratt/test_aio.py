@@ -0,0 +1,134 @@
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from .aio import AsyncEvaluator, aclose, aevaluate, aevaluate_many
+from .batch import WorkerError
+from .budget import BudgetExceeded
+from .tokenizer import SyntaxError
+
+# Far too expensive to finish within the timeouts of the tests
+HUGE = "(10^7)!"
+
+
+def run(coroutine_function, **options):
+    async def main():
+        evaluator = AsyncEvaluator(**{"workers": 2, **options})
+        try:
+            return await coroutine_function(evaluator)
+        finally:
+            await evaluator.close()
+
+    return asyncio.run(main())
+
+
+def test_aevaluate():
+    async def main():
+        try:
+            return await aevaluate("1 + 2 * 3"), await aevaluate("FF + 1", base=16)
+        finally:
+            await aclose()
+
+    assert asyncio.run(main()) == ("7", "100")
+
+
+def test_aevaluate_many_preserves_order():
+    async def main():
+        try:
+            return await aevaluate_many(["1 + 2", "1 +", "3!", "1 / 0", "2000!"])
+        finally:
+            await aclose()
+
+    results = asyncio.run(main())
+    assert results[0] == "3"
+    assert isinstance(results[1], SyntaxError)
+    assert results[2] == "6"
+    assert isinstance(results[3], ZeroDivisionError)
+    assert results[4].startswith("33162750924506332411753933805763240382811172081057")
+
+
+def test_expensive_expressions_are_offloaded():
+    async def main(evaluator):
+        result = await evaluator.evaluate("3000!")
+        return result, evaluator.offloaded
+
+    result, offloaded = run(main, offload_cost=1e3)
+    assert result.startswith("41493596034378540855568670930866")
+    assert offloaded == 1
+
+
+def test_errors_of_workers_are_raised():
+    async def main(evaluator):
+        return await evaluator.evaluate("3000! / (5 - 5)")
+
+    with pytest.raises(ZeroDivisionError):
+        run(main, offload_cost=1e3)
+
+
+def test_dead_workers_are_reported_per_expression():
+    async def main(evaluator):
+        await evaluator.evaluate("3000!")
+        # Kill the idle worker, as the operating system would on running out of memory
+        worker = evaluator._idle[0]
+        os.kill(worker.process.pid, signal.SIGKILL)
+        await asyncio.to_thread(worker.process.join)
+        return await evaluator.evaluate_many(["3000! % 7", "2000! % 7", "1 + 1"])
+
+    results = run(main, workers=1, offload_cost=1e3)
+    assert isinstance(results[0], WorkerError)
+    # The worker is replaced
+    assert results[1:] == ["0", "2"]
+
+
+def test_timeout_terminates_worker():
+    async def main(evaluator):
+        start = time.monotonic()
+        with pytest.raises(BudgetExceeded) as info:
+            await evaluator.evaluate(HUGE, timeout=0.5)
+        elapsed = time.monotonic() - start
+        # The replacement worker evaluates the next expression
+        result = await evaluator.evaluate("3000! / 3000!", timeout=30)
+        return info.value.limit, elapsed, evaluator.terminated, result
+
+    limit, elapsed, terminated, result = run(main, offload_cost=1e3)
+    assert limit == "deadline"
+    assert elapsed < 5
+    assert terminated == 1
+    assert result == "1.0"
+
+
+def test_cancellation_terminates_worker():
+    async def main(evaluator):
+        task = asyncio.create_task(evaluator.evaluate(HUGE))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return evaluator.terminated
+
+    assert run(main, offload_cost=1e3) == 1
+
+
+def test_cheap_expressions_do_not_wait_for_expensive_ones():
+    async def main(evaluator):
+        start = time.monotonic()
+        results = await evaluator.evaluate_many([HUGE, "1 + 1", HUGE, "2 * 3"], timeout=1)
+        return results, time.monotonic() - start
+
+    results, elapsed = run(main, workers=1, offload_cost=1e3)
+    assert results[1] == "2"
+    assert results[3] == "6"
+    assert all(isinstance(results[i], BudgetExceeded) for i in (0, 2))
+    assert elapsed < 5
+
+
+def test_budget():
+    async def main(evaluator):
+        return await evaluator.evaluate(HUGE)
+
+    with pytest.raises(BudgetExceeded) as info:
+        run(main, max_bits=10**6)
+    assert info.value.limit == "bits"
@@ -0,0 +1,103 @@
+import math
+
+import pytest
+
+from .backend import (
+    BACKENDS,
+    GmpyBackend,
+    NumericBackend,
+    comb_bits,
+    factorial_bits,
+    gmpy2,
+    perm_bits,
+    set_backend,
+)
+from .pyeval import AlgebraEval
+
+requires_gmpy2 = pytest.mark.skipif(gmpy2 is None, reason="gmpy2 is not installed")
+
+expressions = [
+    "1000!",
+    "300 _C 150",
+    "2000 _P 1000",
+    "3 ^ 40000",
+    "(-6) ^ 6001",
+    "2 ^ -3",
+    "5! + 10 _C 3 - 10 _P 3",
+]
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request):
+    if request.param == GmpyBackend.name and gmpy2 is None:
+        pytest.skip("gmpy2 is not installed")
+    previous = set_backend(request.param)
+    yield request.param
+    set_backend(previous)
+
+
+@pytest.mark.parametrize("expr", expressions)
+@pytest.mark.parametrize("base", [10, 7, 16])
+def test_results_match_python_backend(backend, expr, base):
+    result = AlgebraEval(base=base).evaluate(expr)
+    previous = set_backend("python")
+    try:
+        assert result == AlgebraEval(base=base).evaluate(expr)
+    finally:
+        set_backend(previous)
+
+
+@requires_gmpy2
+@pytest.mark.parametrize("base", [2, 7, 10, 16, 36])
+def test_gmpy2_conversions_return_python_types(base):
+    gmp, python = GmpyBackend(), NumericBackend()
+    num = 7**5000
+    digits = gmp.int_to_digits(num, base)
+    assert digits == python.int_to_digits(num, base)
+    assert type(gmp.digits_to_int(digits.lower(), base)) is int
+    assert gmp.digits_to_int(digits.lower(), base) == num
+
+
+@requires_gmpy2
+def test_gmpy2_operators_return_python_ints():
+    gmp = GmpyBackend()
+    assert type(gmp.factorial(3000)) is int
+    assert type(gmp.power(3, 20000)) is int
+    assert gmp.perm(1000, 400) == NumericBackend().perm(1000, 400)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        set_backend("fortran")
+
+
+@pytest.mark.parametrize(
+    "expr",
+    ["2 ^ 1099511627776", "1099511627776!", "1099511627776 _C 549755813888", "(2 ^ 40) _P (2 ^ 39)"],
+)
+def test_huge_results_raise_overflow_error(backend, expr):
+    # GMP would abort the interpreter instead
+    with pytest.raises(OverflowError):
+        AlgebraEval().evaluate(expr)
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("1 ^ 1099511627776", "1"),
+        ("(-1) ^ 1099511627777", "-1"),
+        ("1099511627776 _C 1", "1099511627776"),
+        ("1099511627776 _P 2", str(2**40 * (2**40 - 1))),
+    ],
+)
+def test_huge_operands_with_small_results(backend, expr, expected):
+    assert AlgebraEval().evaluate(expr) == expected
+
+
+
+def test_result_size_estimates():
+    for n, k in [(10, 3), (1000, 500), (2**60, 2), (10**40, 3)]:
+        for estimate, exact in [(comb_bits, math.comb), (perm_bits, math.perm)]:
+            bits = exact(n, k).bit_length()
+            assert bits - 2 <= estimate(n, k) <= 2 * bits + 2
+    assert abs(factorial_bits(1000) - math.factorial(1000).bit_length()) < 2
@@ -0,0 +1,120 @@
+import io
+import json
+import multiprocessing
+import os
+import pickle
+
+import pytest
+
+from . import batch
+from .batch import WorkerError, evaluate_file, evaluate_many, iter_evaluate_many
+from .budget import BudgetExceeded
+from .pyeval import AlgebraEval
+from .tokenizer import SyntaxError
+
+exprs = ["1 + 2", "1 +", "3!", "1.5!", "2 * (3 + 4)", "1 / 0"] * 5
+
+
+@pytest.mark.parametrize("backend", ["serial", "thread", "process"])
+def test_evaluate_many_preserves_order(backend):
+    results = evaluate_many(exprs, workers=2, backend=backend, chunksize=4)
+    assert len(results) == len(exprs)
+    for i in range(0, len(exprs), 6):
+        assert results[i] == "3"
+        assert isinstance(results[i + 1], SyntaxError)
+        assert results[i + 2] == "6"
+        assert isinstance(results[i + 3], ValueError)
+        assert results[i + 4] == "14"
+        assert isinstance(results[i + 5], ZeroDivisionError)
+
+
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_dead_workers_are_reported_per_expression(monkeypatch):
+    evaluate = batch.evaluate
+
+    def evaluate_or_die(expr, *args, **kwargs):
+        if expr == "die":
+            os._exit(1)
+        return evaluate(expr, *args, **kwargs)
+
+    # Forked workers see the patched function
+    monkeypatch.setattr(batch, "evaluate", evaluate_or_die)
+    monkeypatch.setattr(batch, "_process_context", lambda: multiprocessing.get_context("fork"))
+    items = [f"{i} + 1" for i in range(20)]
+    items[5] = items[13] = "die"
+    results = evaluate_many(items, workers=2, backend="process", chunksize=3)
+    assert [type(r) for r in results if not isinstance(r, str)] == [WorkerError, WorkerError]
+    assert isinstance(results[5], WorkerError) and isinstance(results[13], WorkerError)
+    assert [r for r in results if isinstance(r, str)] == [
+        str(i + 1) for i in range(20) if i not in (5, 13)
+    ]
+
+
+def test_evaluate_many_on_evaluator_uses_base():
+    results = AlgebraEval(base=2).evaluate_many(["1 + 1", "11 * 11"], backend="thread")
+    assert results == ["10", "1001"]
+
+
+@pytest.mark.parametrize("backend", ["serial", "thread", "process"])
+def test_evaluate_many_on_evaluator_applies_budgets(backend):
+    evaluator = AlgebraEval(max_bits=1000, engine="vm", cse=True)
+    results = evaluator.evaluate_many(["10!", "1000!", "9 ^ 9 ^ 9"], workers=2, backend=backend)
+    assert results[0] == "3628800"
+    assert all(isinstance(result, BudgetExceeded) for result in results[1:])
+    assert results[1].limit == "bits"
+
+
+def test_evaluate_file_applies_budgets():
+    destination = io.StringIO()
+    summary = evaluate_file(io.StringIO("3!\n(10^5)!\n"), destination, max_cost=1e4)
+    records = [json.loads(line) for line in destination.getvalue().splitlines()]
+    assert records[0]["result"] == "6"
+    assert records[1]["error"] == "BudgetExceeded"
+    assert summary["errors"] == 1
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        evaluate_many(exprs, backend="serial", engine="gpu")
+
+
+def test_iter_evaluate_many_is_lazy():
+    results = iter_evaluate_many(iter(["1 + 1"] * 1000), backend="serial", chunksize=10)
+    assert next(results) == "2"
+
+
+def test_invalid_backend():
+    with pytest.raises(ValueError):
+        evaluate_many(exprs, backend="gpu")
+
+
+def test_syntax_error_pickles_index():
+    error = pickle.loads(pickle.dumps(SyntaxError("Unexpected character", 3)))
+    assert error.index == 3
+    assert error.message == "Unexpected character"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_evaluate_file_writes_json_lines(jobs):
+    source = io.StringIO("1 + 2\n1 +\n\n11 * 11\n")
+    destination = io.StringIO()
+    summary = evaluate_file(source, destination, base=2, jobs=jobs, chunksize=1)
+    records = [json.loads(line) for line in destination.getvalue().splitlines()]
+    assert records == [
+        {"expr": "1 + 2", "error": "ValueError", "message": "Invalid digit '2' for base 2."},
+        {
+            "expr": "1 +",
+            "error": "SyntaxError",
+            "message": "Expression cannot end with a binary operator '+'",
+            "index": 3,
+        },
+        {
+            "expr": "",
+            "error": "SyntaxError",
+            "message": "Expression cannot be empty!",
+            "index": 0,
+        },
+        {"expr": "11 * 11", "result": "1001"},
+    ]
+    assert summary["expressions"] == 4
+    assert summary["errors"] == 3
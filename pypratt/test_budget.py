@@ -0,0 +1,99 @@
+import math
+import pickle
+
+import pytest
+
+from .budget import BudgetExceeded, estimate_tree
+from .parser import parse
+from .pyeval import AlgebraEval
+from .tokenizer import tokenize
+
+
+def estimate(expr, base=10):
+    return estimate_tree(parse(tokenize(expr, base=base)), base)
+
+
+@pytest.mark.parametrize(
+    "expr, value",
+    [
+        ("1000!", lambda: math.factorial(1000)),
+        ("5000 _C 2500", lambda: math.comb(5000, 2500)),
+        ("1000 _P 500", lambda: math.perm(1000, 500)),
+        ("3 ^ 20000", lambda: 3**20000),
+        ("(2 ^ 10)!", lambda: math.factorial(1024)),
+        ("10! * 12!", lambda: math.factorial(10) * math.factorial(12)),
+        ("123456789123 + 987654321987", lambda: 123456789123 + 987654321987),
+    ],
+)
+def test_estimated_bits_bound_the_result(expr, value):
+    bits = estimate(expr).bits
+    assert value().bit_length() - 1 <= bits <= 1.01 * value().bit_length() + 1
+
+
+def test_exact_values_of_small_subtrees():
+    assert estimate("52 _C 5").value == math.comb(52, 5)
+    assert estimate("2 ^ 10 - 1").value == 1023
+
+
+def test_peak_bits_include_intermediate_results():
+    result = estimate("(3 ^ 100000) % 7")
+    assert result.bits < 3
+    assert result.peak_bits >= 100000 * math.log2(3)
+
+
+@pytest.mark.parametrize("expr", ["100000000!", "9 ^ 9 ^ 9", "(10 ^ 10)! % 7", "(10 ^ 10) _C (10 ^ 9)"])
+def test_huge_expressions_are_rejected_before_evaluation(expr):
+    evaluator = AlgebraEval(max_bits=10**6, max_cost=10**9)
+    with pytest.raises(BudgetExceeded) as error:
+        evaluator.evaluate(expr)
+    assert error.value.limit in ("bits", "cost")
+
+
+def test_cost_limit():
+    with pytest.raises(BudgetExceeded) as error:
+        AlgebraEval(max_cost=1000).evaluate("2000!")
+    assert error.value.limit == "cost"
+    assert AlgebraEval(max_cost=1000).evaluate("20!") == str(math.factorial(20))
+
+
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+def test_deadline(engine):
+    expr = " + ".join(["1"] * 200)
+    with pytest.raises(BudgetExceeded) as error:
+        AlgebraEval(engine=engine, deadline=-1).evaluate(expr)
+    assert error.value.limit == "deadline"
+    assert AlgebraEval(engine=engine, deadline=60).evaluate(expr) == "200"
+
+
+@pytest.mark.parametrize("budget, limit", [({"max_bits": 100}, "bits"), ({"max_cost": 10}, "cost")])
+def test_budgets_apply_to_compiled_expressions(budget, limit):
+    evaluator = AlgebraEval(**budget)
+    # Without variables, the expression is rejected when compiled
+    with pytest.raises(BudgetExceeded) as error:
+        evaluator.compile("2 ^ 1000")
+    assert error.value.limit == limit
+    prepared = evaluator.prepare("2 ^ x")
+    assert prepared(x=2) == "4"
+    with pytest.raises(BudgetExceeded) as error:
+        prepared(x=1000)
+    assert error.value.limit == limit
+
+
+def test_deadline_applies_to_compiled_expressions():
+    expr = " + ".join(["x"] * 200)
+    with pytest.raises(BudgetExceeded) as error:
+        AlgebraEval(deadline=-1).prepare(expr)(x=1)
+    assert error.value.limit == "deadline"
+    assert AlgebraEval(deadline=60).prepare(expr)(x=1) == "200"
+
+
+def test_budgets_do_not_change_results():
+    evaluator = AlgebraEval(max_bits=10**5, max_cost=10**8, deadline=60)
+    for expr in ["1 + 2 * 3", "-(1 + 2) * 3!", "2 ^ -1", "10 % 4 + 5 _C 2", "1 / 3"]:
+        assert evaluator.evaluate(expr) == AlgebraEval().evaluate(expr)
+
+
+def test_budget_exceeded_is_picklable():
+    error = pickle.loads(pickle.dumps(BudgetExceeded("too big", "bits")))
+    assert error.limit == "bits"
+    assert str(error) == "too big"
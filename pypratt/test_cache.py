@@ -0,0 +1,56 @@
+import pytest
+
+from .cache import ParseCache
+from .dag import count_shared_nodes
+from .pyeval import AlgebraEval, evaluate
+
+
+def test_cache_disabled_by_default():
+    evaluator = AlgebraEval()
+    assert evaluator.cache is None
+    assert evaluator.evaluate("1 + 2") == "3"
+    assert evaluator.cache_info() == {}
+
+
+def test_cache_hits_and_misses():
+    evaluator = AlgebraEval(cache_size=4)
+    for _ in range(3):
+        assert evaluator.evaluate("2 * (3 + 4)") == "14"
+    info = evaluator.cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 2
+    assert info["size"] == 1
+
+
+def test_cache_key_includes_base():
+    evaluator = AlgebraEval(cache_size=4)
+    assert evaluator.evaluate("10 + 1") == "11"
+    evaluator.set_base(2)
+    assert evaluator.evaluate("10 + 1") == "11"
+    assert evaluator.cache_info()["misses"] == 2
+
+
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+@pytest.mark.parametrize("first_cse", [False, True])
+def test_cache_key_includes_cse(engine, first_cse):
+    cache = ParseCache(4)
+    expr = "(2+3)*(2+3)+(2+3)"
+    for cse in (first_cse, not first_cse, first_cse, not first_cse):
+        result = evaluate(expr, cache=cache, engine=engine, cse=cse)
+        assert result.value == 30
+        assert result.shared_nodes == (6 if cse else 0)
+        assert count_shared_nodes(result.tree) == (6 if cse else 0)
+    assert cache.info()["misses"] == 2
+
+
+def test_cache_lru_eviction():
+    cache = ParseCache(capacity=2)
+    evaluator = AlgebraEval()
+    evaluator.cache = cache
+    evaluator.evaluate("1 + 1")
+    evaluator.evaluate("2 + 2")
+    evaluator.evaluate("1 + 1")  # Refresh "1 + 1"
+    evaluator.evaluate("3 + 3")  # Evicts "2 + 2"
+    assert cache.evictions == 1
+    assert cache.get("1 + 1", 10) is not None
+    assert cache.get("2 + 2", 10) is None
@@ -0,0 +1,164 @@
+import math
+
+import pytest
+
+from .columnar import evaluate_columns
+from .operators import get_registry, set_registry
+from .pyeval import AlgebraEval
+
+np = pytest.importorskip("numpy")
+
+
+def rows(expr: str, columns: dict, base: int = 10) -> list:
+    """Evaluate an expression row by row with a prepared expression."""
+    prepared = AlgebraEval(base=base).prepare(expr)
+    length = max(len(v) for v in columns.values() if isinstance(v, np.ndarray))
+    results = []
+    for i in range(length):
+        bindings = {
+            name: v[i].item() if isinstance(v, np.ndarray) else v for name, v in columns.items()
+        }
+        results.append(prepared.value(**bindings))
+    return results
+
+
+INTS = np.arange(-50, 50, dtype=np.int64)
+SMALL = np.arange(0, 100, dtype=np.int64) % 15
+FLOATS = np.linspace(-3, 3, 100)
+
+
+@pytest.mark.parametrize(
+    "expr, columns, dtype",
+    [
+        ("a * x ^ 2 + b", {"a": INTS, "x": SMALL, "b": 7}, np.int64),
+        ("-(x - 3) * (x + 2) % 7", {"x": INTS}, np.int64),
+        ("x! + n _C k - n _P k", {"x": SMALL, "n": SMALL + 5, "k": SMALL}, np.int64),
+        ("x / 4 + 1.5", {"x": INTS}, np.float64),
+        ("x ^ 2 - 3 * x", {"x": FLOATS}, np.float64),
+        ("(x % 1.5) * y", {"x": FLOATS, "y": INTS}, np.float64),
+        # Results that do not fit in an int64 are Python integers
+        ("x! * 3", {"x": SMALL + 20}, object),
+        ("10 ^ x + 1", {"x": SMALL + 10}, object),
+        ("80 _C x", {"x": SMALL}, object),
+        ("x * 10 ^ 30 % 97", {"x": INTS}, object),
+        # Negative integer exponents give floats, which Python keeps apart from integers
+        ("2 ^ x", {"x": INTS}, object),
+    ],
+)
+def test_columns_match_rows(expr, columns, dtype):
+    result = evaluate_columns(expr, 10, columns)
+    assert result.dtype == dtype
+    expected = rows(expr, columns)
+    assert result.tolist() == expected
+    if dtype is object:
+        assert [type(v) for v in result] == [type(v) for v in expected]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1000])
+def test_chunks(chunk_size):
+    x = np.arange(100, dtype=np.int64)
+    # Only the chunks of large x overflow an int64
+    result = evaluate_columns("x! + x / 2", 10, {"x": x}, chunk_size=chunk_size)
+    assert result.tolist() == [math.factorial(i) + i / 2 for i in range(100)]
+
+
+def test_deep_trees():
+    x = np.arange(3)
+    assert evaluate_columns(" + ".join(["x"] * 3000), 10, {"x": x}).tolist() == [0, 3000, 6000]
+    assert evaluate_columns("-" * 5000 + "x", 10, {"x": x}).tolist() == [0, 1, 2]
+
+
+def test_array_of_bases():
+    bases = np.array([10, 16, 2, 16, 8, 10])
+    result = evaluate_columns("10 * x + 11", bases, {"x": np.arange(6)})
+    # Literals are read in the base of each row
+    assert result.tolist() == [b * i + b + 1 for i, b in enumerate(bases.tolist())]
+    # In base 36, x is a digit
+    assert evaluate_columns("x + 1", np.array([10, 36]), {"x": 2}).tolist() == [3, 34]
+
+
+def test_float_powers_are_vectorized():
+    x = np.linspace(-3, 3, 100)
+    result = evaluate_columns("2 ^ x * x ^ 0.5", 10, {"x": x})
+    expected = rows("2 ^ x * x ^ 0.5", {"x": x})
+    # Powers of negative numbers are complex numbers
+    assert result.dtype == object
+    assert result.tolist() == pytest.approx(expected, rel=1e-15)
+    result = evaluate_columns("2 ^ x", 10, {"x": x})
+    assert result.dtype == np.float64
+    assert result.tolist() == pytest.approx(rows("2 ^ x", {"x": x}), rel=1e-15)
+
+
+def test_evaluator_method():
+    evaluator = AlgebraEval(base=16, cache_size=4)
+    x = np.arange(5)
+    assert evaluator.evaluate_columns("x * A", {"x": x}).tolist() == [0, 10, 20, 30, 40]
+    assert evaluator.evaluate_columns(chunk_size=2, columns={"x": x}).tolist() == [0, 10, 20, 30, 40]
+    assert evaluator.evaluate_columns("2 ^ 3", bases=np.array([10, 16])).tolist() == [8, 8]
+
+
+def test_registered_operators_are_evaluated_row_by_row():
+    registry = get_registry().copy()
+    registry.register("G", math.gcd, precedence=2)
+    previous = set_registry(registry)
+    try:
+        result = evaluate_columns("x _G 12 + 1", 10, {"x": np.arange(10)})
+    finally:
+        set_registry(previous)
+    assert result.tolist() == [math.gcd(i, 12) + 1 for i in range(10)]
+
+
+def test_unknown_columns_are_ignored():
+    columns = {"x": np.arange(3), "z": np.array(["a"]), "w": np.arange(5)}
+    assert evaluate_columns("x + 1", 10, columns).tolist() == [1, 2, 3]
+
+
+def test_constants_are_evaluated_once():
+    calls = []
+
+    def gcd(a, b):
+        calls.append((a, b))
+        return math.gcd(a, b)
+
+    registry = get_registry().copy()
+    registry.register("G", gcd, precedence=2)
+    previous = set_registry(registry)
+    try:
+        result = evaluate_columns(
+            "(6 _G 9) * x + 10 _G 4", np.array([10, 16] * 5), {"x": np.arange(10)}, chunk_size=3
+        )
+    finally:
+        set_registry(previous)
+    assert result.tolist() == [3 * i + 2 if i % 2 == 0 else 3 * i + 4 for i in range(10)]
+    # 6 _G 9 is the same in both bases, while 10 is 16 in base 16
+    assert calls == [(6, 9), (10, 4), (16, 4)]
+
+
+@pytest.mark.parametrize(
+    "expr, columns, error",
+    [
+        ("1 / x", {"x": np.arange(3)}, ZeroDivisionError),
+        ("1.5 % x", {"x": np.zeros(3)}, ZeroDivisionError),
+        ("x!", {"x": np.arange(-1, 2)}, ValueError),
+        ("x!", {"x": np.array([1.5])}, ValueError),
+        ("x _C 3", {"x": np.arange(4)}, ValueError),
+        ("10.0 ^ x", {"x": np.array([1, 400])}, OverflowError),
+        ("x + y", {"x": np.arange(3)}, ValueError),
+        ("x + y", {"x": np.arange(3), "y": np.arange(4)}, ValueError),
+        ("x", {"x": np.ones((2, 2))}, ValueError),
+        ("x", {"x": np.array(["a"])}, ValueError),
+        ("1 + 2", {}, ValueError),
+    ],
+)
+def test_errors(expr, columns, error):
+    with pytest.raises(error):
+        evaluate_columns(expr, 10, columns)
+
+
+def test_invalid_chunk_size_and_bases():
+    with pytest.raises(ValueError):
+        evaluate_columns("x", 10, {"x": np.arange(3)}, chunk_size=0)
+    with pytest.raises(ValueError):
+        evaluate_columns("1", np.array([10, 1]))
+    with pytest.raises(ValueError):
+        evaluate_columns("1", np.array([10.0]))
@@ -0,0 +1,48 @@
+import pytest
+
+from .pyeval import AlgebraEval
+
+expressions = [
+    "1 + 2",
+    "1 + 2 * 3",
+    "2 ^ 3 / 4 - 1",
+    "(1 + 2) * (3 + 4)",
+    "2 (3 + 4)",
+    "10 % 4 + 5!",
+    "10 _C 3 + 5 _P 2",
+]
+
+
+@pytest.mark.parametrize("expr", expressions)
+@pytest.mark.parametrize("base", [10, 7, 16])
+def test_compiled_matches_evaluate(expr, base):
+    evaluator = AlgebraEval(base=base)
+    compiled = evaluator.compile(expr)
+    assert compiled() == evaluator.evaluate(expr)
+
+
+def test_compiled_is_reusable():
+    compiled = AlgebraEval().compile("3! * 2")
+    assert compiled.value() == 12
+    assert compiled() == compiled() == "12"
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("+".join(["1"] * 100_000), "100000"),
+        ("-" * 5001 + "1", "-1"),
+        ("^".join(["1"] * 5000), "1"),
+        ("(1+" * 5000 + "1" + ")" * 5000, "5001"),
+        ("+".join(["1"] * 300), "300"),
+    ],
+    ids=["sum", "negations", "powers", "brackets", "short sum"],
+)
+def test_compile_long_and_deep_expressions(expr, expected):
+    assert AlgebraEval().compile(expr)() == expected
+
+
+def test_prepare_deep_expression_with_variables():
+    prepared = AlgebraEval().prepare("(x+" * 3000 + "y" + ")" * 3000)
+    assert prepared.value(x=2, y=1) == 6001
+    assert prepared.value(2.5, 1) == 7501.0
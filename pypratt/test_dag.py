@@ -0,0 +1,66 @@
+import pytest
+
+from . import operators
+from .dag import count_shared_nodes, intern_subtrees
+from .parser import parse
+from .pyeval import AlgebraEval
+from .tokenizer import tokenize
+
+
+def test_intern_subtrees_shares_identical_subtrees():
+    root = parse(tokenize("(2 ^ (5 _C 3)) * (2 ^ (5 _C 3)) + 1", base=10))
+    root, shared = intern_subtrees(root)
+    product = root.left
+    assert product.left is product.right
+    # The repeated subtree has 5 nodes
+    assert shared == 5
+
+
+def test_intern_subtrees_is_idempotent():
+    root = parse(tokenize("(1 + 2) * (1 + 2) - (1 + 2)", base=10))
+    root, shared = intern_subtrees(root)
+    assert intern_subtrees(root) == (root, shared)
+
+
+def test_count_shared_nodes_matches_intern_subtrees():
+    root = parse(tokenize("(2 ^ (5 _C 3)) * (2 ^ (5 _C 3)) + (2 ^ 5)", base=10))
+    assert count_shared_nodes(root) == 0
+    root, shared = intern_subtrees(root)
+    assert count_shared_nodes(root) == shared == 7
+
+
+def test_intern_subtrees_distinguishes_operators():
+    root = parse(tokenize("(1 + 2) * (1 - 2)", base=10))
+    root, shared = intern_subtrees(root)
+    assert root.left is not root.right
+    assert shared == 2
+
+
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+def test_shared_subtrees_are_evaluated_once(engine):
+    calls = []
+
+    def counting_comb(a, b):
+        calls.append((a, b))
+        return operators.comb(a, b)
+
+    registry = operators.get_registry().copy()
+    registry.register("K", counting_comb, precedence=3)
+    previous = operators.set_registry(registry)
+    try:
+        evaluator = AlgebraEval(engine=engine, cse=True)
+        assert evaluator.evaluate("(20 _K 10) * (20 _K 10) + (20 _K 10)") == str(
+            184756 * 184756 + 184756
+        )
+    finally:
+        operators.set_registry(previous)
+    assert evaluator.shared_nodes == 6
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+def test_cse_with_cache(engine):
+    evaluator = AlgebraEval(engine=engine, cse=True, cache_size=2)
+    for _ in range(2):
+        assert evaluator.evaluate("(3! + 1) * (3! + 1)") == "49"
+        assert evaluator.shared_nodes == 4
@@ -0,0 +1,163 @@
+import random
+
+import pytest
+
+from .budget import BudgetExceeded, check_budget, estimate_tree
+from .incremental import IncrementalExpression
+from .pyeval import AlgebraEval, evaluate
+from .tokenizer import SyntaxError, tokenize
+
+
+def check_consistent(incremental: IncrementalExpression) -> None:
+    """Check the state of an incremental expression against a full parse."""
+    fresh = tokenize(incremental.source, base=incremental.base)
+    tokens = incremental.tokens
+    assert tokens is not None
+    assert list(tokens.kinds) == list(fresh.kinds)
+    assert list(tokens.starts) == list(fresh.starts)
+    assert list(tokens.ends) == list(fresh.ends)
+    assert list(tokens.distances) == list(fresh.distances)
+    assert list(tokens.codes) == list(fresh.codes)
+    assert tokens._synthetic == fresh._synthetic
+    assert incremental.value == evaluate(incremental.source, incremental.base).value
+
+
+@pytest.mark.parametrize(
+    "expr, edit, expected, reparsed",
+    [
+        # Inside the innermost group
+        ("1 + 2 * (3 + (4 * 5) - 6!) + 7", (14, 15, "10"), "1 + 2 * (3 + (10 * 5) - 6!) + 7", 3),
+        # Inside the outer group only
+        ("1 + 2 * (3 + (4 * 5) - 6!) + 7", (9, 10, "30"), "1 + 2 * (30 + (4 * 5) - 6!) + 7", 10),
+        # Spanning a whole inner group
+        ("(1 + (2 * 3) + (4 - 5))", (5, 12, "2"), "(1 + 2 + (4 - 5))", 9),
+        # Outside any group
+        ("1 + (2 * 3)", (0, 1, "5"), "5 + (2 * 3)", 7),
+        # Adding a group, inside and outside another one
+        ("(1 + 2 * 3)", (5, 6, "(1 - 3)"), "(1 + (1 - 3) * 3)", 9),
+        ("2 * (1 + 3)", (4, 4, "(1 + 2) *"), "2 * (1 + 2) *(1 + 3)", 13),
+        # Implicit multiplication inside and around the group
+        ("2(3 + 4)", (3, 3, "(1 + 1)"), "2(3(1 + 1) + 4)", 9),
+    ],
+)
+def test_update(expr, edit, expected, reparsed):
+    incremental = IncrementalExpression(expr, 10)
+    incremental.value
+    incremental.update(*edit)
+    assert incremental.source == expected
+    assert incremental.reparsed_tokens == reparsed
+    check_consistent(incremental)
+
+
+@pytest.mark.parametrize(
+    "expr, edit",
+    [
+        ("(1 + 2 * 3)", (5, 5, "(")),
+        ("(1 + 2 * 3)", (3, 3, "(1 + 2) *")),
+        ("1 + (2 * 3)", (0, 1, "")),
+    ],
+)
+def test_invalid_update(expr, edit):
+    incremental = IncrementalExpression(expr, 10)
+    with pytest.raises(SyntaxError):
+        incremental.update(*edit)
+    assert incremental.root is None
+
+
+def test_only_the_path_to_the_root_is_evaluated():
+    incremental = IncrementalExpression("(1000! + 1) * ((2 + 3) - 4)", 10)
+    incremental.value
+    factorial = incremental.root.left
+    assert factorial.value is not None
+    incremental.update(19, 20, "7")
+    # The subtree outside the edited group keeps its value
+    assert incremental.root.left is factorial
+    assert factorial.value is not None
+    assert incremental.root.value is None
+    check_consistent(incremental)
+
+
+def test_random_edits_match_full_evaluation():
+    rng = random.Random(20)
+    alphabet = "0123456789+-*/^!() "
+    incremental = IncrementalExpression("(1 + 2) * ((3 - 4) * (5 + 6) + 7) - (8 * (9 + 10))", 10)
+    valid = 0
+    for _ in range(2000):
+        source = incremental.source
+        start = rng.randrange(len(source) + 1)
+        end = min(start + rng.randrange(3), len(source))
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(3)))
+        try:
+            incremental.update(start, end, text)
+            # Skip edits such as 9^99! that would take forever
+            check_budget(estimate_tree(incremental.root, 10), 10**4, 10**6)
+            incremental.value
+        except (SyntaxError, ArithmeticError, ValueError, BudgetExceeded):
+            # Undo invalid edits, so that the expression stays interesting
+            incremental.update(start, start + len(text), source[start:end])
+            continue
+        valid += 1
+        check_consistent(incremental)
+    assert valid > 100
+
+
+def test_recovers_from_invalid_edits():
+    incremental = IncrementalExpression("(1 + 2) * 3", 10)
+    with pytest.raises(SyntaxError):
+        incremental.update(3, 3, "+")
+    assert incremental.root is None
+    incremental.update(3, 4, "")
+    check_consistent(incremental)
+    assert incremental.value == 9
+
+
+def test_invalid_initial_expression():
+    incremental = IncrementalExpression("(1 + ) * 3", 10)
+    incremental.update(5, 5, "2")
+    assert incremental.value == 9
+
+
+@pytest.mark.parametrize("edit", [(-1, 0, ""), (2, 1, ""), (0, 100, "")])
+def test_invalid_edit_range(edit):
+    with pytest.raises(ValueError):
+        IncrementalExpression("1 + 2", 10).update(*edit)
+
+
+def test_algebra_eval_update():
+    evaluator = AlgebraEval(base=16)
+    assert evaluator.evaluate("FF * (A + 1)") == "AF5"
+    assert evaluator.update(6, 7, "B") == "BF4"
+    assert evaluator.expr == "FF * (B + 1)"
+    assert evaluator.update(0, 2, "1") == "C"
+    assert evaluator.evaluate() == "C"
+    with pytest.raises(SyntaxError):
+        evaluator.update(0, 1, "")
+    assert evaluator.expr == " * (B + 1)"
+    assert evaluator.update(0, 0, "2") == "18"
+
+
+def test_algebra_eval_update_applies_budgets_and_deadline():
+    evaluator = AlgebraEval(max_bits=10**4)
+    evaluator.evaluate("100! * (2 + 3)")
+    with pytest.raises(BudgetExceeded):
+        evaluator.update(0, 3, "5000")
+    assert evaluator.update(0, 4, "10") == "18144000"
+    evaluator = AlgebraEval(deadline=0)
+    evaluator.expr = "1000! * (2 + 3)"
+    with pytest.raises(BudgetExceeded):
+        evaluator.update(13, 14, "4")
+
+
+def test_algebra_eval_update_is_profiled():
+    evaluator = AlgebraEval(profile=True)
+    evaluator.evaluate("300! * (2 + 3)")
+    evaluator.update(12, 13, "4")
+    evaluator.update(12, 13, "5")
+    stats = evaluator.stats()
+    assert stats["evaluations"] == 3
+    assert stats["nodes"] == 18
+    # The first update evaluates the whole expression, and the next ones
+    # only the operators above the edit
+    assert stats["operators"]["!"]["count"] == 2
+    assert stats["operators"]["*"]["count"] == 3
+    assert stats["operators"]["+"]["count"] == 3
@@ -0,0 +1,92 @@
+import pytest
+
+from . import inference
+from .inference import DYNAMIC, EXACT_INT, FLOAT, OVERFLOW_RISK, infer_types
+from .parser import assign_variable_slots, parse
+from .pyeval import AlgebraEval, _evaluate_parse_tree
+from .tokenizer import tokenize
+
+
+def tree(expr: str, base: int = 10):
+    return parse(tokenize(expr, base=base))
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("1 + 2 * 3 - 4 % 5", EXACT_INT),
+        ("-(2 ^ 3)! + 5 _C 2 * 5 _P 2", EXACT_INT),
+        ("1.5 + 2", FLOAT),
+        ("1 / 2", FLOAT),
+        ("20! / 3", FLOAT),
+        ("2 ^ 0.5", OVERFLOW_RISK),
+        ("1000! / 3", OVERFLOW_RISK),
+        ("10 ^ 400 + 0.5", OVERFLOW_RISK),
+        # The sign of the exponent is only known at run time
+        ("2 ^ -1", DYNAMIC),
+        ("2 ^ (1 - 3)", DYNAMIC),
+        ("1.5!", DYNAMIC),
+        ("x + 1", DYNAMIC),
+    ],
+)
+def test_infer_types(expr, expected):
+    root = tree(expr)
+    assign_variable_slots(root)
+    assert infer_types(root, 10) == expected
+
+
+def test_labels_of_subtrees():
+    root = tree("(2 ^ (3 % 2)) * 1.5 - 4 / 2")
+    infer_types(root, 10)
+    product, quotient = root.left, root.right
+    assert (root.numeric_type, product.numeric_type, quotient.numeric_type) == (FLOAT,) * 3
+    # Integer subtrees of float expressions stay exact
+    assert product.left.numeric_type == EXACT_INT
+    assert product.left.right.numeric_type == EXACT_INT
+    assert product.right.numeric_type == FLOAT
+    assert quotient.left.numeric_type == EXACT_INT
+
+
+@pytest.mark.parametrize(
+    "expr, base",
+    [
+        ("1 + 2 * 3 ^ 4 - 5!", 10),
+        ("10 ^ 30 + 1 - 10 ^ 30", 10),
+        ("(7 _C 3) / 2 + 0.25 * 4", 10),
+        ("1.5 ^ 2 % 2 - -3", 10),
+        ("2 ^ -2 + 2 ^ (3 - 1)", 10),
+        ("A.8 * 2 + F / 2", 16),
+        ("99 ^ 99 % 1000", 10),
+    ],
+)
+def test_labelled_trees_evaluate_like_unlabelled_trees(expr, base):
+    expected = _evaluate_parse_tree(tree(expr, base), base)
+    root = tree(expr, base)
+    infer_types(root, base)
+    value = _evaluate_parse_tree(root, base)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+def test_literals_are_converted_once_with_the_right_converter(monkeypatch):
+    calls = []
+
+    def converter(name, convert):
+        def counting(text, base):
+            calls.append((name, text))
+            return convert(text, base)
+
+        return counting
+
+    monkeypatch.setattr(inference, "str_to_int", converter("int", inference.str_to_int))
+    monkeypatch.setattr(inference, "str_to_float", converter("float", inference.str_to_float))
+    assert AlgebraEval().evaluate("3 * 2.5 + 4 ^ 2") == "23.5"
+    assert sorted(calls) == [("float", "2.5"), ("int", "2"), ("int", "3"), ("int", "4")]
+
+
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+def test_decimal_literals(engine):
+    evaluator = AlgebraEval(engine=engine)
+    assert evaluator.evaluate("1,000.5 * 2 - 1.5") == "1999.5"
+    assert evaluator.compile("0.5 + 2 ^ 3")() == "8.5"
+    assert AlgebraEval(base=16, engine=engine).evaluate("A.8 * 2") == "15"
@@ -0,0 +1,142 @@
+import math
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from .memo import MAX_FACTORIAL_STEPS, OperatorMemo, set_memo
+from .pyeval import AlgebraEval
+
+
+@pytest.fixture
+def memo():
+    memo = OperatorMemo()
+    previous = set_memo(memo)
+    yield memo
+    set_memo(previous)
+
+
+def counters(memo: OperatorMemo) -> tuple[int, int, int]:
+    return memo.hits, memo.derived, memo.misses
+
+
+def test_repeated_results_are_hits(memo):
+    evaluator = AlgebraEval()
+    first = evaluator.evaluate("1000! + 300 _C 150 + 200 _P 100")
+    assert counters(memo) == (0, 0, 3)
+    assert evaluator.evaluate("1000! + 300 _C 150 + 200 _P 100") == first
+    assert counters(memo) == (3, 0, 3)
+    # n C k and n C (n - k) are the same result
+    evaluator.evaluate("300 _C 150 + 300 _C 150")
+    assert memo.hits == 5
+    assert len(memo) == 3
+
+
+def test_small_arguments_are_not_memoized(memo):
+    assert AlgebraEval().evaluate("52 _C 5 + 20!") == "2432902008179238960"
+    assert len(memo) == 0
+    assert counters(memo) == (0, 0, 0)
+
+
+@pytest.mark.parametrize("step", [-MAX_FACTORIAL_STEPS, -1, 1, MAX_FACTORIAL_STEPS])
+def test_factorials_are_derived_from_neighbours(memo, step):
+    assert memo.factorial(1000, math.factorial) == math.factorial(1000)
+    assert memo.factorial(1000 + step, math.factorial) == math.factorial(1000 + step)
+    assert counters(memo) == (0, 1, 1)
+
+
+def test_distant_factorials_are_computed(memo):
+    memo.factorial(1000, math.factorial)
+    memo.factorial(1000 + MAX_FACTORIAL_STEPS + 1, math.factorial)
+    assert counters(memo) == (0, 0, 2)
+
+
+@pytest.mark.parametrize(
+    "cached, n, k",
+    [
+        ((200, 70), 200, 71),
+        ((200, 70), 200, 69),
+        ((200, 70), 201, 70),
+        ((200, 70), 199, 70),
+        # Across the symmetry n C k = n C (n - k)
+        ((200, 100), 200, 99),
+        ((200, 101), 200, 100),
+        ((200, 130), 201, 70),
+    ],
+)
+def test_combinations_are_derived_from_neighbours(memo, cached, n, k):
+    memo.comb(*cached, math.comb)
+    assert memo.comb(n, k, math.comb) == math.comb(n, k)
+    assert counters(memo) == (0, 1, 1)
+
+
+@pytest.mark.parametrize(
+    "cached, n, k",
+    [((200, 70), 200, 71), ((200, 70), 200, 69), ((200, 70), 201, 70), ((200, 70), 199, 70)],
+)
+def test_permutations_are_derived_from_neighbours(memo, cached, n, k):
+    memo.perm(*cached, math.perm)
+    assert memo.perm(n, k, math.perm) == math.perm(n, k)
+    assert counters(memo) == (0, 1, 1)
+
+
+def test_permutations_are_derived_from_factorials(memo):
+    memo.factorial(300, math.factorial)
+    assert memo.perm(300, 299, math.perm) == math.perm(300, 299)
+    assert memo.perm(300, 300, math.perm) == math.perm(300, 300)
+    assert counters(memo) == (0, 2, 1)
+
+
+def test_memo_is_bounded_by_bytes():
+    capacity = 3 * sys.getsizeof(math.factorial(2000))
+    memo = OperatorMemo(capacity)
+    for n in range(2000, 2100, 10):
+        memo.factorial(n, math.factorial)
+    assert memo.size_bytes <= capacity
+    assert len(memo) == 2
+    assert memo.evictions == 8
+    # The most recent results are kept
+    assert memo.factorial(2090, math.factorial) == math.factorial(2090)
+    assert memo.hits == 1
+    # Evicted factorials are no longer used for derivations
+    assert memo.factorial(2001, math.factorial) == math.factorial(2001)
+    assert memo.derived == 0
+    assert memo._factorials == sorted(n for _, n, _ in memo._entries)
+
+
+def test_results_larger_than_the_memo_are_not_memoized():
+    memo = OperatorMemo(100)
+    memo.factorial(1000, math.factorial)
+    assert len(memo) == 0
+    assert memo.size_bytes == 0
+
+
+def test_memo_can_be_disabled(memo):
+    set_memo(None)
+    assert AlgebraEval().evaluate("100!").startswith("93326215443944152681")
+    assert len(memo) == 0
+
+
+def test_memo_is_thread_safe(memo):
+    def work(i: int) -> list[int]:
+        return [
+            memo.factorial(500 + (i * 7) % 40, math.factorial),
+            memo.comb(300, 100 + i % 20, math.comb),
+            memo.perm(200 + i % 10, 50, math.perm),
+        ]
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(work, range(400)))
+    for i, (factorial, comb, perm) in enumerate(results):
+        assert factorial == math.factorial(500 + (i * 7) % 40)
+        assert comb == math.comb(300, 100 + i % 20)
+        assert perm == math.perm(200 + i % 10, 50)
+    info = memo.info()
+    assert info["hits"] + info["derived"] + info["misses"] == 1200
+    assert info["bytes"] == sum(sys.getsizeof(value) for value in memo._entries.values())
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        OperatorMemo(0)
@@ -0,0 +1,128 @@
+import io
+import math
+
+import pytest
+
+from .operators import (
+    INFIX,
+    PREFIX,
+    OperatorRegistry,
+    get_operator_table,
+    get_registry,
+    set_registry,
+)
+from .parser import parse
+from .pyeval import AlgebraEval
+from .stream import evaluate_stream
+from .tokenizer import SyntaxError, tokenize
+
+
+@pytest.fixture
+def registry():
+    registry = get_registry().copy()
+    registry.register("&", lambda a, b: a & b, precedence=1)
+    registry.register("~", lambda a: ~a, arity=1, precedence=4)
+    registry.register("#", math.isqrt, arity=1, postfix=True, precedence=4)
+    registry.register("G", math.gcd, precedence=2)
+    registry.register("@", lambda a, b: a**b, precedence=3, right_assoc=True, name="POW")
+    previous = set_registry(registry)
+    yield registry
+    set_registry(previous)
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("6 & 3 + 2", str(6 & 5)),
+        ("~5 * 2", str(~5 * 2)),
+        ("-~5", str(-~5)),
+        ("2 * 17#", str(2 * 4)),
+        ("100 _G 75 _G 10", "5"),
+        ("2 @ 3 @ 2", str(2**9)),
+        ("~(12 _G 18)(1 & 3)", str(~6 * 1)),
+    ],
+)
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+def test_registered_operators(registry, engine, expr, expected):
+    assert AlgebraEval(engine=engine).evaluate(expr) == expected
+    assert AlgebraEval().compile(expr)() == expected
+    assert str(evaluate_stream(io.StringIO(expr), base=10, chunk_size=3)) == expected
+
+
+def test_registered_operators_are_not_known_to_other_registries(registry):
+    set_registry(OperatorRegistry())
+    with pytest.raises(SyntaxError):
+        tokenize("1 + 2", base=10)
+    set_registry(registry)
+    assert tokenize("1 + 2", base=10).codes[1] == registry.table().binary_codes["+"]
+
+
+@pytest.mark.parametrize("expr", ["1 ~ 2", "_G 1", "1 # 2", "~", "#1"])
+def test_misplaced_registered_operators(registry, expr):
+    with pytest.raises(SyntaxError):
+        parse(tokenize(expr, base=10))
+
+
+@pytest.mark.parametrize(
+    "symbol, options",
+    [
+        ("+", {}),
+        ("!", {"arity": 1, "postfix": True}),
+        ("-", {"arity": 1}),
+        ("C", {}),
+        ("(", {}),
+        ("_", {}),
+        (".", {}),
+        ("&&", {}),
+        ("K", {"arity": 1}),
+        ("&", {"arity": 3}),
+        ("&", {"postfix": True}),
+        ("&", {"arity": 1, "right_assoc": True}),
+        ("&", {"precedence": 0}),
+        ("&", {"name": "not a name"}),
+        ("&", {"name": "ADD"}),
+    ],
+)
+def test_invalid_registrations(symbol, options):
+    registry = get_registry().copy()
+    with pytest.raises(ValueError):
+        registry.register(symbol, lambda a, b: a, **{"precedence": 1, **options})
+    assert len(registry) == len(get_registry())
+
+
+def test_prefix_and_binary_operators_can_share_a_symbol():
+    registry = get_registry().copy()
+    registry.register("+", abs, arity=1, precedence=4)
+    previous = set_registry(registry)
+    try:
+        assert AlgebraEval().evaluate("+(2 - 5) + 1") == "4"
+    finally:
+        set_registry(previous)
+
+
+def test_opcodes_are_stable(registry):
+    table = get_operator_table()
+    previous = set_registry(registry.copy())
+    try:
+        copy = get_operator_table()
+        assert copy.symbols == table.symbols
+        assert copy is not table
+    finally:
+        set_registry(previous)
+    assert table.symbols[:3] == ("-", "!", "+")
+    assert table.fixities[0] == PREFIX and table.fixities[3] == INFIX
+    assert table.named_codes["_G"] == table.binary_codes["G"]
+    # The table is rebuilt after a registration, and the old one is unchanged
+    registry.register("$", lambda a, b: a, precedence=1)
+    assert get_operator_table() is not table
+    assert "$" not in table.binary_codes
+    assert len(get_operator_table()) == len(table) + 1
+
+
+def test_table_is_immutable():
+    table = get_operator_table()
+    with pytest.raises(AttributeError):
+        table.functions = ()
+    with pytest.raises(TypeError):
+        table.binary_codes["&"] = 0
+    assert get_registry().table() is table
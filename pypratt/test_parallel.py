@@ -0,0 +1,96 @@
+import pytest
+
+from .budget import BudgetExceeded, estimate_subtrees
+from .parallel import ParallelEvaluator, heavy_subtrees
+from .parser import parse
+from .pyeval import AlgebraEval, evaluate
+from .tokenizer import tokenize
+
+
+@pytest.fixture(scope="module")
+def evaluator():
+    with ParallelEvaluator(workers=4, min_cost=1e3) as evaluator:
+        yield evaluator
+
+
+def tree(expr: str):
+    return parse(tokenize(expr, base=10))
+
+
+@pytest.mark.parametrize(
+    "expr, count, expected",
+    [
+        # Both operands are heavy
+        ("3000! * 2000!", 4, ["3000!", "2000!"]),
+        # Light operators are evaluated with their heavy operand
+        ("(3000! % 97 + 1) * (2 + 2000!)", 4, ["3000! % 97 + 1", "2 + 2000!"]),
+        # Operators with one heavy operand are skipped to find two
+        ("(3000! * 2000!) % 97 + 1", 4, ["3000!", "2000!"]),
+        # The heaviest subtree is split first
+        ("(3000! * 2500!) - (2000! * 1500!)", 3, ["3000!", "2500!", "2000! * 1500!"]),
+        ("(3000! * 2500!) - (2000! * 1500!)", 8, ["3000!", "2500!", "2000!", "1500!"]),
+        # Only one heavy operand
+        ("3000! % 97 + 1", 4, ["3000! % 97 + 1"]),
+        ("1 + 2 * 3", 4, ["1 + 2 * 3"]),
+        ("3000! * 2000!", 1, ["3000! * 2000!"]),
+    ],
+)
+def test_heavy_subtrees(expr, count, expected):
+    root = tree(expr)
+    subtrees = heavy_subtrees(root, estimate_subtrees(root, 10), count, 1e4)
+    assert [_source(node) for node in subtrees] == [_source(tree(e)) for e in expected]
+
+
+def _source(node) -> str:
+    if node.left is None:
+        return node.token.value
+    if node.right is None:
+        return f"({node.token.value} {_source(node.left)})"
+    return f"({_source(node.left)} {node.token.value} {_source(node.right)})"
+
+
+@pytest.mark.parametrize(
+    "expr, base",
+    [
+        ("(500 _C 250) * (4000! % 97) + 3^2000", 10),
+        ("(300! - 200!) * (250! + 2) - (150 _P 70) * 3^300", 10),
+        ("(FF! / 80!) + (7F _C 3F)", 16),
+        ("-(1000!) * (500! % 1001)", 10),
+    ],
+)
+def test_results_match_tree_engine(evaluator, expr, base):
+    root = parse(tokenize(expr, base=base))
+    offloaded = evaluator.offloaded
+    assert evaluator.evaluate(root, base) == evaluate(expr, base).value
+    assert evaluator.offloaded > offloaded
+
+
+def test_light_expressions_are_evaluated_inline(evaluator):
+    offloaded = evaluator.offloaded
+    assert evaluator.evaluate(tree("2 * (3 + 4)"), 10) == 14
+    assert evaluator.offloaded == offloaded
+
+
+def test_deep_trees(evaluator):
+    terms = " + ".join(["1"] * 3000)
+    assert evaluator.evaluate(tree(terms), 10) == 3000
+    offloaded = evaluator.offloaded
+    assert evaluator.evaluate(tree(f"(3000! * 2000!) % 97 + {terms}"), 10) == 3000
+    assert evaluator.offloaded == offloaded + 2
+
+
+def test_leftmost_error_is_raised(evaluator):
+    with pytest.raises(ZeroDivisionError):
+        evaluator.evaluate(tree("(1000! / (1 - 1)) * (500! _C (-1))"), 10)
+    with pytest.raises(ValueError):
+        evaluator.evaluate(tree("(500! _C (-1)) * (1000! / (1 - 1))"), 10)
+
+
+def test_deadline(evaluator):
+    with pytest.raises(BudgetExceeded):
+        evaluator.evaluate(tree("1000! * 2000!"), 10, deadline=0)
+
+
+def test_parallel_engine():
+    result = AlgebraEval(engine="parallel").evaluate("(300! + 1) * (200! - 1)")
+    assert result == AlgebraEval().evaluate("(300! + 1) * (200! - 1)")
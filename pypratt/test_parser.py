@@ -0,0 +1,75 @@
+import pytest
+
+from .parser import parse
+from .pyeval import _evaluate_parse_tree
+from .tokenizer import TokenTypes, tokenize, SyntaxError
+
+# Expressions with their expected values, checked against Python's own precedence
+expressions = [
+    ("1 - 2 * 3 - 4", -9),
+    ("1 + 2 * 3 * 4", 25),
+    ("2 ^ 3 ^ 2", 512),
+    ("8 / 2 / 2", 2.0),
+    ("2 * 3!", 12),
+    ("2 ^ 3!", 64),
+    ("3! ^ 2", 36),
+    ("-2 ^ 2", -4),
+    ("-3!", -6),
+    ("2 ^ -1", 0.5),
+    ("2 * -3", -6),
+    ("--3", 3),
+    ("1 - -1", 2),
+    ("-(1 + 2) * 3", -9),
+    ("2 * (3 + 4) ^ 2", 98),
+    ("10 % 4 * 3", 6),
+    ("5 _C 2 * 2", 20),
+    ("5 _C 2 _P 2", 90),
+    ("(2 ^ 3) _C 2", 28),
+    ("10 _C (2 ^ 2)", 210),
+]
+
+
+@pytest.mark.parametrize("expr, expected", expressions)
+def test_parse_precedence_and_associativity(expr, expected):
+    assert _evaluate_parse_tree(parse(tokenize(expr, base=10)), 10) == expected
+
+
+def test_prefix_operator_tokens():
+    tokens = tokenize("-1 - (-2)", base=10)
+    assert tokens[0].type == TokenTypes.PREFIX_UNARY_OP
+    assert tokens[2].type == TokenTypes.BINARY_OP
+    assert tokens[4].type == TokenTypes.PREFIX_UNARY_OP
+
+
+@pytest.mark.parametrize("expr", ["1 + -", "- + 1", "(-)", "1 2", "-"])
+def test_parse_invalid(expr):
+    with pytest.raises(SyntaxError):
+        parse(tokenize(expr, base=10))
+
+
+@pytest.mark.parametrize(
+    "expr, position",
+    [("2 ^ 3 _C 2", 7), ("10 _C 2 ^ 2", 8), ("1 + 2 _P 2 ^ 3 * 4", 11), ("(2 ^ 3 ^ 2 _C 1)", 12)],
+)
+def test_parse_rejects_mixed_associativity(expr, position):
+    # ^ is right-associative and _C, _P left-associative at the same precedence
+    with pytest.raises(SyntaxError) as error:
+        parse(tokenize(expr, base=10))
+    assert error.value.index == position
+
+
+def test_parse_deep_nesting():
+    depth = 10_000
+    root = parse(tokenize("(" * depth + "1 + 2" + ")" * depth, base=10))
+    assert root.token.value == "+"
+
+
+def test_parse_long_expression():
+    terms = 50_000
+    root = parse(tokenize(" + ".join(["1"] * terms), base=10))
+    depth = 0
+    node = root
+    while node.left is not None:
+        node = node.left
+        depth += 1
+    assert depth == terms - 1
@@ -1,7 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
+from . import pyeval
+from .cache import ParseCache
+from .inference import infer_types
+from .parser import parse
+from .pyeval import AlgebraEval, _evaluate_parse_tree
 from .tokenizer import tokenize, SyntaxError
-from .parser import parse, _evaluate_tree
 
 invalid_expressions = [
     "  ",
@@ -54,6 +60,12 @@ valid_expressions_int_with_brackets = [
 ]
 
 
+def evaluate(expr):
+    root = parse(tokenize(expr, base=10))
+    infer_types(root, 10)
+    return _evaluate_parse_tree(root, 10)
+
+
 # ============================================
 # TOKENIZER TESTS
 
@@ -61,13 +73,13 @@ valid_expressions_int_with_brackets = [
 @pytest.mark.parametrize("expr", invalid_expressions)
 def test_tokenizer_invalid_expr(expr):
     with pytest.raises(SyntaxError):
-        tokenize(expr)
+        tokenize(expr, base=10)
 
 
 @pytest.mark.parametrize("expr", unmatched_brackets)
 def test_tokenizer_unmatched_brackets(expr):
     with pytest.raises(SyntaxError):
-        tokenize(expr)
+        tokenize(expr, base=10)
 
 
 @pytest.mark.parametrize(
@@ -75,7 +87,7 @@ def test_tokenizer_unmatched_brackets(expr):
     [(expr, num_tokens) for expr, num_tokens, _ in valid_expressions_int],
 )
 def test_tokenizer_valid_expr_int(expr, num_tokens):
-    tokens = tokenize(expr)
+    tokens = tokenize(expr, base=10)
     assert len(tokens) == num_tokens
 
 
@@ -84,7 +96,7 @@ def test_tokenizer_valid_expr_int(expr, num_tokens):
     [(expr, num_tokens) for expr, num_tokens, _ in valid_expressions_float],
 )
 def test_tokenizer_valid_expr_float(expr, num_tokens):
-    tokens = tokenize(expr)
+    tokens = tokenize(expr, base=10)
     assert len(tokens) == num_tokens
 
 
@@ -93,7 +105,7 @@ def test_tokenizer_valid_expr_float(expr, num_tokens):
     [(expr, num_tokens) for expr, num_tokens, _ in valid_expressions_int_with_brackets],
 )
 def test_tokenizer_valid_expr_int_with_brackets(expr, num_tokens):
-    tokens = tokenize(expr)
+    tokens = tokenize(expr, base=10)
     assert len(tokens) == num_tokens
 
 
@@ -109,7 +121,7 @@ def test_tokenizer_valid_expr_int_with_brackets(expr, num_tokens):
     "expr, expected", [(expr, expected) for expr, _, expected in valid_expressions_int]
 )
 def test_eval_valid_expr_int(expr, expected):
-    result = _evaluate_tree(parse(tokenize(expr)))
+    result = evaluate(expr)
     assert result == expected
 
 
@@ -118,7 +130,7 @@ def test_eval_valid_expr_int(expr, expected):
     [(expr, expected) for expr, _, expected in valid_expressions_float],
 )
 def test_eval_valid_expr_float(expr, expected):
-    result = _evaluate_tree(parse(tokenize(expr)))
+    result = evaluate(expr)
     assert result == expected
 
 
@@ -127,5 +139,72 @@ def test_eval_valid_expr_float(expr, expected):
     [(expr, expected) for expr, _, expected in valid_expressions_int_with_brackets],
 )
 def test_eval_valid_expr_int_with_brackets(expr, expected):
-    result = _evaluate_tree(parse(tokenize(expr)))
+    result = evaluate(expr)
     assert result == expected
+
+
+# ============================================
+# STATELESS EVALUATION TESTS
+
+
+def test_evaluation_result():
+    result = pyeval.evaluate("2 * (3 + 4)", 16, profile=True)
+    assert result.string == "E"
+    assert result.value == 14
+    assert len(result.tokens) == 8
+    assert result.tree.token.value == "*"
+    assert result.program is None
+    assert result.stats.evaluations == 1
+    with pytest.raises(AttributeError):
+        result.value = 15
+
+
+def test_evaluate_is_thread_safe():
+    exprs = [f"{i} * (2 + 3) + {i}! _C 2" for i in range(2, 202)] * 5
+    expected = [str(AlgebraEval().evaluate(expr)) for expr in exprs]
+    evaluator = AlgebraEval(cache_size=64, engine="vm", cse=True, profile=True)
+    cache = ParseCache(64)
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(evaluator.evaluate, exprs))
+        values = list(executor.map(lambda expr: pyeval.evaluate(expr, cache=cache).string, exprs))
+    assert results == expected
+    assert values == expected
+    assert evaluator.stats()["evaluations"] == len(exprs)
+    info = evaluator.cache_info()
+    assert info["hits"] + info["misses"] == len(exprs)
+
+
+def test_compile_and_estimate_are_thread_safe():
+    exprs = [f"{i} * (2 + 3) + {i}! _C 2" for i in range(2, 202)] * 5
+    expected = [str(AlgebraEval().evaluate(expr)) for expr in exprs]
+    evaluator = AlgebraEval(cache_size=64)
+    with ThreadPoolExecutor(8) as executor:
+        compiled = list(executor.map(evaluator.compile, exprs))
+        prepared = list(executor.map(evaluator.prepare, exprs))
+        estimates = list(executor.map(evaluator.estimate, exprs))
+    assert [c.expr for c in compiled] == exprs
+    assert [c() for c in compiled] == expected
+    assert [p() for p in prepared] == expected
+    assert [e.bits for e in estimates] == [pyeval.estimate(expr).bits for expr in exprs]
+
+
+@pytest.mark.parametrize("engine, cse", [("tree", False), ("tree", True), ("vm", False)])
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        (" + ".join(["1"] * 3000), 3000),
+        ("-" * 5000 + "2", 2),
+        ("(" * 3000 + "1" + " + 1)" * 3000, 3001),
+    ],
+    ids=["sum", "negations", "brackets"],
+)
+def test_deep_trees(engine, cse, expr, expected):
+    assert pyeval.evaluate(expr, engine=engine, cse=cse).value == expected
+
+
+def test_estimate_uses_cache():
+    cache = ParseCache(4)
+    estimate = pyeval.estimate("1000!", cache=cache)
+    assert estimate.bits > 8000
+    assert pyeval.evaluate("1000!", cache=cache).string.startswith("40238726007709377354")
+    assert cache.info()["hits"] == 1
@@ -0,0 +1,78 @@
+import math
+import random
+import sys
+
+import pytest
+
+from .num_utils import num_to_str, str_to_float, str_to_int
+from .radix import DIGITS, LEAF_DIGITS, digits_to_int, int_to_digits
+
+
+def digitwise(num, base):
+    digits = []
+    while num:
+        num, digit = divmod(num, base)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits)) or "0"
+
+
+@pytest.fixture
+def unlimited_int_digits():
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    yield
+    sys.set_int_max_str_digits(limit)
+
+
+@pytest.mark.parametrize("base", [2, 3, 7, 10, 16, 32, 36])
+@pytest.mark.parametrize("bits", [0, 1, 64, LEAF_DIGITS * 3, 40_000])
+def test_round_trip(base, bits, unlimited_int_digits):
+    num = random.Random(bits).getrandbits(bits)
+    digits = int_to_digits(num, base)
+    assert digits == digitwise(num, base)
+    assert digits_to_int(digits, base) == num
+    assert digits_to_int("00" + digits.lower(), base) == num
+
+
+def test_conversion_beyond_int_max_str_digits():
+    num = 7**20_000
+    assert str_to_int(num_to_str(num, 10), 10) == num
+    assert str_to_int(num_to_str(-num, 7).lstrip("-"), 7) == num
+    assert num_to_str(-num, 7) == "-1" + "0" * 20_000
+
+
+@pytest.mark.parametrize(
+    "expr, base, message",
+    [
+        ("12.5", 10, "Integer expected, but encountered a decimal point."),
+        ("1z.5", 10, "Invalid digit 'z' for base 10."),
+        ("19", 2, "Invalid digit '9' for base 2."),
+        ("1,000,g", 16, "Invalid digit 'g' for base 16."),
+    ],
+)
+def test_str_to_int_errors(expr, base, message):
+    with pytest.raises(ValueError, match=message):
+        str_to_int(expr, base)
+
+
+def test_str_to_float():
+    assert str_to_float("1,000.5", 10) == 1000.5
+    assert str_to_float("A.8", 16) == 10.5
+    with pytest.raises(ValueError, match="Multiple decimal points"):
+        str_to_float("1.2.3", 10)
+    with pytest.raises(ValueError, match="Separator found after decimal point"):
+        str_to_float("1.2,3", 10)
+
+
+@pytest.mark.parametrize("expr, base", [("1" + "0" * 400 + ".5", 10), ("F" * 300 + ".8", 16)])
+def test_str_to_float_overflow(expr, base):
+    assert str_to_float(expr, base) == math.inf
+    assert str_to_float("0." + "0" * 400 + "1", base) == 0.0
+
+
+@pytest.mark.parametrize(
+    "num, base, expected",
+    [(0, 7, "0"), (-255, 16, "-FF"), (35, 36, "Z"), (0.5, 2, "0.1"), (-2.25, 4, "-2.1")],
+)
+def test_num_to_str(num, base, expected):
+    assert num_to_str(num, base) == expected
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+
+from .server import EvaluationServer
+
+
+def run_requests(lines: list[str], **options) -> tuple[list[dict], EvaluationServer]:
+    """Pipeline the request lines over one connection and return the responses."""
+
+    async def run():
+        server = EvaluationServer(workers=2, **options)
+        await server.start("127.0.0.1", 0)
+        host, port = server.address().rsplit(":", 1)
+        try:
+            reader, writer = await asyncio.open_connection(host, int(port))
+            writer.write("".join(line + "\n" for line in lines).encode())
+            await writer.drain()
+            writer.write_eof()
+            responses = [json.loads(line) async for line in reader]
+            writer.close()
+            await writer.wait_closed()
+        finally:
+            await server.close()
+        return responses, server
+
+    return asyncio.run(run())
+
+
+def request(expr: str, **fields) -> str:
+    return json.dumps({"expr": expr, **fields})
+
+
+def test_pipelined_requests_are_answered_in_order():
+    lines = [request(f"{i} * 2", id=i) for i in range(200)]
+    responses, server = run_requests(lines, max_pending=8)
+    assert responses == [{"id": i, "result": str(i * 2)} for i in range(200)]
+    assert server.requests == 200
+
+
+def test_base_and_errors():
+    lines = [
+        request("11 * 11", base=2),
+        request("1 +"),
+        request("1 / 0"),
+        request("1", base=1),
+        request("1", base="2"),
+        "not json",
+        json.dumps(["1 + 1"]),
+        "",
+        request("FF", base=16),
+    ]
+    responses, _ = run_requests(lines, base=16)
+    assert responses[0] == {"result": "1001"}
+    assert responses[1] == {
+        "error": "SyntaxError",
+        "message": "Expression cannot end with a binary operator '+'",
+        "index": 3,
+    }
+    assert responses[2]["error"] == "ZeroDivisionError"
+    assert [response["error"] for response in responses[3:7]] == ["ValueError"] * 4
+    # Blank lines are skipped
+    assert responses[7] == {"result": "FF"}
+
+
+def test_heavy_expressions_go_to_the_worker_pool():
+    lines = [request("1 + 1"), request("3000!", id="heavy"), request("2 + 2")]
+    responses, server = run_requests(lines, offload_cost=1e3)
+    assert server.evaluator.offloaded == 1
+    assert responses[0] == {"result": "2"}
+    assert responses[1]["id"] == "heavy"
+    assert responses[1]["result"].startswith("41493596034378540855568670930866")
+    assert responses[2] == {"result": "4"}
+
+
+def test_budget_errors():
+    responses, server = run_requests([request("100000!")], max_bits=1000)
+    assert responses == [
+        {"error": "BudgetExceeded", "message": responses[0]["message"]}
+    ]
+    assert server.evaluator.offloaded == 0
+
+
+def test_overlong_line_closes_connection():
+    responses, _ = run_requests([request("1 + " * 100 + "1"), request("1")], max_line=64)
+    assert responses == [{"error": "ValueError", "message": "Request line is too long."}]
+
+
+def test_close_answers_pending_requests():
+    async def run():
+        server = EvaluationServer(workers=1, offload_cost=1e3)
+        await server.start("127.0.0.1", 0)
+        host, port = server.address().rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+        writer.write((request("2000!") + "\n" + request("1 + 1") + "\n").encode())
+        await writer.drain()
+        # Let the server read both requests before shutting down
+        while server.requests < 2:
+            await asyncio.sleep(0.01)
+        await server.close()
+        responses = [json.loads(line) async for line in reader]
+        writer.close()
+        return responses
+
+    responses = asyncio.run(run())
+    assert len(responses) == 2
+    assert responses[1] == {"result": "2"}
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        EvaluationServer(base=1)
+    with pytest.raises(ValueError):
+        EvaluationServer(max_pending=0)
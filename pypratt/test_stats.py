@@ -0,0 +1,58 @@
+import pytest
+
+from .pyeval import AlgebraEval
+from .stats import STAGES
+
+
+@pytest.mark.parametrize("engine", ["tree", "vm"])
+def test_operator_counts(engine):
+    evaluator = AlgebraEval(engine=engine, profile=True)
+    assert evaluator.evaluate("-(1 + 2) * 3! + 4 _C 2") == "-12"
+    stats = evaluator.stats()
+    assert stats["evaluations"] == 1
+    assert {symbol: op["count"] for symbol, op in stats["operators"].items()} == {
+        "unary -": 1,
+        "+": 2,
+        "*": 1,
+        "!": 1,
+        "C": 1,
+    }
+    assert stats["tokens"] == 14
+    assert stats["nodes"] == 11
+    assert set(stats["stage_ns"]) == set(STAGES)
+    assert all(ns > 0 for ns in stats["stage_ns"].values())
+
+
+def test_stats_accumulate_and_reset():
+    evaluator = AlgebraEval(profile=True)
+    evaluator.evaluate("1 + 2")
+    evaluator.evaluate("3 + 4 + 5")
+    stats = evaluator.stats()
+    assert stats["evaluations"] == 2
+    assert stats["operators"]["+"]["count"] == 3
+    evaluator.reset_stats()
+    assert evaluator.stats()["evaluations"] == 0
+
+
+def test_cache_hits_skip_tokenize_and_parse():
+    calls = []
+    evaluator = AlgebraEval(cache_size=4, stats_hook=lambda expr, stats: calls.append(stats))
+    evaluator.evaluate("2 ^ 10")
+    evaluator.evaluate("2 ^ 10")
+    assert calls[0].stage_ns["tokenize"] > 0
+    assert calls[1].stage_ns["tokenize"] == calls[1].stage_ns["parse"] == 0
+
+
+def test_hook_receives_each_evaluation():
+    calls = []
+    evaluator = AlgebraEval(stats_hook=lambda expr, stats: calls.append((expr, stats)))
+    evaluator.evaluate("5!")
+    evaluator.evaluate("1 + 1")
+    assert [expr for expr, _ in calls] == ["5!", "1 + 1"]
+    assert calls[0][1].operator_counts == {"!": 1}
+
+
+def test_no_stats_without_profiling():
+    evaluator = AlgebraEval()
+    evaluator.evaluate("1 + 2")
+    assert evaluator.stats() == {}
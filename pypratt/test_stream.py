@@ -0,0 +1,104 @@
+import io
+import random
+import tracemalloc
+
+import pytest
+
+from .pyeval import AlgebraEval
+from .stream import evaluate_stream, stream_tokens
+from .tokenizer import SyntaxError, tokenize
+
+expressions = [
+    "1 + 2 * 3",
+    "1 - 2 * 3 - 4",
+    "2 ^ 3 ^ 2",
+    "-(1 + 2) * 3!",
+    "2 ^ -1",
+    "10 % 4 + 5 _C 2 - 5 _P 2",
+    "(1 + 2) (3 + 4)",
+    "8 / 2 / 2",
+    "2 [3 - (4 + 1)]",
+    "123456789 * 987654321",
+    "1.5 + 2 * 0.25",
+]
+
+invalid_expressions = [
+    "",
+    "1 +",
+    "(1 + 2",
+    "1 + 2)",
+    "(1 + 2]",
+    "1 + * 2",
+    "1 $ 2",
+    "! 1",
+    "1.5!",
+    "3 / 0",
+    "x + 1",
+    "1 _X 2",
+    "3 / 0 + (",
+    "2 ^ 3 _C 2",
+]
+
+
+def chunks_of(expr, size):
+    return [expr[i : i + size] for i in range(0, len(expr), size)]
+
+
+@pytest.mark.parametrize("expr", expressions)
+@pytest.mark.parametrize("size", [1, 2, 3, 1000])
+def test_stream_matches_evaluate(expr, size):
+    expected = AlgebraEval(base=10).evaluate(expr)
+    assert AlgebraEval(base=10).evaluate_stream(chunks_of(expr, size)) == expected
+
+
+@pytest.mark.parametrize("expr", expressions)
+def test_stream_tokens_match_tokenize(expr):
+    streamed = list(stream_tokens(chunks_of(expr, 2), base=10))
+    tokens = tokenize(expr, base=10)
+    assert [(kind, value) for kind, value, _ in streamed] == [
+        (token.type, token.value) for token in tokens
+    ]
+    assert [index for _, _, index in streamed] == list(tokens.starts)
+
+
+@pytest.mark.parametrize("expr", invalid_expressions)
+@pytest.mark.parametrize("size", [1, 4])
+def test_stream_raises_like_evaluate(expr, size):
+    with pytest.raises(Exception) as expected:
+        AlgebraEval(base=10).evaluate(expr)
+    with pytest.raises(Exception) as streamed:
+        evaluate_stream(chunks_of(expr, size), base=10)
+    assert type(streamed.value) is type(expected.value)
+    assert str(streamed.value) == str(expected.value)
+    if isinstance(expected.value, SyntaxError):
+        assert streamed.value.index == expected.value.index
+
+
+def test_syntax_error_offset_is_absolute():
+    expr = "1 + " * 10_000 + "1 $ 2"
+    with pytest.raises(SyntaxError) as error:
+        evaluate_stream(io.StringIO(expr), base=10, chunk_size=7)
+    assert error.value.index == expr.index("$")
+
+
+def test_stream_from_text_stream_in_other_base():
+    rng = random.Random(0)
+    expr = " + ".join(str(rng.randrange(1, 7)) for _ in range(300))
+    expected = AlgebraEval(base=7).evaluate(expr)
+    assert AlgebraEval(base=7).evaluate_stream(io.StringIO(expr)) == expected
+
+
+def test_stream_memory_does_not_grow_with_length():
+    def terms(count):
+        for i in range(count):
+            yield f"{i % 9 + 1} * 2 - 1 + "
+        yield "1"
+
+    def peak_memory(count):
+        tracemalloc.start()
+        evaluate_stream(terms(count), base=10)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    assert peak_memory(100_000) < 2 * peak_memory(1_000)
@@ -0,0 +1,150 @@
+import random
+
+import pytest
+
+from benchmarks.charwise import tokenize_charwise
+
+from .stream import stream_tokens
+from .tokenizer import TokenTypes, tokenize, SyntaxError
+
+N, V, B, U, O, C, E = (
+    TokenTypes.NUMBER,
+    TokenTypes.VARIABLE,
+    TokenTypes.BINARY_OP,
+    TokenTypes.POSTFIX_UNARY_OP,
+    TokenTypes.OPEN_BRACKET,
+    TokenTypes.CLOSE_BRACKET,
+    TokenTypes.END,
+)
+
+valid_expressions = [
+    (
+        "1 + 2 * (3 + 4)",
+        10,
+        [(N, "1"), (B, "+"), (N, "2"), (B, "*"), (O, "("), (N, "3"), (B, "+"), (N, "4"), (C, ")")],
+    ),
+    # An opening bracket after an operand implies a multiplication
+    (
+        "2 (3)[5 - 1]",
+        10,
+        [(N, "2"), (B, "*"), (O, "("), (N, "3"), (C, ")"), (B, "*"), (O, "["), (N, "5"), (B, "-"), (N, "1"), (C, "]")],
+    ),
+    ("10 _C 3 + 5 _P 2", 10, [(N, "10"), (B, "C"), (N, "3"), (B, "+"), (N, "5"), (B, "P"), (N, "2")]),
+    ("3! ^ 2 % 7", 10, [(N, "3"), (U, "!"), (B, "^"), (N, "2"), (B, "%"), (N, "7")]),
+    ("a * x2 + ff", 10, [(V, "a"), (B, "*"), (V, "x2"), (B, "+"), (V, "ff")]),
+    # Names made up of digits of the base are numbers
+    ("a * x2 + ff", 16, [(N, "a"), (B, "*"), (V, "x2"), (B, "+"), (N, "ff")]),
+    ("1,000.5 / 2", 10, [(N, "1,000.5"), (B, "/"), (N, "2")]),
+    ("x² + 1", 10, [(V, "x²"), (B, "+"), (N, "1")]),
+]
+
+invalid_expressions = [
+    ("", "Expression cannot be empty!", 0),
+    ("  ", "Expression cannot be empty!", 0),
+    ("1 +", "Expression cannot end with a binary operator '+'", 3),
+    ("+ 1", "Expression cannot start with a binary operator '+'!", 0),
+    ("1 + + 2", "The binary operator '+' cannot follow another binary operator!", 4),
+    ("(+ 1)", "The binary operator '+' cannot follow after an opening bracket!", 1),
+    ("1 + ()", "Expression cannot end with a closing bracket ')'!", 5),
+    ("1 + (2 * 3]", "Mismatched brackets: ( closed with ]", 10),
+    ("1 + 2)", "Closing bracket: ) without matching opening bracket", 5),
+    ("((1 + 2)", "Encountered unmatched closing brackets:", 8),
+    ("!1", "Expression cannot start with a postfix operator '!'!", 0),
+    ("1 + !", "The postfix operator '!' must follow a number, a variable or a closing bracket!", 4),
+    ("1 _X 2", "Encountered invalid operator _X", 4),
+    ("x_y + 1", "'x_y' is not a valid number or variable name.", 3),
+    ("1 $ 2", "Unexpected character: $", 2),
+    ("1\t+ 2", "Unexpected character: \t", 1),
+]
+
+LEXEMES = list("0123456789abcxyzABF.,+-*/^%!()[] $\t") + ["_C", "_P", "_"]
+
+
+@pytest.mark.parametrize("expr, base, expected", valid_expressions)
+def test_tokenize(expr, base, expected):
+    tokens = tokenize(expr, base=base)
+    assert [(t.type, t.value) for t in tokens] == expected + [(E, "")]
+
+
+@pytest.mark.parametrize("expr, message, index", invalid_expressions)
+@pytest.mark.parametrize("base", [2, 10, 16])
+def test_tokenize_invalid(expr, message, index, base):
+    with pytest.raises(SyntaxError) as error:
+        tokenize(expr, base=base)
+    assert (error.value.message, error.value.index) == (message, index)
+
+
+def _tokenize_result(expr, base):
+    try:
+        tokens = tokenize(expr, base=base)
+        return [(t.type, t.value) for t in tokens], list(tokens.starts)
+    except SyntaxError as e:
+        return (e.message, e.index)
+
+
+def _stream_tokens_result(expr, base):
+    chunks = [expr[i : i + 3] for i in range(0, len(expr), 3)]
+    try:
+        tokens = list(stream_tokens(chunks, base=base))
+        return [(kind, value) for kind, value, _ in tokens], [index for _, _, index in tokens]
+    except SyntaxError as e:
+        return (e.message, e.index)
+
+
+def _charwise_result(tokenizer, expr, base):
+    try:
+        return [(t.type, t.value, t.distance) for t in tokenizer(expr, base=base)]
+    except SyntaxError as e:
+        return (e.message, e.index)
+
+
+@pytest.mark.parametrize(
+    "expr", [e[0] for e in valid_expressions] + [e[0] for e in invalid_expressions]
+)
+@pytest.mark.parametrize("base", [2, 10, 16])
+def test_scanner_matches_charwise_tokenizer(expr, base):
+    assert _charwise_result(tokenize, expr, base) == _charwise_result(
+        tokenize_charwise, expr, base
+    )
+
+
+def test_scanner_matches_charwise_tokenizer_random():
+    rng = random.Random(0)
+    for _ in range(5000):
+        expr = "".join(rng.choice(LEXEMES) for _ in range(rng.randint(0, 12)))
+        base = rng.choice([2, 10, 16])
+        assert _charwise_result(tokenize, expr, base) == _charwise_result(
+            tokenize_charwise, expr, base
+        ), expr
+
+
+def test_scanner_matches_stream_tokenizer_random():
+    rng = random.Random(0)
+    for _ in range(5000):
+        expr = "".join(rng.choice(LEXEMES) for _ in range(rng.randint(0, 12)))
+        base = rng.choice([2, 10, 16])
+        assert _tokenize_result(expr, base) == _stream_tokens_result(expr, base), expr
+
+
+def test_token_stream_offsets():
+    expr = "12 _C x (3)"
+    tokens = tokenize(expr, base=10)
+    assert [tokens.value(i) for i in range(len(tokens))] == [
+        "12", "C", "x", "*", "(", "3", ")", ""
+    ]
+    assert [expr[start:end] for start, end in zip(tokens.starts, tokens.ends)][:3] == [
+        "12", "C", "x"
+    ]
+    assert tokens[4].distance == 2
+    assert tokens[6].distance == -2
+    assert repr(tokens[0]) == "#[12]"
+    assert str(tokens[1]) == "[C]"
+
+
+def test_tokens_and_nodes_have_no_dict():
+    from .parser import parse
+
+    tokens = tokenize("1 + 2", base=10)
+    root = parse(tokens)
+    assert not hasattr(tokens[0], "__dict__")
+    assert not hasattr(root, "__dict__")
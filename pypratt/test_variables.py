@@ -0,0 +1,64 @@
+import pytest
+
+from .parser import assign_variable_slots, parse
+from .pyeval import AlgebraEval
+from .tokenizer import TokenTypes, tokenize, SyntaxError
+
+
+def test_tokenizer_variables():
+    tokens = tokenize("a * x2 + 3", base=10)
+    assert [token.type for token in tokens[:-1]] == [
+        TokenTypes.VARIABLE,
+        TokenTypes.BINARY_OP,
+        TokenTypes.VARIABLE,
+        TokenTypes.BINARY_OP,
+        TokenTypes.NUMBER,
+    ]
+
+
+def test_tokenizer_digits_in_high_bases_are_numbers():
+    tokens = tokenize("ff + fx", base=16)
+    assert tokens[0].type == TokenTypes.NUMBER
+    assert tokens[2].type == TokenTypes.VARIABLE
+
+
+def test_tokenizer_implicit_multiplication_after_variable():
+    tokens = tokenize("x(1 + 2)", base=10)
+    assert tokens[1].type == TokenTypes.BINARY_OP
+    assert tokens[1].value == "*"
+
+
+def test_variable_slots_are_shared():
+    root = parse(tokenize("x * y + x", base=10))
+    assert assign_variable_slots(root) == ["x", "y"]
+
+
+def test_prepare_with_bindings():
+    expr = AlgebraEval().prepare("a*x^2 + b")
+    assert expr.variables == ["a", "x", "b"]
+    assert expr(a=1, b=2, x=3) == "11"
+    assert expr(2, 3, 1) == "19"
+    assert expr.value(a=1, b=0, x=4) == 16
+
+
+def test_prepare_output_base():
+    expr = AlgebraEval(base=2).prepare("x + 1")
+    assert expr(x=4) == "101"
+
+
+def test_prepare_missing_and_unknown_bindings():
+    expr = AlgebraEval().prepare("x + y")
+    with pytest.raises(ValueError):
+        expr(x=1)
+    with pytest.raises(ValueError):
+        expr(x=1, y=2, z=3)
+
+
+def test_evaluate_unbound_variable():
+    with pytest.raises(ValueError):
+        AlgebraEval().evaluate("x + 1")
+
+
+def test_invalid_name():
+    with pytest.raises(SyntaxError):
+        tokenize("x_y + 1", base=10)
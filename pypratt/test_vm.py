@@ -0,0 +1,73 @@
+import copy
+import pickle
+
+import pytest
+
+from .parser import assign_variable_slots, parse
+from .pyeval import AlgebraEval
+from .tokenizer import tokenize
+from .vm import lower, run
+
+expressions = [
+    "1 + 2 * 3",
+    "1 - 2 * 3 - 4",
+    "2 ^ 3 ^ 2",
+    "-(1 + 2) * 3!",
+    "2 ^ -1",
+    "10 % 4 + 5 _C 2 - 5 _P 2",
+    "(1 + 2) (3 + 4)",
+    "6 / 3 / 2",
+    "1.5 + 2 ^ 0.5",
+]
+
+invalid_expressions = ["3 / 0", "x + 1", "1.5!"]
+
+
+@pytest.mark.parametrize("expr", expressions)
+@pytest.mark.parametrize("base", [10, 7])
+def test_vm_matches_tree(expr, base):
+    tree = AlgebraEval(base=base, engine="tree")
+    vm = AlgebraEval(base=base, engine="vm")
+    assert vm.evaluate(expr) == tree.evaluate(expr)
+    assert vm.result_base10 == tree.result_base10
+
+
+@pytest.mark.parametrize("expr", invalid_expressions)
+def test_vm_raises_like_tree(expr):
+    with pytest.raises(Exception) as tree_error:
+        AlgebraEval(engine="tree").evaluate(expr)
+    with pytest.raises(Exception) as vm_error:
+        AlgebraEval(engine="vm").evaluate(expr)
+    assert type(vm_error.value) is type(tree_error.value)
+    assert str(vm_error.value) == str(tree_error.value)
+
+
+def test_vm_with_variables():
+    root = parse(tokenize("a * x ^ 2 + b", base=10))
+    assign_variable_slots(root)
+    program = lower(root, 10)
+    assert run(program, [2, 3, 1]) == 19
+
+
+def test_program_is_copyable_and_picklable():
+    program = lower(parse(tokenize("3! * 2", base=10)), 10)
+    assert run(copy.copy(program)) == 12
+    assert run(pickle.loads(pickle.dumps(program))) == 12
+
+
+def test_vm_long_expression():
+    expr = " + ".join(["1"] * 50_000)
+    assert AlgebraEval(engine="vm").evaluate(expr) == "50000"
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        AlgebraEval(engine="jit")
+
+
+def test_vm_programs_are_cached():
+    evaluator = AlgebraEval(engine="vm", cache_size=4)
+    evaluator.evaluate("2 * (3 + 4)")
+    program = evaluator.program
+    assert evaluator.evaluate("2 * (3 + 4)") == "14"
+    assert evaluator.program is program
@@ -1,14 +1,21 @@
-from enum import Enum
+import re
+import string
 
-from .num_utils import DECIMAL_POINT, SEPARATOR
+from array import array
+from collections.abc import Iterator
+from enum import IntEnum
+from functools import cache
+from typing import overload
+
+from .num_utils import DECIMAL_POINT, SEPARATOR, is_valid_digit
 from .operators import (
-    BINARY_OP_SYMS,
-    POSTFIX_UNARY_OP_SYMS,
-    PREFIX_UNARY_OP_SYMS,
     OPEN_BRACKETS,
     CLOSE_BRACKETS,
     MATCHING_BRACKET,
+    MULTIPLY_SYM,
     OP_START_SYM,
+    OperatorTable,
+    get_operator_table,
 )
 
 
@@ -23,28 +30,72 @@ class SyntaxError(Exception):
         self.message = message
         self.index = index
 
+    def __reduce__(self):
+        # Keep the index when the exception is pickled, e.g. by a process pool
+        return (self.__class__, (self.message, self.index))
+
+
+class TokenTypes(IntEnum):
+    NUMBER = 0
+    VARIABLE = 1
+    PREFIX_UNARY_OP = 2
+    POSTFIX_UNARY_OP = 3
+    BINARY_OP = 4
+    OPEN_BRACKET = 5
+    CLOSE_BRACKET = 6
+    END = 7
+
 
-class TokenTypes(Enum):
-    NUMBER = "NUMBER"
-    PREFIX_UNARY_OP = "PREFIX_UNARY_OP"
-    POSTFIX_UNARY_OP = "POSTFIX_UNARY_OP"
-    BINARY_OP = "BINARY_OP"
-    OPEN_BRACKET = "OPEN_BRACKET"
-    CLOSE_BRACKET = "CLOSE_BRACKET"
-    END = "END"
+# Token types that can be followed by a postfix operator or a binary operator
+OPERAND_TYPES = {TokenTypes.NUMBER, TokenTypes.VARIABLE, TokenTypes.CLOSE_BRACKET}
+
+# Token types after which an operator symbol is read as a prefix operator
+PREFIX_CONTEXT_TYPES = {
+    TokenTypes.BINARY_OP,
+    TokenTypes.PREFIX_UNARY_OP,
+    TokenTypes.OPEN_BRACKET,
+}
+
+# Token types that cannot be followed by a closing bracket or end an expression
+INCOMPLETE_TYPES = PREFIX_CONTEXT_TYPES
 
 
 class Token:
+    """A single token, which refers to its text by offsets into the source string."""
+
+    __slots__ = ("type", "_source", "_start", "_end", "distance")
+
     def __init__(self, type: TokenTypes, value: str, distance: int | None = None):
         self.type: TokenTypes = type
-        self.value = value
+        self._source = value
+        self._start = 0
+        self._end = len(value)
         self.distance: int | None = distance
         # Used for brackets to indicate distance to matching bracket
 
+    @classmethod
+    def from_source(
+        cls, type: TokenTypes, source: str, start: int, end: int, distance: int | None = None
+    ) -> "Token":
+        """Create a token for the slice source[start:end] without copying it."""
+        token = cls.__new__(cls)
+        token.type = type
+        token._source = source
+        token._start = start
+        token._end = end
+        token.distance = distance
+        return token
+
+    @property
+    def value(self) -> str:
+        return self._source[self._start : self._end]
+
     def __repr__(self):
         match self.type:
             case TokenTypes.NUMBER:
                 return f"#[{self.value}]"
+            case TokenTypes.VARIABLE:
+                return f"Var[{self.value}]"
             case TokenTypes.PREFIX_UNARY_OP | TokenTypes.POSTFIX_UNARY_OP | TokenTypes.BINARY_OP:
                 return f"Op[{self.value}]"
             case TokenTypes.OPEN_BRACKET:
@@ -58,7 +109,7 @@ class Token:
 
     def __str__(self):
         match self.type:
-            case TokenTypes.NUMBER:
+            case TokenTypes.NUMBER | TokenTypes.VARIABLE:
                 return self.value
             case TokenTypes.PREFIX_UNARY_OP | TokenTypes.POSTFIX_UNARY_OP | TokenTypes.BINARY_OP:
                 return f"[{self.value}]"
@@ -72,158 +123,367 @@ class Token:
                 return "[INVALID]"
 
 
-def tokenize(expr: str, *, base: int) -> list[Token]:
-    """Tokenize the input expression into a list of tokens."""
+class TokenStream:
+    """A compact, array-backed sequence of tokens.
+
+    Token types are stored as small integers and the text of each token as a
+    (start, end) pair of offsets into the source expression, so no per-token
+    objects or substrings are kept. Operator tokens also store their opcode in
+    the operator table (see operators.OperatorTable). Indexing or iterating the
+    stream creates Token views on demand. Tokens without source text (the
+    implicit '*' before an opening bracket) are kept in a small side table."""
+
+    __slots__ = ("source", "kinds", "starts", "ends", "distances", "codes", "_synthetic")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array("B")
+        self.starts = array("i")
+        self.ends = array("i")
+        # Distance to the matching bracket, or 0 for all other tokens
+        self.distances = array("i")
+        # Opcode of operator tokens, or 0 for all other tokens
+        self.codes = array("H")
+        self._synthetic: dict[int, str] = {}
+
+    @classmethod
+    def from_tokens(cls, tokens: list[Token]) -> "TokenStream":
+        """Build a stream from a list of tokens, whose values are concatenated
+        into the source string of the stream."""
+        stream = cls("".join(token.value for token in tokens))
+        table = get_operator_table()
+        codes = {
+            TokenTypes.PREFIX_UNARY_OP: table.prefix_codes,
+            TokenTypes.POSTFIX_UNARY_OP: table.postfix_codes,
+            TokenTypes.BINARY_OP: table.binary_codes,
+        }
+        start = 0
+        for token in tokens:
+            end = start + len(token.value)
+            code = codes[token.type][token.value] if token.type in codes else 0
+            stream.append(token.type, start, end, code=code)
+            if token.distance is not None:
+                stream.distances[-1] = token.distance
+            start = end
+        return stream
+
+    def append(
+        self, kind: int, start: int, end: int, value: str | None = None, code: int = 0
+    ) -> None:
+        """Append a token spanning source[start:end], or with an explicit value."""
+        if value is not None:
+            self._synthetic[len(self.kinds)] = value
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.distances.append(0)
+        self.codes.append(code)
+
+    def value(self, index: int) -> str:
+        """Return the text of the token at the index."""
+        if index < 0:
+            index += len(self.kinds)
+        if index in self._synthetic:
+            return self._synthetic[index]
+        return self.source[self.starts[index] : self.ends[index]]
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Token]: ...
+
+    def __getitem__(self, index: int | slice) -> Token | list[Token]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.kinds)))]
+        if index < 0:
+            index += len(self.kinds)
+        kind = TokenTypes(self.kinds[index])
+        distance = self.distances[index] or None
+        if index in self._synthetic:
+            return Token(kind, self._synthetic[index], distance)
+        return Token.from_source(
+            kind, self.source, self.starts[index], self.ends[index], distance
+        )
 
-    tokens: list[Token] = []
-    cur_str = ""
-    bracket_stack: list[int] = []
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self.kinds)):
+            yield self[index]
 
-    # Add a space at the end of the expression to process the last number
-    # expr = expr.replace(" ", "")
-    expr += " "
-    for str_index, char in enumerate(expr):
-        if is_valid_str_token(char):
-            cur_str += char
-        else:
-            # If the previous character was part of a number, convert it to a NumberToken first
-            if cur_str:
-                if cur_str[0] == OP_START_SYM:
-                    if cur_str[1:] in BINARY_OP_SYMS:
-                        add_operator_token(tokens, cur_str[1:], str_index)
-                    else:
-                        raise SyntaxError(f"Encountered invalid operator {cur_str}", str_index)
-                elif is_valid_num(cur_str, base):
-                    tokens.append(Token(TokenTypes.NUMBER, cur_str))
-                elif is_valid_var(cur_str):
-                    tokens.append(Token(TokenTypes.NUMBER, cur_str))
-                else:
-                    raise SyntaxError(
-                        f"'{cur_str}' is not a valid number or variable name.",
-                        str_index,
-                    )
-                cur_str = ""
+    def __repr__(self):
+        return f"TokenStream({list(self)!r})"
+
+
+# Character classes of the table-driven scanner. CHAR_BINARY_OP is the class
+# of both binary and prefix operators, which are told apart by their position.
+CHAR_POSTFIX_OP = 1
+CHAR_BINARY_OP = 2
+CHAR_OPEN_BRACKET = 3
+CHAR_CLOSE_BRACKET = 4
+CHAR_INVALID = 5
+
+
+@cache
+def char_classes(table: OperatorTable) -> dict[str, int]:
+    """Return the classes of the characters of the operators of a table and of brackets."""
+    return {
+        **{char: CHAR_POSTFIX_OP for char in table.postfix_codes},
+        **{char: CHAR_BINARY_OP for char in table.binary_codes if not char.isalnum()},
+        **{char: CHAR_BINARY_OP for char in table.prefix_codes},
+        **{char: CHAR_OPEN_BRACKET for char in OPEN_BRACKETS},
+        **{char: CHAR_CLOSE_BRACKET for char in CLOSE_BRACKETS},
+    }
+
+# Splits an expression into lexemes, each paired with the spaces that preceed
+# it. A lexeme is either a word (a run of alphanumeric characters, decimal
+# points, separators and underscores, which start named operators) or a
+# single character of any other kind.
+LEXEME_PATTERN = re.compile(
+    f"( *)(?:([\\w{re.escape(DECIMAL_POINT + SEPARATOR)}]+)|([^ ]))", re.DOTALL
+)
 
-            if char in POSTFIX_UNARY_OP_SYMS:
-                if not tokens:
-                    raise SyntaxError(
-                        f"Expression cannot start with a postfix operator '{char}'!",
-                        str_index,
-                    )
-                elif tokens[-1].type not in {
-                    TokenTypes.NUMBER,
-                    TokenTypes.CLOSE_BRACKET,
-                }:
-                    raise SyntaxError(
-                        f"The postfix operator '{char}' must follow a number or a closing bracket!",
-                        str_index,
-                    )
-                tokens.append(Token(TokenTypes.POSTFIX_UNARY_OP, char))
-
-            elif char in BINARY_OP_SYMS:
-                add_operator_token(tokens, char, str_index)
-
-            elif char in OPEN_BRACKETS:
-                # Assume that an opening bracket preceeded by a number or a closing bracket implies multiplication
-                if tokens and (
-                    tokens[-1].type == TokenTypes.NUMBER
-                    or tokens[-1].type == TokenTypes.CLOSE_BRACKET
-                ):
-                    tokens.append(Token(TokenTypes.BINARY_OP, "*"))
-                tokens.append(Token(TokenTypes.OPEN_BRACKET, char))
-                bracket_stack.append(len(tokens) - 1)
-
-            elif char in CLOSE_BRACKETS:
-                if not tokens or tokens[-1].type in {
-                    TokenTypes.BINARY_OP,
-                    TokenTypes.OPEN_BRACKET,
-                }:
-                    raise SyntaxError(
-                        f"Expression cannot end with a closing bracket '{char}'!",
-                        str_index,
-                    )
-                try:
-                    opening_index = bracket_stack.pop()
-                except IndexError:
+
+@cache
+def _digit_chars(base: int) -> frozenset[str]:
+    """Return the set of ASCII characters that are valid digits in the base."""
+    return frozenset(
+        char for char in string.ascii_letters + string.digits if is_valid_digit(char, base)
+    )
+
+
+def tokenize(expr: str, *, base: int) -> TokenStream:
+    """Tokenize the input expression into a stream of tokens.
+
+    The expression is split into lexemes by a single compiled regex, and each
+    lexeme is dispatched on the class of its first character. Operators are
+    looked up in the operator table in use."""
+
+    stream = TokenStream(expr)
+    bracket_stack: list[int] = []
+    digit_chars = _digit_chars(base)
+    table = get_operator_table()
+    classes = char_classes(table)
+    prefix_codes = table.prefix_codes
+    postfix_codes = table.postfix_codes
+    binary_codes = table.binary_codes
+    named_codes = table.named_codes
+    implicit_code = binary_codes.get(MULTIPLY_SYM)
+    add_kind = stream.kinds.append
+    add_start = stream.starts.append
+    add_end = stream.ends.append
+    distances = stream.distances
+    add_distance = distances.append
+    add_code = stream.codes.append
+
+    NUMBER = TokenTypes.NUMBER
+    BINARY_OP = TokenTypes.BINARY_OP
+    PREFIX_UNARY_OP = TokenTypes.PREFIX_UNARY_OP
+
+    # Track the previous token in locals rather than inspecting the stream
+    prev_kind: int | None = None
+    prev_is_operand = False
+
+    str_index = 0
+    for spaces, word, char in LEXEME_PATTERN.findall(expr):
+        if spaces:
+            str_index += len(spaces)
+
+        if word:
+            end_index = str_index + len(word)
+            code = named_codes.get(word)
+            if code is not None:
+                _check_binary_operator(prev_kind, word[1:], end_index)
+                # The text of a named operator excludes the leading OP_START_SYM
+                add_start(str_index + 1)
+                kind = BINARY_OP
+                prev_is_operand = False
+            else:
+                kind = _classify_word(prev_kind, word, end_index, base, digit_chars)
+                add_start(str_index)
+                code = 0
+                prev_is_operand = True
+            add_kind(kind)
+            add_end(end_index)
+            add_distance(0)
+            add_code(code)
+            prev_kind = kind
+            str_index = end_index
+            continue
+
+        char_class = classes.get(char, CHAR_INVALID)
+        if char_class == CHAR_BINARY_OP:
+            code = (
+                prefix_codes.get(char)
+                if prev_kind is None or prev_kind in PREFIX_CONTEXT_TYPES
+                else None
+            )
+            if code is not None:
+                kind = PREFIX_UNARY_OP
+            else:
+                code = binary_codes.get(char)
+                if code is None:
                     raise SyntaxError(
-                        f"Closing bracket: {char} without matching opening bracket",
+                        f"The prefix operator '{char}' must precede an operand!",
                         str_index,
                     )
-                if MATCHING_BRACKET[char] != tokens[opening_index].value:
+                _check_binary_operator(prev_kind, char, str_index)
+                kind = BINARY_OP
+            prev_is_operand = False
+
+        elif char_class == CHAR_POSTFIX_OP:
+            if prev_kind is None:
+                raise SyntaxError(
+                    f"Expression cannot start with a postfix operator '{char}'!",
+                    str_index,
+                )
+            elif not prev_is_operand:
+                raise SyntaxError(
+                    f"The postfix operator '{char}' must follow a number, a variable or a closing bracket!",
+                    str_index,
+                )
+            kind = TokenTypes.POSTFIX_UNARY_OP
+            code = postfix_codes[char]
+            prev_is_operand = False
+
+        elif char_class == CHAR_OPEN_BRACKET:
+            # Assume that an opening bracket preceeded by an operand implies multiplication
+            if prev_is_operand:
+                if implicit_code is None:
                     raise SyntaxError(
-                        f"Mismatched brackets: {tokens[opening_index].value} closed with {char}",
+                        f"Implicit multiplication needs the operator '{MULTIPLY_SYM}'!",
                         str_index,
                     )
+                stream.append(BINARY_OP, str_index, str_index, MULTIPLY_SYM, implicit_code)
+            bracket_stack.append(len(distances))
+            kind = TokenTypes.OPEN_BRACKET
+            code = 0
+            prev_is_operand = False
+
+        elif char_class == CHAR_CLOSE_BRACKET:
+            if prev_kind is None or prev_kind in INCOMPLETE_TYPES:
+                raise SyntaxError(
+                    f"Expression cannot end with a closing bracket '{char}'!",
+                    str_index,
+                )
+            if not bracket_stack:
+                raise SyntaxError(
+                    f"Closing bracket: {char} without matching opening bracket",
+                    str_index,
+                )
+            opening_index = bracket_stack.pop()
+            opening_bracket = expr[stream.starts[opening_index]]
+            if MATCHING_BRACKET[char] != opening_bracket:
+                raise SyntaxError(
+                    f"Mismatched brackets: {opening_bracket} closed with {char}",
+                    str_index,
+                )
+            closing_dist = len(distances) - opening_index
+            distances[opening_index] = closing_dist
+            add_kind(TokenTypes.CLOSE_BRACKET)
+            add_start(str_index)
+            add_end(str_index + 1)
+            add_distance(-closing_dist)
+            add_code(0)
+            prev_kind = TokenTypes.CLOSE_BRACKET
+            prev_is_operand = True
+            str_index += 1
+            continue
 
-                tokens.append(Token(TokenTypes.CLOSE_BRACKET, char))
-                compute_bracket_distances(tokens, opening_index)
+        else:
+            raise SyntaxError(f"Unexpected character: {char}", str_index)
 
-            elif char != " ":
-                raise SyntaxError(f"Unexpected character: {char}", str_index)
+        add_kind(kind)
+        add_start(str_index)
+        add_end(str_index + 1)
+        add_distance(0)
+        add_code(code)
+        prev_kind = kind
+        str_index += 1
 
-    if not tokens:
+    if prev_kind is None:
         raise SyntaxError("Expression cannot be empty!", 0)
-
     if bracket_stack:
-        raise SyntaxError("Encountered unmatched closing brackets:", len(expr) - 1)
-
-    if tokens[-1].type == TokenTypes.BINARY_OP:
+        raise SyntaxError("Encountered unmatched closing brackets:", len(expr))
+    if prev_kind in INCOMPLETE_TYPES:
         raise SyntaxError(
-            f"Expression cannot end with a binary operator '{tokens[-1].value}'",
-            len(expr) - 1,
+            f"Expression cannot end with {_describe(prev_kind, stream.value(-1))}",
+            len(expr),
         )
 
-    tokens.append(Token(TokenTypes.END, ""))
-    return tokens
-
-
-def add_operator_token(tokens:list[Token], op:str, str_index:int):
-    if not tokens:
+    stream.append(TokenTypes.END, len(expr), len(expr))
+    return stream
+
+
+def _classify_word(
+    prev_kind: int | None,
+    word: str,
+    end_index: int,
+    base: int,
+    digit_chars: frozenset[str],
+) -> TokenTypes:
+    """Classify a run of word characters as a number or a variable.
+
+    Named operators are looked up in the operator table before, so any other
+    word starting with OP_START_SYM is invalid. Errors are reported at the
+    index of the character following the word."""
+    first_char = word[0]
+    if first_char == OP_START_SYM:
+        raise SyntaxError(f"Encountered invalid operator {word}", end_index)
+    if first_char.isalpha() and word.isalnum():
+        if word.isascii():
+            if not digit_chars.issuperset(word):
+                return TokenTypes.VARIABLE
+        elif is_valid_var(word, base):
+            return TokenTypes.VARIABLE
+    if OP_START_SYM not in word:
+        return TokenTypes.NUMBER
+    raise SyntaxError(f"'{word}' is not a valid number or variable name.", end_index)
+
+
+def _describe(kind: int, value: str) -> str:
+    match kind:
+        case TokenTypes.BINARY_OP:
+            return f"a binary operator '{value}'"
+        case TokenTypes.PREFIX_UNARY_OP:
+            return f"a prefix operator '{value}'"
+        case _:
+            return f"an opening bracket '{value}'"
+
+
+def _check_binary_operator(prev_type:TokenTypes | None, op:str, str_index:int):
+    if prev_type is None:
         raise SyntaxError(
                         f"Expression cannot start with a binary operator '{op}'!",
                         str_index,
                     )
-    elif tokens[-1].type == TokenTypes.BINARY_OP:
+    elif prev_type == TokenTypes.BINARY_OP:
         raise SyntaxError(
                         f"The binary operator '{op}' cannot follow another binary operator!",
                         str_index,
                     )
-    elif tokens[-1].type == TokenTypes.OPEN_BRACKET:
+    elif prev_type == TokenTypes.OPEN_BRACKET:
         raise SyntaxError(
                         f"The binary operator '{op}' cannot follow after an opening bracket!",
                         str_index,
                     )
-    tokens.append(Token(TokenTypes.BINARY_OP, op))
-
-
-def compute_bracket_distances(tokens, opening_index):
-    cur_index = len(tokens) - 1
-    closing_dist = cur_index - opening_index
-    tokens[opening_index].distance = closing_dist
-    tokens[cur_index].distance = -closing_dist
+    elif prev_type == TokenTypes.PREFIX_UNARY_OP:
+        raise SyntaxError(
+                        f"The binary operator '{op}' cannot follow a prefix operator!",
+                        str_index,
+                    )
 
 
-def is_valid_num(num_str: str, base: int) -> bool:
-    """Check if the character is part of a number.
+def is_valid_var(var_str: str, base: int) -> bool:
+    """Check if a given string is a variable name.
 
-    To account for numbers in different bases, we consider alphanumeric characters,
-    decimal points, and separators.
+    Variable names start with a letter and contain only alphanumeric characters.
+    Names made up entirely of valid digits in the base (such as 'ff' in base 16)
+    are treated as numbers instead.
     """
-    return all(
-        char.isalnum() or char == DECIMAL_POINT or char == SEPARATOR for char in num_str
-    )
-
-
-# TODO: Implement variables!
-def is_valid_var(var_str: str) -> bool:
-    """Check if a given string corresponds to a preassigned variable"""
-    return False
+    if not var_str[0].isalpha() or not var_str.isalnum():
+        return False
+    return not all(is_valid_digit(char, base) for char in var_str)
 
-
-def is_valid_str_token(char: str) -> bool:
-    """Check if the character is part of a number.
-
-    To account for numbers in different bases, we consider alphanumeric characters,
-    decimal points, and separators.
-    """
-    return char.isalnum() or char == DECIMAL_POINT or char == SEPARATOR or char == OP_START_SYM
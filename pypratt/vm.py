@@ -0,0 +1,158 @@
+from array import array
+from collections.abc import Sequence
+
+from .budget import check_deadline
+from .dag import reference_counts
+from .inference import literal_value
+from .operators import function, get_operator_table
+from .parser import Node
+from .tokenizer import TokenTypes
+
+
+# Opcodes of the stack machine
+LOAD_CONST = 0
+LOAD_VAR = 1
+CALL_UNARY = 2
+CALL_BINARY = 3
+RAISE = 4
+STORE_TEMP = 5
+LOAD_TEMP = 6
+
+class Program:
+    """A parse tree lowered to a flat postfix instruction sequence.
+
+    Each instruction is an opcode with one integer argument: an index into the
+    constant pool for LOAD_CONST and RAISE, a variable slot for LOAD_VAR, an
+    opcode of the operator table for the CALL instructions, and a temporary slot
+    for STORE_TEMP and LOAD_TEMP, which hold the values of shared subtrees. A
+    program contains only integers, numbers and names, so it is cheap to store,
+    copy and pickle."""
+
+    __slots__ = ("opcodes", "args", "constants", "variables", "num_temps")
+
+    def __init__(self):
+        self.opcodes = array("B")
+        self.args = array("I")
+        self.constants: list = []
+        # Variable names indexed by slot
+        self.variables: list[str] = []
+        self.num_temps = 0
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __repr__(self):
+        return f"Program({len(self)} instructions, {len(self.constants)} constants)"
+
+    def emit(self, opcode: int, arg: int = 0) -> None:
+        self.opcodes.append(opcode)
+        self.args.append(arg)
+
+    def add_constant(self, value) -> int:
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+
+def lower(root: Node | None, base: int, shared: bool = False) -> Program:
+    """Lower a parse tree into a postfix Program.
+
+    Literals are converted to numbers once, here. A literal that cannot be
+    converted is lowered into a RAISE instruction, so the error surfaces at the
+    same point of the evaluation as with the tree-walking evaluator.
+
+    If shared is True, the tree may be a DAG (see dag.intern_subtrees): the
+    value of an operator node with several parents is computed once, stored in
+    a temporary slot and loaded from there at its other occurrences."""
+    if root is None:
+        raise ValueError("Cannot evaluate an empty tree.")
+
+    program = Program()
+    counts = reference_counts(root) if shared else {}
+    temps: dict[int, int] = {}
+    # Post-order traversal with an explicit stack of (node, children_done)
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        token = node.token
+        if token is None:
+            raise ValueError("Cannot evaluate a node without a token.")
+
+        if id(node) in temps:
+            program.emit(LOAD_TEMP, temps[id(node)])
+        elif token.type == TokenTypes.NUMBER:
+            try:
+                value = literal_value(node, base)
+            except ValueError as e:
+                program.emit(RAISE, program.add_constant(e))
+            else:
+                program.emit(LOAD_CONST, program.add_constant(value))
+        elif token.type == TokenTypes.VARIABLE:
+            if node.slot is None:
+                program.emit(
+                    RAISE,
+                    program.add_constant(ValueError(f"Variable '{token.value}' is not bound.")),
+                )
+            else:
+                if node.slot >= len(program.variables):
+                    program.variables.extend([""] * (node.slot + 1 - len(program.variables)))
+                program.variables[node.slot] = token.value
+                program.emit(LOAD_VAR, node.slot)
+        elif children_done:
+            opcode = CALL_BINARY if token.type == TokenTypes.BINARY_OP else CALL_UNARY
+            program.emit(opcode, node.opcode)
+            if counts.get(id(node), 1) > 1:
+                temps[id(node)] = program.num_temps
+                program.emit(STORE_TEMP, program.num_temps)
+                program.num_temps += 1
+        else:
+            stack.append((node, True))
+            if node.right is not None:
+                stack.append((node.right, False))
+            if node.left is not None:
+                stack.append((node.left, False))
+    return program
+
+
+def run(
+    program: Program,
+    variables: Sequence[int | float] = (),
+    deadline: float | None = None,
+    functions: Sequence[function] | None = None,
+) -> int | float:
+    """Execute a Program on a value stack and return the result.
+
+    If a time.monotonic() deadline is given, it is checked before each operator
+    and BudgetExceeded is raised once it has passed. The operator functions can
+    be replaced by a list indexed by opcode, like the functions of the operator
+    table, e.g. for profiling."""
+    stack: list = []
+    push = stack.append
+    pop = stack.pop
+    constants = program.constants
+    if functions is None:
+        functions = get_operator_table().functions
+    temps: list = [None] * program.num_temps
+
+    for opcode, arg in zip(program.opcodes, program.args):
+        if opcode == LOAD_CONST:
+            push(constants[arg])
+        elif opcode == CALL_BINARY:
+            if deadline is not None:
+                check_deadline(deadline)
+            right = pop()
+            stack[-1] = functions[arg](stack[-1], right)
+        elif opcode == CALL_UNARY:
+            if deadline is not None:
+                check_deadline(deadline)
+            stack[-1] = functions[arg](stack[-1])
+        elif opcode == LOAD_TEMP:
+            push(temps[arg])
+        elif opcode == STORE_TEMP:
+            temps[arg] = stack[-1]
+        elif opcode == LOAD_VAR:
+            if arg >= len(variables):
+                raise ValueError(f"Variable '{program.variables[arg]}' is not bound.")
+            push(variables[arg])
+        else:
+            raise constants[arg]
+    return stack[0]